@@ -0,0 +1,231 @@
+from operator import gt
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from bartpy.bartpy.node import TreeNode, LeafNode
+from bartpy.bartpy.tree import Tree
+
+
+def find_root(tree: Tree) -> TreeNode:
+    """
+    The single node of the tree that isn't the child of any other node
+    """
+    if tree.root is not None:
+        return tree.root
+    children = set()
+    for node in tree.nodes:
+        if node.left_child is not None:
+            children.add(id(node.left_child))
+            children.add(id(node.right_child))
+    for node in tree.nodes:
+        if id(node) not in children:
+            return node
+    raise ValueError("Tree has no root node")
+
+
+def flatten_tree(tree: Tree, nodes: List[TreeNode]=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert a tree into flat arrays, with the root at position 0
+
+    Internal nodes send rows with `X[:, feature] <= threshold` to `left` and all other rows to `right`
+    Leaf nodes have a feature of -1 and point to themselves
+
+    Parameters
+    ----------
+    tree: Tree
+    nodes: List[TreeNode]
+        If passed, filled with the node at each position
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        feature, threshold, left, right, value
+    """
+    feature, threshold, left, right, value = [], [], [], [], []
+
+    def add(node: TreeNode) -> int:
+        position = len(feature)
+        if nodes is not None:
+            nodes.append(node)
+        feature.append(-1)
+        threshold.append(0.)
+        left.append(position)
+        right.append(position)
+        value.append(0.)
+        if isinstance(node, LeafNode) or node.left_child is None:
+            value[position] = node.current_value
+            return position
+        condition = node.left_child.split.most_recent_split_condition()
+        lte_child, gt_child = node.left_child, node.right_child
+        if condition.operator == gt:
+            lte_child, gt_child = gt_child, lte_child
+        feature[position] = condition.splitting_variable
+        threshold[position] = condition.splitting_value
+        left[position] = add(lte_child)
+        right[position] = add(gt_child)
+        return position
+
+    add(find_root(tree))
+    return (np.array(feature, dtype=np.int32),
+            np.array(threshold, dtype=float),
+            np.array(left, dtype=np.int32),
+            np.array(right, dtype=np.int32),
+            np.array(value, dtype=float))
+
+
+def tree_arrays(tree) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flat arrays of either a live `Tree` or a stored snapshot of one
+    """
+    if isinstance(tree, Tree):
+        return flatten_tree(tree)
+    return tree.arrays()
+
+
+def _depth(left: np.ndarray, right: np.ndarray, feature: np.ndarray) -> int:
+    depth = np.zeros(len(feature), dtype=np.int32)
+    for position in range(len(feature)):
+        if feature[position] >= 0:
+            depth[left[position]] = depth[position] + 1
+            depth[right[position]] = depth[position] + 1
+    return int(depth.max()) if len(depth) > 0 else 0
+
+
+class CompiledForest:
+    """
+    Flat array representation of a set of posterior samples of a sum of trees
+
+    All nodes of all trees of all samples are stored in the same arrays.
+    Child indices are absolute positions within the arrays, so traversal never needs to know which tree it is in
+
+    Parameters
+    ----------
+    samples: Sequence[Sequence[Tree]]
+        For each posterior sample, the trees making up the sum of trees
+        Either live trees or `TreeSnapshot`s
+
+    Attributes
+    ----------
+    feature, threshold, left, right, value: np.ndarray
+        Per node arrays, see `flatten_tree`
+    tree_roots: np.ndarray
+        Position of the root node of each tree
+    sample_offsets: np.ndarray
+        Trees `sample_offsets[i]` up to `sample_offsets[i + 1]` belong to sample `i`
+    """
+
+    def __init__(self, samples: Sequence[Sequence[Tree]]):
+        features, thresholds, lefts, rights, values = [], [], [], [], []
+        tree_roots, sample_offsets = [], [0]
+        n_nodes = 0
+        for trees in samples:
+            for tree in trees:
+                feature, threshold, left, right, value = tree_arrays(tree)
+                features.append(feature)
+                thresholds.append(threshold)
+                lefts.append(left + n_nodes)
+                rights.append(right + n_nodes)
+                values.append(value)
+                tree_roots.append(n_nodes)
+                n_nodes += len(feature)
+            sample_offsets.append(len(tree_roots))
+
+        def concatenate(arrays, dtype):
+            return np.concatenate(arrays).astype(dtype) if len(arrays) > 0 else np.zeros(0, dtype=dtype)
+
+        self.feature = concatenate(features, np.int32)
+        self.threshold = concatenate(thresholds, float)
+        self.left = concatenate(lefts, np.int32)
+        self.right = concatenate(rights, np.int32)
+        self.value = concatenate(values, float)
+        self.tree_roots = np.array(tree_roots, dtype=np.int64)
+        self.sample_offsets = np.array(sample_offsets, dtype=np.int64)
+        self.tree_samples = np.repeat(np.arange(len(samples)), np.diff(self.sample_offsets))
+        self.max_depth = _depth(self.left, self.right, self.feature)
+
+    @property
+    def n_samples(self) -> int:
+        return len(self.sample_offsets) - 1
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.tree_roots)
+
+    def _leaf_values(self, X: np.ndarray, roots: np.ndarray) -> np.ndarray:
+        """
+        Push every row of X through every tree in `roots` one level at a time
+
+        Returns
+        -------
+        np.ndarray
+            Leaf value reached by each (tree, row) pair, shape (len(roots), len(X))
+        """
+        node = np.repeat(roots[:, None], len(X), axis=1)
+        rows = np.arange(len(X))[None, :]
+        for _ in range(self.max_depth):
+            feature = self.feature[node]
+            internal = feature >= 0
+            if not internal.any():
+                break
+            x = X[rows, np.maximum(feature, 0)]
+            next_node = np.where(x <= self.threshold[node], self.left[node], self.right[node])
+            node = np.where(internal, next_node, node)
+        return self.value[node]
+
+    def _blocks(self, n_rows: int, max_block_size: int):
+        row_block = max(1, min(n_rows, 65536))
+        tree_block = max(1, max_block_size // row_block)
+        for row_start in range(0, n_rows, row_block):
+            for tree_start in range(0, self.n_trees, tree_block):
+                yield slice(row_start, row_start + row_block), slice(tree_start, tree_start + tree_block)
+
+    def predict(self, X: np.ndarray, max_block_size: int=2 ** 22) -> np.ndarray:
+        """
+        Prediction of every posterior sample for every row of X
+
+        Parameters
+        ----------
+        X: np.ndarray
+            Covariate matrix
+        max_block_size: int
+            Maximum number of (tree, row) pairs traversed at once, bounds the memory used
+
+        Returns
+        -------
+        np.ndarray
+            Predictions with shape (n_samples, n_rows)
+        """
+        X = np.asarray(X, dtype=float)
+        output = np.zeros((self.n_samples, len(X)))
+        for rows, trees in self._blocks(len(X), max_block_size):
+            values = self._leaf_values(X[rows], self.tree_roots[trees])
+            samples = self.tree_samples[trees]
+            starts = np.flatnonzero(np.r_[True, samples[1:] != samples[:-1]])
+            output[samples[starts], rows] += np.add.reduceat(values, starts, axis=0)
+        return output
+
+    def predict_mean(self, X: np.ndarray, max_block_size: int=2 ** 22) -> np.ndarray:
+        """
+        Posterior mean prediction for every row of X
+        Doesn't materialize the per sample predictions, so memory only scales with the number of rows
+        """
+        X = np.asarray(X, dtype=float)
+        output = np.zeros(len(X))
+        for rows, trees in self._blocks(len(X), max_block_size):
+            output[rows] += self._leaf_values(X[rows], self.tree_roots[trees]).sum(axis=0)
+        return output / max(self.n_samples, 1)
+
+
+def compile_forest(model_samples: List, trees_attribute: str="trees") -> CompiledForest:
+    """
+    Compile the trees of a list of stored model samples
+
+    Parameters
+    ----------
+    model_samples: List[Model]
+        Posterior samples, e.g. `SklearnModel.model_samples` or `SklearnModel.model_samples_cgm`
+    trees_attribute: str
+        Which set of trees to compile, i.e. "trees" for regression or "trees_g" / "trees_h" for the causal model
+    """
+    return CompiledForest([getattr(sample, trees_attribute) for sample in model_samples])
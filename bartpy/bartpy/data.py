@@ -1,5 +1,6 @@
+from copy import copy
 from operator import gt, le
-from typing import Any, List, Optional, Union
+from typing import Any, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -8,6 +9,10 @@ from bartpy.bartpy.errors import NoSplittableVariableException
 from bartpy.bartpy.splitcondition import SplitCondition
 
 
+# Rows looked at before falling back to a full min / max when checking whether a feature is constant in a split
+SPLITTABLE_HEAD_ROWS = 8
+
+
 def is_not_constant(series: np.ndarray) -> bool:
     """
     Quickly identify whether a series contains more than 1 distinct value
@@ -65,18 +70,214 @@ def format_covariate_matrix(X: Union[np.ndarray, pd.DataFrame]) -> np.ndarray:
     return output
 
 
+def quantile_cutpoints(X: np.ndarray, numcut: int) -> List[np.ndarray]:
+    """
+    At most `numcut` candidate split points per covariate, placed at evenly spaced quantiles
+    Covariates with no more than `numcut` distinct values are cut between every pair of adjacent values
+
+    Parameters
+    ----------
+    X: np.ndarray
+        Covariate matrix
+    numcut: int
+        Maximum number of cutpoints per covariate
+
+    Returns
+    -------
+    List[np.ndarray]
+        Sorted cutpoints of each covariate
+    """
+    #print("enter bartpy/bartpy/data.py quantile_cutpoints")
+    if numcut < 1 or numcut >= np.iinfo(np.uint16).max:
+        raise ValueError("numcut must be between 1 and {}".format(np.iinfo(np.uint16).max - 1))
+    X = format_covariate_matrix(X)
+    output = []
+    for i in range(X.shape[1]):
+        values = np.unique(X[:, i])
+        if len(values) - 1 <= numcut:
+            cutpoints = values[:-1]
+        else:
+            cutpoints = np.unique(np.quantile(X[:, i], np.linspace(0, 1, numcut + 2)[1:-1]))
+            # A cut at the maximum wouldn't separate anything
+            cutpoints = cutpoints[cutpoints < values[-1]]
+        output.append(cutpoints)
+    #print("-exit bartpy/bartpy/data.py quantile_cutpoints")
+    return output
+
+
+def bin_covariate_matrix(X: Union[np.ndarray, pd.DataFrame], cutpoints: List[np.ndarray]) -> np.ndarray:
+    """
+    Replace each covariate by the number of its cutpoints strictly below the value
+
+    A bin code `c` is at most `k` exactly when the raw value is at most `cutpoints[k]`, so splits on the codes
+    are splits on the cutpoints. Codes are stored as uint8 when they fit, otherwise uint16
+
+    Parameters
+    ----------
+    X: np.ndarray
+        Covariate matrix, either training data or new data to predict for
+    cutpoints: List[np.ndarray]
+        Cutpoints of each covariate, see `quantile_cutpoints`
+    """
+    #print("enter bartpy/bartpy/data.py bin_covariate_matrix")
+    X = format_covariate_matrix(X)
+    max_code = max([len(x) for x in cutpoints] + [0])
+    dtype = np.uint8 if max_code <= np.iinfo(np.uint8).max else np.uint16
+    output = np.empty(X.shape, dtype=dtype)
+    for i, column_cutpoints in enumerate(cutpoints):
+        output[:, i] = np.searchsorted(column_cutpoints, X[:, i], side="left")
+    #print("-exit bartpy/bartpy/data.py bin_covariate_matrix")
+    return output
+
+
 def make_bartpy_data(X: Union[np.ndarray, pd.DataFrame],
                      y: np.ndarray,
-                     normalize: bool=True) -> 'Data':
+                     normalize: bool=True,
+                     numcut: Optional[int]=None) -> 'Data':
+    """
+    Parameters
+    ----------
+    numcut: int
+        If passed, the covariates are binned onto at most `numcut` quantile cutpoints each, see `quantile_cutpoints`
+    """
     #print("enter bartpy/bartpy/data.py make_bartpy_data")
     
     X = format_covariate_matrix(X)
+    if numcut is not None:
+        X = bin_covariate_matrix(X, quantile_cutpoints(X, numcut))
     y = y.astype(float)
     output = Data(X, y, normalize=normalize)
     #print("-exit bartpy/bartpy/data.py make_bartpy_data")
     return output
 
 
+def mask_to_idx(mask: np.ndarray) -> np.ndarray:
+    """
+    Convert a mask (True for rows outside of the split) into the array of rows inside the split
+    """
+    #print("enter bartpy/bartpy/data.py mask_to_idx")
+    output = np.flatnonzero(~mask)
+    #print("-exit bartpy/bartpy/data.py mask_to_idx")
+    return output
+
+
+def idx_to_mask(idx: np.ndarray, n: int) -> np.ndarray:
+    """
+    Convert the array of rows inside a split into a full length mask (True for rows outside of the split)
+    Only needed for backwards compatibility, node membership is held as row indices
+    """
+    #print("enter bartpy/bartpy/data.py idx_to_mask")
+    output = np.ones(n, dtype=bool)
+    output[idx] = False
+    #print("-exit bartpy/bartpy/data.py idx_to_mask")
+    return output
+
+
+def _summed_over_idx(values: np.ndarray, idx: np.ndarray) -> float:
+    """
+    Sum of the values in the rows of the split
+    Gathers only the rows in the split rather than multiplying the full array by a mask
+    """
+    #print("enter bartpy/bartpy/data.py _summed_over_idx")
+    if len(idx) == len(values):
+        output = np.sum(values)
+    else:
+        output = np.sum(np.take(values, idx))
+    #print("-exit bartpy/bartpy/data.py _summed_over_idx")
+    return output
+
+
+def _satisfies(rows: np.ndarray, X: np.ndarray, condition: SplitCondition) -> np.ndarray:
+    """
+    Which of the rows of X meet the split condition
+    """
+    #print("enter bartpy/bartpy/data.py _satisfies")
+    column = X[rows, condition.splitting_variable]
+    if condition.operator == gt:
+        output = column > condition.splitting_value
+    elif condition.operator == le:
+        output = column <= condition.splitting_value
+    else:
+        raise TypeError("Operator type not matched, only {} and {} supported".format(gt, le))
+    #print("-exit bartpy/bartpy/data.py _satisfies")
+    return output
+
+
+def _weighted_summed_over_idx(values: np.ndarray, weights: np.ndarray, idx: np.ndarray) -> float:
+    """
+    Sum of the values in the rows of the split, with each row weighted by `weights`
+    """
+    #print("enter bartpy/bartpy/data.py _weighted_summed_over_idx")
+    if len(idx) == len(values):
+        output = np.dot(weights, values)
+    else:
+        output = np.dot(np.take(weights, idx), np.take(values, idx))
+    #print("-exit bartpy/bartpy/data.py _weighted_summed_over_idx")
+    return output
+
+
+class FeatureValueTable(object):
+    """
+    Sorted distinct values of each feature of the full covariate matrix, along with how often each occurs
+
+    Built lazily per feature from the root covariate matrix, then shared read only by every split of it,
+    including copies of the data made for each tree
+
+    Parameters
+    ----------
+    X: np.ndarray
+        The full covariate matrix
+    """
+
+    def __init__(self, X: np.ndarray):
+        #print("enter bartpy/bartpy/data.py FeatureValueTable __init__")
+        self._X = X
+        self._values = [None] * X.shape[1]
+        self._counts = [None] * X.shape[1]
+        self._sorted_idx = [None] * X.shape[1]
+        #print("-exit bartpy/bartpy/data.py FeatureValueTable __init__")
+
+    def __deepcopy__(self, memo) -> 'FeatureValueTable':
+        return self
+
+    def _build(self, i: int) -> None:
+        #print("enter bartpy/bartpy/data.py FeatureValueTable _build")
+        if self._values[i] is None:
+            self._values[i], self._counts[i] = np.unique(self._X[:, i], return_counts=True)
+        #print("-exit bartpy/bartpy/data.py FeatureValueTable _build")
+
+    def values(self, i: int) -> np.ndarray:
+        #print("enter bartpy/bartpy/data.py FeatureValueTable values")
+        self._build(i)
+        #print("-exit bartpy/bartpy/data.py FeatureValueTable values")
+        return self._values[i]
+
+    def counts(self, i: int) -> np.ndarray:
+        #print("enter bartpy/bartpy/data.py FeatureValueTable counts")
+        self._build(i)
+        #print("-exit bartpy/bartpy/data.py FeatureValueTable counts")
+        return self._counts[i]
+
+    def sorted_idx(self, i: int) -> np.ndarray:
+        """
+        Every row of the matrix, in ascending order of the feature, ties kept in row order
+        """
+        #print("enter bartpy/bartpy/data.py FeatureValueTable sorted_idx")
+        if self._sorted_idx[i] is None:
+            self._sorted_idx[i] = np.argsort(self._X[:, i], kind="stable")
+        #print("-exit bartpy/bartpy/data.py FeatureValueTable sorted_idx")
+        return self._sorted_idx[i]
+
+    def is_unique(self, i: int) -> bool:
+        """
+        Whether no value of the feature is repeated in the full matrix, in which case none is in any split of it either
+        """
+        #print("enter bartpy/bartpy/data.py FeatureValueTable is_unique")
+        output = len(self.values(i)) == self._X.shape[0]
+        #print("-exit bartpy/bartpy/data.py FeatureValueTable is_unique")
+        return output
+
+
 class CovariateMatrix(object):
 
     def __init__(self,
@@ -84,14 +285,26 @@ class CovariateMatrix(object):
                  mask: np.ndarray,
                  n_obsv: int,
                  unique_columns: List[int],
-                 splittable_variables: List[int]):
+                 splittable_variables: Optional[Union[np.ndarray, List[Optional[bool]]]],
+                 idx: Optional[np.ndarray]=None,
+                 value_table: Optional[FeatureValueTable]=None,
+                 parent: Optional['CovariateMatrix']=None,
+                 condition: Optional[SplitCondition]=None):
         #print("enter bartpy/bartpy/data.py CovariateMatrix __init__")
-        
+
         if type(X) == pd.DataFrame:
             X: pd.DataFrame = X
             X = X.values
 
+        if idx is None:
+            if mask is None:
+                idx = np.arange(X.shape[0])
+            else:
+                idx = mask_to_idx(mask)
         self._X = X
+        self._idx = idx
+        if n_obsv is None:
+            n_obsv = len(idx)
         self._n_obsv = n_obsv
         self._n_features = X.shape[1]
         self._mask = mask
@@ -101,22 +314,45 @@ class CovariateMatrix(object):
             self._unique_columns = [x if x is True else None for x in unique_columns]
         else:
             self._unique_columns = [None for _ in range(self._n_features)]
-        if splittable_variables is not None:
-            self._splittable_variables = [x if x is False else None for x in splittable_variables]
+        # Features that were constant in the parent split are constant here too, so only the rest need checking
+        if isinstance(splittable_variables, np.ndarray):
+            self._splittable_candidates = splittable_variables
+        elif splittable_variables is not None:
+            self._splittable_candidates = np.array([x is not False for x in splittable_variables], dtype=bool)
         else:
-            self._splittable_variables = [None for _ in range(self._n_features)]
-        self._max_values = [None] * self._n_features
+            self._splittable_candidates = np.ones(self._n_features, dtype=bool)
+        # Bitset of the features with more than one distinct value in the split, filled on first use
+        self._splittable_variables = None
         self._X_column_cache = [None] * self._n_features
-        self._max_value_cache = [None] * self._n_features
-        self._X_cache = None
+        self._sorted_column_cache = [None] * self._n_features
+        # Split this matrix was made from, so the presorted rows of a feature can be partitioned rather than sorted
+        self._parent = parent
+        self._condition = condition
+        self._sorted_idx_cache = [None] * self._n_features
+        self._split_ends_cache = [None] * self._n_features
+        self._max_value_cache = np.full(self._n_features, np.nan)
+        if value_table is None:
+            value_table = FeatureValueTable(X)
+        self._value_table = value_table
         #print("-exit bartpy/bartpy/data.py CovariateMatrix __init__")
 
     @property
     def mask(self) -> np.ndarray:
         #print("enter bartpy/bartpy/data.py CovariateMatrix mask")
+        if self._mask is None:
+            self._mask = idx_to_mask(self._idx, self._X.shape[0])
         #print("-exit bartpy/bartpy/data.py CovariateMatrix mask")
         return self._mask
 
+    @property
+    def idx(self) -> np.ndarray:
+        """
+        Rows of the full covariate matrix that fall into the split
+        """
+        #print("enter bartpy/bartpy/data.py CovariateMatrix idx")
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix idx")
+        return self._idx
+
     @property
     def values(self) -> np.ndarray:
         #print("enter bartpy/bartpy/data.py CovariateMatrix values")
@@ -125,11 +361,127 @@ class CovariateMatrix(object):
 
     def get_column(self, i: int) -> np.ndarray:
         #print("enter bartpy/bartpy/data.py CovariateMatrix get_column")
-        
-        if self._X_cache is None:
-            self._X_cache = self.values[~self.mask, :]
+
+        if self._X_column_cache[i] is None:
+            self._X_column_cache[i] = self.values[self._idx, i]
         #print("-exit bartpy/bartpy/data.py CovariateMatrix get_column")
-        return self._X_cache[:, i]
+        return self._X_column_cache[i]
+
+    def sorted_column(self, i: int) -> np.ndarray:
+        """
+        Values of the feature in the split in ascending order, so counts and ranks are a binary search away
+        Read off the presorted rows of `sorted_idx` rather than sorted again
+        """
+        #print("enter bartpy/bartpy/data.py CovariateMatrix sorted_column")
+        if self._sorted_column_cache[i] is None:
+            self._sorted_column_cache[i] = self._X[self.sorted_idx(i), i]
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix sorted_column")
+        return self._sorted_column_cache[i]
+
+    def sorted_idx(self, i: int) -> np.ndarray:
+        """
+        Rows of the split in ascending order of the feature, ties kept in row order
+
+        The root takes the presorted rows of the shared value table, every other split keeps the rows of
+        its parent's order that meet its split condition, a stable partition costing O(parent size)
+        """
+        #print("enter bartpy/bartpy/data.py CovariateMatrix sorted_idx")
+        if self._sorted_idx_cache[i] is None:
+            if self._parent is not None:
+                parent_idx = self._parent.sorted_idx(i)
+                self._sorted_idx_cache[i] = parent_idx[_satisfies(parent_idx, self._X, self._condition)]
+            elif len(self._idx) == self._X.shape[0]:
+                self._sorted_idx_cache[i] = self._value_table.sorted_idx(i)
+            else:
+                self._sorted_idx_cache[i] = self._idx[np.argsort(self._X[self._idx, i], kind="stable")]
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix sorted_idx")
+        return self._sorted_idx_cache[i]
+
+    def split_ends(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Presorted rows of the feature, and the last position in them of each run of equal values bar the largest
+        Summing anything over the presorted rows up to one of these positions gives its left child total
+        """
+        #print("enter bartpy/bartpy/data.py CovariateMatrix split_ends")
+        order = self.sorted_idx(i)
+        if self._split_ends_cache[i] is None:
+            column = self._X[order, i]
+            self._split_ends_cache[i] = np.flatnonzero(column[1:] != column[:-1])
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix split_ends")
+        return order, self._split_ends_cache[i]
+
+    def cumulative_sums(self, i: int, values: Optional[np.ndarray]=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Left child statistics of every possible split of the feature, in one pass over the presorted rows
+
+        Parameters
+        ----------
+        i: int
+            Feature to split on
+        values: np.ndarray
+            Full length array to sum, the rows are counted if not passed
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Each distinct value of the feature in the split apart from the largest, i.e. every non degenerate
+            splitting value, and the sum of `values` over the rows less than or equal to it
+        """
+        #print("enter bartpy/bartpy/data.py CovariateMatrix cumulative_sums")
+        order, ends = self.split_ends(i)
+        if values is None:
+            sums = ends + 1
+        else:
+            sums = np.cumsum(np.take(values, order))[ends]
+        output = self._X[order[ends], i], sums
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix cumulative_sums")
+        return output
+
+    @property
+    def value_table(self) -> FeatureValueTable:
+        #print("enter bartpy/bartpy/data.py CovariateMatrix value_table")
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix value_table")
+        return self._value_table
+
+    @property
+    def splittable_mask(self) -> np.ndarray:
+        """
+        Boolean mask over the features, True for features with more than one distinct value in the split
+
+        Only the features still splittable in the parent split are checked. Features that already take
+        two values in the first few rows are settled straight away, the rest get one vectorized min / max
+        over the rows of the split, which also fills the cache of column maxima
+        """
+        #print("enter bartpy/bartpy/data.py CovariateMatrix splittable_mask")
+        if self._splittable_variables is None:
+            splittable = np.zeros(self._n_features, dtype=bool)
+            candidates = np.flatnonzero(self._splittable_candidates)
+            if len(candidates) > 0 and len(self._idx) > 1:
+                head = self._X[np.ix_(self._idx[:SPLITTABLE_HEAD_ROWS], candidates)]
+                differs = (head != head[0]).any(axis=0)
+                splittable[candidates[differs]] = True
+                undecided = candidates[~differs]
+                if len(undecided) > 0 and len(self._idx) > SPLITTABLE_HEAD_ROWS:
+                    rows = self._X[np.ix_(self._idx, undecided)]
+                    max_values = rows.max(axis=0)
+                    splittable[undecided] = max_values > rows.min(axis=0)
+                    self._max_value_cache[undecided] = max_values
+            self._splittable_variables = splittable
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix splittable_mask")
+        return self._splittable_variables
+
+    @property
+    def inherited_splittable_mask(self) -> np.ndarray:
+        """
+        What children of the split inherit, the checked mask if available and otherwise the candidates
+        """
+        #print("enter bartpy/bartpy/data.py CovariateMatrix inherited_splittable_mask")
+        if self._splittable_variables is not None:
+            output = self._splittable_variables
+        else:
+            output = self._splittable_candidates
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix inherited_splittable_mask")
+        return output
 
     def splittable_variables(self) -> List[int]:
         """
@@ -142,35 +494,33 @@ class CovariateMatrix(object):
         """
         #print("enter bartpy/bartpy/data.py CovariateMatrix splittable_variables")
         
-        for i in range(0, self._n_features):
-            if self._splittable_variables[i] is None:
-                self._splittable_variables[i] = is_not_constant(self.get_column(i))
-        
-        output = [i for (i, x) in enumerate(self._splittable_variables) if x is True]        
+        output = list(np.flatnonzero(self.splittable_mask))
         #print("-exit bartpy/bartpy/data.py CovariateMatrix splittable_variables")
         return output
 
     @property
     def n_splittable_variables(self) -> int:
         #print("enter bartpy/bartpy/data.py CovariateMatrixn_splittable_variables")
-        output = len(self.splittable_variables())
+        output = int(np.count_nonzero(self.splittable_mask))
         #print("-exit bartpy/bartpy/data.py CovariateMatrixn_splittable_variables")
         return output
 
     def is_at_least_one_splittable_variable(self) -> bool:
         #print("enter bartpy/bartpy/data.py CovariateMatrix is_at_least_one_splittable_variable")
         
-        if any(self._splittable_variables):
-            #print("-exit bartpy/bartpy/data.py CovariateMatrix is_at_least_one_splittable_variable")
-            return True
-        else:
-            output = len(self.splittable_variables()) > 0
-            #print("-exit bartpy/bartpy/data.py CovariateMatrix is_at_least_one_splittable_variable")
-            return output
+        output = bool(self.splittable_mask.any())
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix is_at_least_one_splittable_variable")
+        return output
     
-    def random_splittable_variable(self) -> str:
+    def random_splittable_variable(self, random: Any=np.random) -> str:
         """
         Choose a variable at random from the set of splittable variables
+
+        Parameters
+        ----------
+        random:
+            Either a `np.random.Generator` or the `np.random` module to draw from
+
         Returns
         -------
             str - a variable name that can be split on
@@ -178,7 +528,7 @@ class CovariateMatrix(object):
         #print("enter bartpy/bartpy/data.py CovariateMatrix random_splittable_variable")
         
         if self.is_at_least_one_splittable_variable():
-            output = np.random.choice(np.array(self.splittable_variables()), 1)[0]
+            output = random.choice(np.array(self.splittable_variables()), 1)[0]
             #print("-exit bartpy/bartpy/data.py CovariateMatrix random_splittable_variable")
             return output
         else:
@@ -197,7 +547,11 @@ class CovariateMatrix(object):
         #print("enter bartpy/bartpy/data.py CovariateMatrix is_column_unique")
         
         if self._unique_columns[i] is None:
-            self._unique_columns[i] = len(np.unique(self.get_column(i))) == self._n_obsv
+            if self._value_table.is_unique(i):
+                self._unique_columns[i] = True
+            else:
+                column = self.sorted_column(i)
+                self._unique_columns[i] = bool(np.all(column[1:] != column[:-1]))
         output = self._unique_columns[i]
         #print("-exit bartpy/bartpy/data.py CovariateMatrix is_column_unique")
         return output
@@ -205,13 +559,13 @@ class CovariateMatrix(object):
     def max_value_of_column(self, i: int):
         #print("enter bartpy/bartpy/data.py CovariateMatrix max_value_of_column")
         
-        if self._max_value_cache[i] is None:
+        if np.isnan(self._max_value_cache[i]):
             self._max_value_cache[i] = self.get_column(i).max()
         output = self._max_value_cache[i]
         #print("-exit bartpy/bartpy/data.py CovariateMatrix max_value_of_column")
         return output
 
-    def random_splittable_value(self, variable: int) -> Any:
+    def random_splittable_value(self, variable: int, random: Any=np.random) -> Any:
         """
         Return a random value of a variable
         Useful for choosing a variable to split on
@@ -220,6 +574,8 @@ class CovariateMatrix(object):
         ----------
         variable - str
             Name of the variable to split on
+        random:
+            Either a `np.random.Generator` or the `np.random` module to draw from
 
         Returns
         -------
@@ -231,14 +587,14 @@ class CovariateMatrix(object):
         """
         #print("enter bartpy/bartpy/data.py CovariateMatrix random_splittable_value")
         
-        if variable not in self.splittable_variables():
+        if not self.splittable_mask[variable]:
             raise NoSplittableVariableException()
-        max_value = self.max_value_of_column(variable)
-        candidate = np.random.choice(self.get_column(variable))
-        while candidate == max_value:
-            candidate = np.random.choice(self.get_column(variable))
+        # Uniform over the rows whose value is below the maximum, which sit at the front of the sorted column
+        column = self.sorted_column(variable)
+        n_below_max = np.searchsorted(column, column[-1], side="left")
+        output = column[random.choice(n_below_max)]
         #print("-exit bartpy/bartpy/data.py CovariateMatrix random_splittable_value")
-        return candidate
+        return output
 
     def proportion_of_value_in_variable(self, variable: int, value: float) -> float:
         #print("enter bartpy/bartpy/data.py CovariateMatrix proportion_of_value_in_variable")
@@ -248,7 +604,9 @@ class CovariateMatrix(object):
             #print("-exit bartpy/bartpy/data.py CovariateMatrix proportion_of_value_in_variable")
             return output
         else:
-            output = float(np.mean(self.get_column(variable) == value))
+            column = self.sorted_column(variable)
+            n_value = np.searchsorted(column, value, side="right") - np.searchsorted(column, value, side="left")
+            output = n_value / len(column)
             #print("-exit bartpy/bartpy/data.py CovariateMatrix proportion_of_value_in_variable")
             return output
 
@@ -265,6 +623,17 @@ class CovariateMatrix(object):
         #print("-exit bartpy/bartpy/data.py CovariateMatrix update_mask")
         return output
 
+    def update_idx(self, other: SplitCondition) -> np.ndarray:
+        """
+        Rows of the split that remain after applying the split condition
+        Only the rows currently in the split are compared, so cost scales with the size of the node
+        """
+        #print("enter bartpy/bartpy/data.py CovariateMatrix update_idx")
+
+        output = self._idx[_satisfies(self._idx, self.values, other)]
+        #print("-exit bartpy/bartpy/data.py CovariateMatrix update_idx")
+        return output
+
     @property
     def variables(self) -> List[int]:
         #print("enter bartpy/bartpy/data.py CovariateMatrix variables")
@@ -279,30 +648,81 @@ class CovariateMatrix(object):
         return self._n_obsv
 
 
+class SharedTarget(object):
+    """
+    The full length target array, shared by every node of a tree
+
+    Updating the target of any node updates it for the whole tree in one assignment,
+    the version counter lets each node know when its cached sums are out of date
+    """
+
+    def __init__(self, y: np.ndarray):
+        #print("enter bartpy/bartpy/data.py SharedTarget __init__")
+        self.values = y
+        self.version = 0
+        #print("-exit bartpy/bartpy/data.py SharedTarget __init__")
+
+    def update(self, y: np.ndarray) -> None:
+        #print("enter bartpy/bartpy/data.py SharedTarget update")
+        self.values = y
+        self.version += 1
+        #print("-exit bartpy/bartpy/data.py SharedTarget update")
+
+
 class Target(object):
 
-    def __init__(self, y, mask, n_obsv, normalize, y_sum=None):
+    def __init__(self, y, mask, n_obsv, normalize, y_sum=None, idx=None):
         #print("enter bartpy/bartpy/data.py Target __init__")
         
-        if normalize:
+        if isinstance(y, SharedTarget):
+            self._shared = y
+        elif normalize:
             self.original_y_min, self.original_y_max = y.min(), y.max()
-            self._y = self.normalize_y(y)
+            self._shared = SharedTarget(self.normalize_y(y))
         else:
-            self._y = y
+            self._shared = SharedTarget(y)
         #print("######################################### Target._mask=", mask)
-        self._mask = mask
-        self._inverse_mask_int = (~self._mask).astype(int)
+        if idx is None:
+            idx = mask_to_idx(mask) if mask is not None else np.arange(len(self._y))
+        self._idx = idx
+        self._mask_cache = mask
         self._n_obsv = n_obsv
         self.normalize = normalize
         
-        if y_sum is None:
-            self.y_sum_cache_up_to_date = False
-            self._summed_y = None
-        else:
-            self.y_sum_cache_up_to_date = True
-            self._summed_y = y_sum
+        self._cache_version = self._shared.version
+        self._summed_y = y_sum
+        # Sums of the target weighted by each set of precision weights, keyed by name
+        # Like `_summed_y`, these are invalidated whenever the target is updated
+        self._weighted_summed_y = {}
         #print("-exit bartpy/bartpy/data.py Target __init__")
 
+    @property
+    def _y(self) -> np.ndarray:
+        #print("enter bartpy/bartpy/data.py Target _y")
+        #print("-exit bartpy/bartpy/data.py Target _y")
+        return self._shared.values
+
+    @property
+    def shared(self) -> SharedTarget:
+        #print("enter bartpy/bartpy/data.py Target shared")
+        #print("-exit bartpy/bartpy/data.py Target shared")
+        return self._shared
+
+    def _refresh_cache(self) -> None:
+        #print("enter bartpy/bartpy/data.py Target _refresh_cache")
+        if self._cache_version != self._shared.version:
+            self._summed_y = None
+            self._weighted_summed_y = {}
+            self._cache_version = self._shared.version
+        #print("-exit bartpy/bartpy/data.py Target _refresh_cache")
+
+    @property
+    def y_sum_cache_up_to_date(self) -> bool:
+        #print("enter bartpy/bartpy/data.py Target y_sum_cache_up_to_date")
+        self._refresh_cache()
+        #print("-exit bartpy/bartpy/data.py Target y_sum_cache_up_to_date")
+        return self._summed_y is not None
+
     @staticmethod
     def normalize_y(y: np.ndarray) -> np.ndarray:
         """
@@ -368,20 +788,78 @@ class Target(object):
             #print("-exit bartpy/bartpy/data.py Target summed_y")
             return self._summed_y
         else:
-            self._summed_y = np.sum(self._y * self._inverse_mask_int) ############### THIS IS HOW THE MASK IS USED!!!!!!!
-            self.y_sum_cache_up_to_date = True
+            self._summed_y = _summed_over_idx(self._y, self._idx)
             #print("-exit bartpy/bartpy/data.py Target summed_y")
             return self._summed_y
 
+    def weighted_summed_y(self, name: str, weights: np.ndarray) -> float:
+        """
+        Sum of the target in the split, with each row weighted by `weights`
+        Cached under `name` until the target is next updated
+
+        Parameters
+        ----------
+        name: str
+            Key of the cached sum, one per set of weights
+        weights: np.ndarray
+            Full length array of weights
+        """
+        #print("enter bartpy/bartpy/data.py Target weighted_summed_y")
+        self._refresh_cache()
+        if name not in self._weighted_summed_y:
+            self._weighted_summed_y[name] = _weighted_summed_over_idx(self._y, weights, self._idx)
+        #print("-exit bartpy/bartpy/data.py Target weighted_summed_y")
+        return self._weighted_summed_y[name]
+
+    def cached_weighted_summed_y(self, name: str) -> Optional[float]:
+        #print("enter bartpy/bartpy/data.py Target cached_weighted_summed_y")
+        self._refresh_cache()
+        #print("-exit bartpy/bartpy/data.py Target cached_weighted_summed_y")
+        return self._weighted_summed_y.get(name)
+
+    def set_weighted_summed_y(self, name: str, value: Optional[float]) -> None:
+        #print("enter bartpy/bartpy/data.py Target set_weighted_summed_y")
+        self._refresh_cache()
+        if value is not None:
+            self._weighted_summed_y[name] = value
+        #print("-exit bartpy/bartpy/data.py Target set_weighted_summed_y")
+
+    def shared_copy(self) -> 'Target':
+        """
+        A target over the same rows starting from the same values, that can then be updated independently of this one
+        The values are only shared until either target is updated, as updates replace the array rather than writing into it
+        """
+        #print("enter bartpy/bartpy/data.py Target shared_copy")
+        self._refresh_cache()
+        output = copy(self)
+        output._shared = SharedTarget(self._shared.values)
+        output._cache_version = output._shared.version
+        output._weighted_summed_y = dict(self._weighted_summed_y)
+        #print("-exit bartpy/bartpy/data.py Target shared_copy")
+        return output
+
     def update_y(self, y) -> None:
         #print("enter bartpy/bartpy/data.py Target update_y")
         #if y is not None:
         #    #print("############################################################# len(y)=", len(y))
         #    #print("#########################################self.y_sum_cache_up_to_date=", self.y_sum_cache_up_to_date)
-        self._y = y
-        self.y_sum_cache_up_to_date = False
+        self._shared.update(y)
         #print("-exit bartpy/bartpy/data.py Target update_y")
 
+    @property
+    def _mask(self) -> np.ndarray:
+        #print("enter bartpy/bartpy/data.py Target _mask")
+        if self._mask_cache is None:
+            self._mask_cache = idx_to_mask(self._idx, len(self._y))
+        #print("-exit bartpy/bartpy/data.py Target _mask")
+        return self._mask_cache
+
+    @property
+    def idx(self) -> np.ndarray:
+        #print("enter bartpy/bartpy/data.py Target idx")
+        #print("-exit bartpy/bartpy/data.py Target idx")
+        return self._idx
+
     @property
     def values(self):
         #print("enter bartpy/bartpy/data.py Target values")
@@ -391,13 +869,14 @@ class Target(object):
     
 class PropensityScore(object):
     
-    def __init__(self, p, mask, n_obsv, p_sum=None):
+    def __init__(self, p, mask, n_obsv, p_sum=None, idx=None):
         #print("enter bartpy/bartpy/data.py PropensityScore __init__")
         
         self._p = p
         #print("######################################### PropensityScore._mask=", mask)
-        self._mask = mask
-        self._inverse_mask_int = (~self._mask).astype(int)
+        if idx is None:
+            idx = mask_to_idx(mask) if mask is not None else np.arange(len(self._p))
+        self._idx = idx
         self._n_obsv = n_obsv
 
         if p_sum is None:
@@ -410,12 +889,12 @@ class PropensityScore(object):
 
     def summed_p(self) -> float:
         #print("enter bartpy/bartpy/data.py PropensityScore summed_p")
-        return np.sum(self._p * self._inverse_mask_int)
+        return _summed_over_idx(self._p, self._idx)
         #if self.p_sum_cache_up_to_date:
         #    #print("-exit bartpy/bartpy/data.py PropensityScore summed_p")
         #    return self._summed_p
         #else:
-        #    self._summed_p = np.sum(self._p * self._inverse_mask_int)
+        #    self._summed_p = _summed_over_idx(self._p, self._idx)
         #    self.p_sum_cache_up_to_date = True
         #    #print("-exit bartpy/bartpy/data.py PropensityScore summed_p")
         #    return self._summed_p
@@ -436,13 +915,14 @@ class PropensityScore(object):
 
 class TreatmentAssignment(object):
     
-    def __init__(self, W, mask, n_obsv, W_sum=None):
+    def __init__(self, W, mask, n_obsv, W_sum=None, idx=None):
         #print("enter bartpy/bartpy/data.py TreatmentAssignment __init__")
         
         self._W = W
         #print("######################################### TreatmentAssignment._mask=", mask)
-        self._mask = mask
-        self._inverse_mask_int = (~self._mask).astype(int)
+        if idx is None:
+            idx = mask_to_idx(mask) if mask is not None else np.arange(len(self._W))
+        self._idx = idx
         self._n_obsv = n_obsv
 
         if W_sum is None:
@@ -460,7 +940,7 @@ class TreatmentAssignment(object):
             #print("-exit bartpy/bartpy/data.py TreatmentAssignment summed_W")
             return self._summed_W
         else:
-            self._summed_W = np.sum(self._W * self._inverse_mask_int)
+            self._summed_W = _summed_over_idx(self._W, self._idx)
             self.W_sum_cache_up_to_date = True
             #print("-exit bartpy/bartpy/data.py TreatmentAssignment summed_W")
             return self._summed_W
@@ -479,6 +959,64 @@ class TreatmentAssignment(object):
         return self._W
 
 
+class PrecisionWeights(object):
+    """
+    Per row precision weights of the causal gaussian mixture likelihood, with the residual variance factored out
+    i.e. 1 / sigma_i^2 = weight_i / sigma^2
+
+    The weights only depend on the treatment assignment and propensity score, so the sum over a split never
+    needs to be invalidated, and can be carried from a parent to its children
+    """
+
+    def __init__(self, w, idx, w_sum=None):
+        #print("enter bartpy/bartpy/data.py PrecisionWeights __init__")
+        self._w = w
+        self._idx = idx
+        self._summed_w = w_sum
+        #print("-exit bartpy/bartpy/data.py PrecisionWeights __init__")
+
+    def summed_w(self) -> float:
+        #print("enter bartpy/bartpy/data.py PrecisionWeights summed_w")
+        if self._summed_w is None:
+            self._summed_w = _summed_over_idx(self._w, self._idx)
+        #print("-exit bartpy/bartpy/data.py PrecisionWeights summed_w")
+        return self._summed_w
+
+    @property
+    def cached_summed_w(self) -> Optional[float]:
+        #print("enter bartpy/bartpy/data.py PrecisionWeights cached_summed_w")
+        #print("-exit bartpy/bartpy/data.py PrecisionWeights cached_summed_w")
+        return self._summed_w
+
+    @property
+    def values(self):
+        #print("enter bartpy/bartpy/data.py PrecisionWeights values")
+        #print("-exit bartpy/bartpy/data.py PrecisionWeights values")
+        return self._w
+
+
+def precision_weights_g(W: np.ndarray, p: np.ndarray) -> np.ndarray:
+    """
+    Precision weights of the transformed outcome for the g (treatment effect) trees
+    sigma_g_i^2 = sigma^2 * (W / p^2 + (1 - W) / (1 - p)^2)
+    """
+    #print("enter bartpy/bartpy/data.py precision_weights_g")
+    output = 1. / (W / (p ** 2) + (1 - W) / ((1 - p) ** 2))
+    #print("-exit bartpy/bartpy/data.py precision_weights_g")
+    return output
+
+
+def precision_weights_h(p: np.ndarray) -> np.ndarray:
+    """
+    Precision weights of the transformed outcome for the h (prognostic) trees
+    sigma_h_i^2 = sigma^2 / (p^2 * (1 - p)^2)
+    """
+    #print("enter bartpy/bartpy/data.py precision_weights_h")
+    output = (p ** 2) * ((1 - p) ** 2)
+    #print("-exit bartpy/bartpy/data.py precision_weights_h")
+    return output
+
+
 class Data(object):
     """
     Encapsulates the data within a split of feature space.
@@ -503,7 +1041,10 @@ class Data(object):
                  mask: Optional[np.ndarray]=None,
                  normalize: bool=False,
                  unique_columns: List[int]=None,
-                 splittable_variables: Optional[List[Optional[bool]]]=None,
+                 splittable_variables: Optional[Union[np.ndarray, List[Optional[bool]]]]=None,
+                 value_table: Optional[FeatureValueTable]=None,
+                 parent_X: Optional[CovariateMatrix]=None,
+                 condition: Optional[SplitCondition]=None,
                  y_sum: float=None,
                  n_obsv: int=None,
                  W: np.ndarray=None,
@@ -514,19 +1055,31 @@ class Data(object):
                  #y_tilde_g_sum: float=None,
                  #g_of_X: np.ndarray=None,
                  #y_tilde_h_sum: float=None,
+                 idx: Optional[np.ndarray]=None,
+                 weights_g: np.ndarray=None,
+                 weights_h: np.ndarray=None,
+                 weights_g_sum: float=None,
+                 weights_h_sum: float=None,
+                 y_tilde_g_sum: float=None,
+                 y_tilde_h_sum: float=None,
                 ):
         #print("enter bartpy/bartpy/data.py Data __init__")
         
-        if mask is None:
-            mask = np.zeros_like(y).astype(bool)
-        self._mask: np.ndarray = mask
+        if idx is None:
+            if mask is None:
+                idx = np.arange(len(y))
+            else:
+                idx = mask_to_idx(mask)
+        self._idx: np.ndarray = idx
+        self._mask: Optional[np.ndarray] = mask
 
         if n_obsv is None:
-            n_obsv = (~self.mask).astype(int).sum()
+            n_obsv = len(idx)
         self._n_obsv = n_obsv
         #print("Initializing data with n_obs = ", n_obsv)
-        self._X = CovariateMatrix(X, mask, n_obsv, unique_columns, splittable_variables)
-        self._y = Target(y, mask, n_obsv, normalize, y_sum)
+        self._X = CovariateMatrix(X, mask, n_obsv, unique_columns, splittable_variables, idx=idx, value_table=value_table,
+                                  parent=parent_X, condition=condition)
+        self._y = Target(y, mask, n_obsv, normalize, y_sum, idx=idx)
         
         condition_1 = W is not None
         condition_2 = p is not None
@@ -540,11 +1093,21 @@ class Data(object):
             #    W=W, 
             #    p=p, 
             #    h_of_X=h_of_X)
-            self._W = TreatmentAssignment(W, mask, n_obsv, W_sum=0) ###### WILL WANT TO PASS self._y
-            self._p = PropensityScore(p, mask, n_obsv, p_sum=0)
+            self._W = TreatmentAssignment(W, mask, n_obsv, W_sum=0, idx=idx) ###### WILL WANT TO PASS self._y
+            self._p = PropensityScore(p, mask, n_obsv, p_sum=0, idx=idx)
+            if weights_g is None:
+                weights_g = precision_weights_g(W, p)
+            if weights_h is None:
+                weights_h = precision_weights_h(p)
+            self._weights_g = PrecisionWeights(weights_g, idx, weights_g_sum)
+            self._weights_h = PrecisionWeights(weights_h, idx, weights_h_sum)
+            self._y.set_weighted_summed_y("g", y_tilde_g_sum)
+            self._y.set_weighted_summed_y("h", y_tilde_h_sum)
         else:
             self._W=None
             self._p=None
+            self._weights_g = None
+            self._weights_h = None
         #print("-exit bartpy/bartpy/data.py Data __init__")
     
     @property
@@ -586,9 +1149,32 @@ class Data(object):
     @property
     def mask(self) -> np.ndarray:
         #print("enter bartpy/bartpy/data.py Data mask")
+        if self._mask is None:
+            self._mask = idx_to_mask(self._idx, self._X.values.shape[0])
         #print("-exit bartpy/bartpy/data.py Data mask")
         return self._mask
 
+    @property
+    def idx(self) -> np.ndarray:
+        """
+        Rows of the full data set that fall into the split
+        """
+        #print("enter bartpy/bartpy/data.py Data idx")
+        #print("-exit bartpy/bartpy/data.py Data idx")
+        return self._idx
+
+    @property
+    def n_obsv(self) -> int:
+        #print("enter bartpy/bartpy/data.py Data n_obsv")
+        #print("-exit bartpy/bartpy/data.py Data n_obsv")
+        return self._X.n_obsv
+
+    def summed_y(self) -> float:
+        #print("enter bartpy/bartpy/data.py Data summed_y")
+        output = self._y.summed_y()
+        #print("-exit bartpy/bartpy/data.py Data summed_y")
+        return output
+
     def update_y(self, y: np.ndarray) -> None:
         #print("enter bartpy/bartpy/data.py Data update_y")
         self._y.update_y(y)
@@ -616,6 +1202,105 @@ class Data(object):
     #    #print("-exit bartpy/bartpy/data.py Data update_y_tilde_h_g_function")
     #    pass
     
+    @property
+    def weights_g(self) -> PrecisionWeights:
+        #print("enter bartpy/bartpy/data.py Data weights_g")
+        #print("-exit bartpy/bartpy/data.py Data weights_g")
+        return self._weights_g
+
+    @property
+    def weights_h(self) -> PrecisionWeights:
+        #print("enter bartpy/bartpy/data.py Data weights_h")
+        #print("-exit bartpy/bartpy/data.py Data weights_h")
+        return self._weights_h
+
+    def summed_weights_g(self) -> float:
+        """
+        Sum over the split of the g tree precision weights, sigma^2 * sum(1 / sigma_g_i^2)
+        """
+        #print("enter bartpy/bartpy/data.py Data summed_weights_g")
+        output = self._weights_g.summed_w()
+        #print("-exit bartpy/bartpy/data.py Data summed_weights_g")
+        return output
+
+    def summed_weights_h(self) -> float:
+        """
+        Sum over the split of the h tree precision weights, sigma^2 * sum(1 / sigma_h_i^2)
+        """
+        #print("enter bartpy/bartpy/data.py Data summed_weights_h")
+        output = self._weights_h.summed_w()
+        #print("-exit bartpy/bartpy/data.py Data summed_weights_h")
+        return output
+
+    def summed_y_tilde_g(self) -> float:
+        """
+        Precision weighted sum over the split of the current g tree target, sigma^2 * sum(y_i / sigma_g_i^2)
+        """
+        #print("enter bartpy/bartpy/data.py Data summed_y_tilde_g")
+        output = self._y.weighted_summed_y("g", self._weights_g.values)
+        #print("-exit bartpy/bartpy/data.py Data summed_y_tilde_g")
+        return output
+
+    def summed_y_tilde_h(self) -> float:
+        """
+        Precision weighted sum over the split of the current h tree target, sigma^2 * sum(y_i / sigma_h_i^2)
+        """
+        #print("enter bartpy/bartpy/data.py Data summed_y_tilde_h")
+        output = self._y.weighted_summed_y("h", self._weights_h.values)
+        #print("-exit bartpy/bartpy/data.py Data summed_y_tilde_h")
+        return output
+
+    def cumulative_statistics(self, variable: int, weights: Optional[np.ndarray]=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sufficient statistics of the left child of every possible split of the variable, in O(node size)
+        The right child's are the node's totals minus these
+
+        Parameters
+        ----------
+        variable: int
+        weights: np.ndarray
+            Full length precision weights, e.g. `weights_g.values`, rows are counted if not passed
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            splitting values, summed weights (or number of rows) and weighted summed target left of each split
+        """
+        #print("enter bartpy/bartpy/data.py Data cumulative_statistics")
+        order, ends = self._X.split_ends(variable)
+        y = np.take(self._y.shared.values, order)
+        if weights is None:
+            summed_weights = ends + 1
+        else:
+            w = np.take(weights, order)
+            summed_weights = np.cumsum(w)[ends]
+            y *= w
+        splitting_values = self._X.values[order[ends], variable]
+        summed_y = np.cumsum(y)[ends]
+        #print("-exit bartpy/bartpy/data.py Data cumulative_statistics")
+        return splitting_values, summed_weights, summed_y
+
+    def carry_complement(self, left: 'Data', condition: SplitCondition) -> None:
+        """
+        Fill the carry fields of the split condition of the right child from the sums cached in this node
+        The right child's sums are the node's sums minus the left child's, so they never need to be recomputed
+        Only sums that are already cached in this node are carried
+        """
+        #print("enter bartpy/bartpy/data.py Data carry_complement")
+        condition.carry_n_obsv = self.X.n_obsv - left.X.n_obsv
+        if self._y.y_sum_cache_up_to_date:
+            condition.carry_y_sum = self._y.summed_y() - left.y.summed_y()
+        if self._W is not None:
+            if self._weights_g.cached_summed_w is not None:
+                condition.carry_weights_g_sum = self.summed_weights_g() - left.summed_weights_g()
+            if self._weights_h.cached_summed_w is not None:
+                condition.carry_weights_h_sum = self.summed_weights_h() - left.summed_weights_h()
+            if self._y.cached_weighted_summed_y("g") is not None:
+                condition.carry_y_tilde_g_sum = self.summed_y_tilde_g() - left.summed_y_tilde_g()
+            if self._y.cached_weighted_summed_y("h") is not None:
+                condition.carry_y_tilde_h_sum = self.summed_y_tilde_h() - left.summed_y_tilde_h()
+        #print("-exit bartpy/bartpy/data.py Data carry_complement")
+
     def update_p(self, p: np.ndarray) -> None:
         #print("enter bartpy/bartpy/data.py Data update_p")
         self._p.update_p(p)
@@ -626,17 +1311,32 @@ class Data(object):
         self._W.update_W(W)
         #print("-exit bartpy/bartpy/data.py Data update_W")
 
+    def shared_copy(self) -> 'Data':
+        """
+        A copy of the data for a new tree, with its own target but sharing everything else by reference
+
+        The covariates, treatment assignment, propensity scores and precision weights are never written to,
+        and their caches only depend on the rows of the split, so one store serves every tree
+        Only the target changes per tree, as each tree is fit to its own residuals
+        """
+        #print("enter bartpy/bartpy/data.py Data shared_copy")
+        output = copy(self)
+        output._y = self._y.shared_copy()
+        #print("-exit bartpy/bartpy/data.py Data shared_copy")
+        return output
+
     def __add__(self, other: SplitCondition) -> 'Data':
         #print("enter bartpy/bartpy/data.py Data __add__")
-        updated_mask = self.X.update_mask(other)
-        hasattr(self, 'W')
+        updated_idx = self.X.update_idx(other)
         if (self.W is not None) and (self.p.values is not None):
             output = Data(self.X.values,
-                self.y.values,
-                updated_mask,
+                self.y.shared,
                 normalize=False,
                 unique_columns=self._X._unique_columns,
-                splittable_variables=self._X._splittable_variables,
+                splittable_variables=self._X.inherited_splittable_mask,
+                value_table=self._X.value_table,
+                parent_X=self._X,
+                condition=other,
                 y_sum=other.carry_y_sum,
                 n_obsv=other.carry_n_obsv,
                 W=self.W.values,
@@ -646,17 +1346,137 @@ class Data(object):
                 #h_of_X=other.y_tilde_g.h_of_X,
                 #y_tilde_g_sum=other.carry_y_tilde_g_sum, 
                 #g_of_X: np.ndarray=None, y_tilde_h_sum: float=None,
+                idx=updated_idx,
+                weights_g=self.weights_g.values,
+                weights_h=self.weights_h.values,
+                weights_g_sum=other.carry_weights_g_sum,
+                weights_h_sum=other.carry_weights_h_sum,
+                y_tilde_g_sum=other.carry_y_tilde_g_sum,
+                y_tilde_h_sum=other.carry_y_tilde_h_sum,
             )
         else:
             output = Data(self.X.values,
-                    self.y.values,
-                    updated_mask,
+                    self.y.shared,
                     normalize=False,
                     unique_columns=self._X._unique_columns,
-                    splittable_variables=self._X._splittable_variables,
+                    splittable_variables=self._X.inherited_splittable_mask,
+                    value_table=self._X.value_table,
+                    parent_X=self._X,
+                    condition=other,
                     y_sum=other.carry_y_sum,
-                    n_obsv=other.carry_n_obsv)
+                    n_obsv=other.carry_n_obsv,
+                    idx=updated_idx)
         
         #print("##################################################### self.X.values.shape", self.X.values.shape)
         #print("-exit bartpy/bartpy/data.py Data __add__")
         return output
+
+
+class SplitStatistics(object):
+    """
+    Sufficient statistics of one side of a proposed split, without building the child node
+
+    The left side is summed over the rows kept by the split condition, the right side is the parent's
+    cached sums minus the left side's, so the proposal costs one pass over the node's rows.
+    Sums are computed lazily and are only valid until the target is next updated.
+    Has the same summary interface as `Data`, so the likelihood ratios can be computed from either
+
+    Parameters
+    ----------
+    parent: Data
+        Data of the leaf node being split
+    idx: np.ndarray
+        Rows of the parent kept by the split condition, or None for the complement of `left`
+    left: SplitStatistics
+        The other side of the split, when this is the complement
+    """
+
+    def __init__(self, parent: Data, idx: np.ndarray=None, left: 'SplitStatistics'=None):
+        #print("enter bartpy/bartpy/data.py SplitStatistics __init__")
+        if (idx is None) == (left is None):
+            raise TypeError("Split statistics need exactly one of idx or left")
+        self._parent = parent
+        self._idx = idx
+        self._left = left
+        self._sums = {}
+        #print("-exit bartpy/bartpy/data.py SplitStatistics __init__")
+
+    def complement(self) -> 'SplitStatistics':
+        #print("enter bartpy/bartpy/data.py SplitStatistics complement")
+        output = SplitStatistics(self._parent, left=self)
+        #print("-exit bartpy/bartpy/data.py SplitStatistics complement")
+        return output
+
+    @property
+    def n_obsv(self) -> int:
+        #print("enter bartpy/bartpy/data.py SplitStatistics n_obsv")
+        if self._left is not None:
+            output = self._parent.n_obsv - self._left.n_obsv
+        else:
+            output = len(self._idx)
+        #print("-exit bartpy/bartpy/data.py SplitStatistics n_obsv")
+        return output
+
+    def _summed(self, name: str, f_parent, f_idx) -> float:
+        #print("enter bartpy/bartpy/data.py SplitStatistics _summed")
+        if name not in self._sums:
+            if self._left is not None:
+                self._sums[name] = f_parent(self._parent) - f_parent(self._left)
+            else:
+                self._sums[name] = f_idx(self._idx)
+        #print("-exit bartpy/bartpy/data.py SplitStatistics _summed")
+        return self._sums[name]
+
+    def summed_y(self) -> float:
+        #print("enter bartpy/bartpy/data.py SplitStatistics summed_y")
+        output = self._summed("y",
+                              lambda x: x.summed_y(),
+                              lambda idx: _summed_over_idx(self._parent.y.shared.values, idx))
+        #print("-exit bartpy/bartpy/data.py SplitStatistics summed_y")
+        return output
+
+    def summed_weights_g(self) -> float:
+        #print("enter bartpy/bartpy/data.py SplitStatistics summed_weights_g")
+        output = self._summed("weights_g",
+                              lambda x: x.summed_weights_g(),
+                              lambda idx: _summed_over_idx(self._parent.weights_g.values, idx))
+        #print("-exit bartpy/bartpy/data.py SplitStatistics summed_weights_g")
+        return output
+
+    def summed_weights_h(self) -> float:
+        #print("enter bartpy/bartpy/data.py SplitStatistics summed_weights_h")
+        output = self._summed("weights_h",
+                              lambda x: x.summed_weights_h(),
+                              lambda idx: _summed_over_idx(self._parent.weights_h.values, idx))
+        #print("-exit bartpy/bartpy/data.py SplitStatistics summed_weights_h")
+        return output
+
+    def summed_y_tilde_g(self) -> float:
+        #print("enter bartpy/bartpy/data.py SplitStatistics summed_y_tilde_g")
+        output = self._summed("y_tilde_g",
+                              lambda x: x.summed_y_tilde_g(),
+                              lambda idx: _weighted_summed_over_idx(self._parent.y.shared.values, self._parent.weights_g.values, idx))
+        #print("-exit bartpy/bartpy/data.py SplitStatistics summed_y_tilde_g")
+        return output
+
+    def summed_y_tilde_h(self) -> float:
+        #print("enter bartpy/bartpy/data.py SplitStatistics summed_y_tilde_h")
+        output = self._summed("y_tilde_h",
+                              lambda x: x.summed_y_tilde_h(),
+                              lambda idx: _weighted_summed_over_idx(self._parent.y.shared.values, self._parent.weights_h.values, idx))
+        #print("-exit bartpy/bartpy/data.py SplitStatistics summed_y_tilde_h")
+        return output
+
+    def carry(self, condition: SplitCondition) -> None:
+        """
+        Fill the carry fields of the split condition with the sums already computed for the proposal,
+        so building the child node once the proposal is accepted doesn't sum over its rows again
+        """
+        #print("enter bartpy/bartpy/data.py SplitStatistics carry")
+        condition.carry_n_obsv = self.n_obsv
+        condition.carry_y_sum = self._sums.get("y")
+        condition.carry_weights_g_sum = self._sums.get("weights_g")
+        condition.carry_weights_h_sum = self._sums.get("weights_h")
+        condition.carry_y_tilde_g_sum = self._sums.get("y_tilde_g")
+        condition.carry_y_tilde_h_sum = self._sums.get("y_tilde_h")
+        #print("-exit bartpy/bartpy/data.py SplitStatistics carry")
@@ -0,0 +1,50 @@
+from typing import Optional
+
+import numpy as np
+
+from bartpy.bartpy.initializers.initializer import Initializer
+from bartpy.bartpy.samplers.growfromroot.treemutation import GrowFromRootSampler
+from bartpy.bartpy.samplers.leafnode import LeafNodeSampler
+from bartpy.bartpy.samplers.schedule import SampleSchedule, SampleScheduleCGM
+from bartpy.bartpy.samplers.sigma import SigmaSampler
+
+
+class GrowFromRootInitializer(Initializer):
+    """
+    Warm start the model with a few sweeps of the grow from root sampler
+
+    Every sweep regrows each tree against the residuals of the others, then draws its leaves and sigma,
+    so the chain starts close to the posterior and far fewer burn in iterations are needed
+
+    Parameters
+    ----------
+    n_sweeps: int
+        Number of full passes over the trees
+    """
+
+    def __init__(self, n_sweeps: int=3):
+        #print("enter bartpy/bartpy/initializers/growfromrootinitializer.py GrowFromRootInitializer __init__")
+        self.n_sweeps = n_sweeps
+        self._generator = None
+        #print("-exit bartpy/bartpy/initializers/growfromrootinitializer.py GrowFromRootInitializer __init__")
+
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._generator = generator
+
+    def initialize_model(self, model) -> None:
+        #print("enter bartpy/bartpy/initializers/growfromrootinitializer.py GrowFromRootInitializer initialize_model")
+        schedule = SampleSchedule(GrowFromRootSampler(), LeafNodeSampler(), SigmaSampler())
+        schedule.set_generator(self._generator)
+        for _ in range(self.n_sweeps):
+            for _, step in schedule.steps(model):
+                step()
+        #print("-exit bartpy/bartpy/initializers/growfromrootinitializer.py GrowFromRootInitializer initialize_model")
+
+    def initialize_model_cgm(self, model) -> None:
+        #print("enter bartpy/bartpy/initializers/growfromrootinitializer.py GrowFromRootInitializer initialize_model_cgm")
+        schedule = SampleScheduleCGM(GrowFromRootSampler(), LeafNodeSampler(), SigmaSampler())
+        schedule.set_generator(self._generator)
+        for _ in range(self.n_sweeps):
+            for _, step in schedule.steps(model):
+                step()
+        #print("-exit bartpy/bartpy/initializers/growfromrootinitializer.py GrowFromRootInitializer initialize_model_cgm")
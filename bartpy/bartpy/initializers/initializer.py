@@ -1,4 +1,6 @@
-from typing import Generator
+from typing import Generator, Optional
+
+import numpy as np
 
 from bartpy.bartpy.tree import Tree
 
@@ -17,6 +19,13 @@ class Initializer(object):
     Default behaviour is to leave trees uninitialized
     """
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        """
+        Make all of the initializer's random draws from `generator`, or from the global `np.random` state if None
+        Initializers that don't draw anything themselves have nothing to do
+        """
+        pass
+
     def initialize_tree(self, tree: Tree) -> None:
         #print("enter bartpy/bartpy/initializers/initializer.py Initializer initialize_tree")
         
@@ -28,3 +37,33 @@ class Initializer(object):
         for tree in trees:
             self.initialize_tree(tree)
         #print("-exit bartpy/bartpy/initializers/initializer.py Initializer initialize_trees")
+
+    def initialize_trees_g(self, trees: Generator[Tree, None, None]) -> None:
+        #print("enter bartpy/bartpy/initializers/initializer.py Initializer initialize_trees_g")
+        for tree in trees:
+            self.initialize_tree(tree)
+        #print("-exit bartpy/bartpy/initializers/initializer.py Initializer initialize_trees_g")
+
+    def initialize_trees_h(self, trees: Generator[Tree, None, None]) -> None:
+        #print("enter bartpy/bartpy/initializers/initializer.py Initializer initialize_trees_h")
+        for tree in trees:
+            self.initialize_tree(tree)
+        #print("-exit bartpy/bartpy/initializers/initializer.py Initializer initialize_trees_h")
+
+    def initialize_model(self, model) -> None:
+        """
+        Set the starting trees of a `Model`
+        Each tree is handed over with its target set to the residuals of all of the other trees
+        """
+        #print("enter bartpy/bartpy/initializers/initializer.py Initializer initialize_model")
+        self.initialize_trees(model.refreshed_trees())
+        #print("-exit bartpy/bartpy/initializers/initializer.py Initializer initialize_model")
+
+    def initialize_model_cgm(self, model) -> None:
+        """
+        Set the starting g and h trees of a `ModelCGM`, the g trees first
+        """
+        #print("enter bartpy/bartpy/initializers/initializer.py Initializer initialize_model_cgm")
+        self.initialize_trees_g(model.refreshed_trees_g())
+        self.initialize_trees_h(model.refreshed_trees_h())
+        #print("-exit bartpy/bartpy/initializers/initializer.py Initializer initialize_model_cgm")
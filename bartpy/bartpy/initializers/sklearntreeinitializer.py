@@ -1,7 +1,8 @@
-from typing import Tuple
+from typing import Optional, Tuple
 from operator import gt, le
 
-from sklearn.ensemble import GradientBoostingRegressor
+import numpy as np
+from sklearn.tree import DecisionTreeRegressor
 
 from bartpy.bartpy.initializers.initializer import Initializer
 from bartpy.bartpy.mutation import GrowMutation
@@ -12,57 +13,77 @@ from bartpy.bartpy.tree import Tree, mutate
 
 class SklearnTreeInitializer(Initializer):
     """
-    Initialize tree structure and leaf node values by fitting a single Sklearn GBR tree
+    Initialize tree structure and leaf node values by fitting a single Sklearn regression tree
+    to the residuals of the other trees
 
     Both tree structure and leaf node parameters are copied across
+
+    Parameters
+    ----------
+    max_depth: int
+    min_samples_split: int
+    loss: str
+        Split criterion of the regression tree, the gradient boosting name "ls" is accepted for "squared_error"
     """
 
     def __init__(self,
                  max_depth: int=4,
                  min_samples_split: int=2,
-                 loss: str='ls'):
+                 loss: str='squared_error'):
         #print("enter bartpy/bartpy/initializers/sklearntreeinitializer.py SklearnTreeInitializer __init__")
         self.max_depth = max_depth
         self.min_samples_split = min_samples_split
         self.loss = loss
+        self._generator = None
         #print("-exit bartpy/bartpy/initializers/sklearntreeinitializer.py SklearnTreeInitializer __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._generator = generator
+
     def initialize_tree(self,
                         tree: Tree) -> None:
         #print("enter bartpy/bartpy/initializers/sklearntreeinitializer.py SklearnTreeInitializer initialize_tree")
         params = {
-            'n_estimators': 1,
             'max_depth': self.max_depth,
             'min_samples_split': self.min_samples_split,
-            'learning_rate': 0.8,
-            'loss': self.loss
+            'criterion': 'squared_error' if self.loss == 'ls' else self.loss,
+            # sklearn breaks ties between features at random, seeded from the chain's stream if there is one
+            'random_state': None if self._generator is None else int(self._generator.integers(2 ** 31))
         }
-        #print("initializing GradientBoostingRegressor......................WHY?")
-        clf = GradientBoostingRegressor(**params)
-        #print("fitting GradientBoostingRegressor...........................WHY?")
-        fit = clf.fit(tree.nodes[0].data.X.data, tree.nodes[0].data.y.data)
-        sklearn_tree = fit.estimators_[0][0].tree_
-        map_sklearn_tree_into_bartpy(tree, sklearn_tree)
+        data = tree.root.data
+        fit = DecisionTreeRegressor(**params).fit(data.X.values, data.y.values)
+        map_sklearn_tree_into_bartpy(tree, fit.tree_)
         #print("-exit bartpy/bartpy/initializers/sklearntreeinitializer.py SklearnTreeInitializer initialize_tree")
 
 
-def map_sklearn_split_into_bartpy_split_conditions(sklearn_tree, index: int) -> Tuple[SplitCondition, SplitCondition]:
+def map_sklearn_split_into_bartpy_split_conditions(sklearn_tree, index: int, node: LeafNode=None) -> Tuple[SplitCondition, SplitCondition]:
     """
-    Convert how a split is stored in sklearn's gradient boosted trees library to the bartpy representation
+    Convert how a split is stored in sklearn's tree library to the bartpy representation
+
+    Sklearn splits halfway between two values, if the node being split is passed the threshold is moved down
+    to the largest value of the feature in the node below it.
+    This splits the node's rows in the same way, but keeps the splitting value one the tree samplers can propose
 
     Parameters
     ----------
     sklearn_tree: The full tree object
     index: The index of the node in the tree object
+    node: The bartpy node being split
 
     Returns
     -------
 
     """
     #print("enter bartpy/bartpy/initializers/sklearntreeinitializer.py map_sklearn_split_into_bartpy_split_conditions")
+    feature, threshold = int(sklearn_tree.feature[index]), float(sklearn_tree.threshold[index])
+    if node is not None:
+        column = node.data.X.sorted_column(feature)
+        position = np.searchsorted(column, threshold, side="right")
+        if position > 0:
+            threshold = column[position - 1]
     output = (
-        SplitCondition(sklearn_tree.feature[index], sklearn_tree.threshold[index], le),
-        SplitCondition(sklearn_tree.feature[index], sklearn_tree.threshold[index], gt)
+        SplitCondition(feature, threshold, le),
+        SplitCondition(feature, threshold, gt)
     )
     #print("-exit bartpy/bartpy/initializers/sklearntreeinitializer.py map_sklearn_split_into_bartpy_split_conditions")
     return output
@@ -71,7 +92,7 @@ def map_sklearn_split_into_bartpy_split_conditions(sklearn_tree, index: int) ->
 def map_sklearn_tree_into_bartpy(bartpy_tree: Tree, sklearn_tree):
     #print("enter bartpy/bartpy/initializers/sklearntreeinitializer.py map_sklearn_tree_into_bartpy")
     nodes = [None for x in sklearn_tree.children_left]
-    nodes[0] = bartpy_tree.nodes[0]
+    nodes[0] = bartpy_tree.root
 
     def search(index: int=0):
         #print("enter bartpy/bartpy/initializers/sklearntreeinitializer.py map_sklearn_tree_into_bartpy search")
@@ -83,7 +104,7 @@ def map_sklearn_tree_into_bartpy(bartpy_tree: Tree, sklearn_tree):
 
         searched_node: LeafNode = nodes[index]
 
-        split_conditions = map_sklearn_split_into_bartpy_split_conditions(sklearn_tree, index)
+        split_conditions = map_sklearn_split_into_bartpy_split_conditions(sklearn_tree, index, searched_node)
         decision_node = split_node(searched_node, split_conditions)
 
         left_child: LeafNode = decision_node.left_child
@@ -102,6 +123,8 @@ def map_sklearn_tree_into_bartpy(bartpy_tree: Tree, sklearn_tree):
         search(right_child_index)
         #print("exit bartpy/bartpy/initializers/sklearntreeinitializer.py map_sklearn_tree_into_bartpy search")
 
+    if sklearn_tree.children_left[0] == -1:
+        nodes[0].set_value(sklearn_tree.value[0][0][0])
     search()
     #print("-exit bartpy/bartpy/initializers/sklearntreeinitializer.py map_sklearn_tree_into_bartpy")
 
@@ -11,6 +11,10 @@ from bartpy.bartpy.sigma import Sigma
 from bartpy.bartpy.split import Split
 from bartpy.bartpy.tree import Tree, LeafNode, deep_copy_tree
 
+# Number of passes over an ensemble between exact recomputations of its running sum of trees
+# In between the sum is only updated by the change in each tree, which slowly accumulates floating point error
+EXACT_PREDICTION_PERIOD = 50
+
 
 class Model:
 
@@ -24,25 +28,31 @@ class Model:
                  k: int=2.,
                  initializer: Initializer=SklearnTreeInitializer()):
         
-        self.data = deepcopy(data)
+        # The model only ever reads its data, each tree gets its own target over it in `initialize_trees`
+        self.data = data
         self.alpha = float(alpha)
         self.beta = float(beta)
         self.k = k
         self._sigma = sigma
+        # Running sum of the in sample predictions of all trees, excluding `_active_tree` while it's being sampled
         self._prediction = None
+        self._active_tree = None
+        self._n_passes = 0
+        # One row per tree, each tree's target is its own row, rewritten in place on every pass
+        self._residuals = None
         self._initializer = initializer
 
         if trees is None:
             self.n_trees = n_trees
             self._trees = self.initialize_trees()
             if self._initializer is not None:
-                self._initializer.initialize_trees(self.refreshed_trees())
+                self._initializer.initialize_model(self)
         else:
             self.n_trees = len(trees)
             self._trees = trees
 
     def initialize_trees(self) -> List[Tree]:        
-        trees = [Tree([LeafNode(Split(deepcopy(self.data)))]) for _ in range(self.n_trees)]
+        trees = [Tree([LeafNode(Split(self.data.shared_copy()))]) for _ in range(self.n_trees)]
         for tree in trees:
             tree.update_y(tree.update_y(self.data.y.values / self.n_trees))
         return trees
@@ -59,6 +69,14 @@ class Model:
         if X is not None:
             output = self._out_of_sample_predict(X)
             return output
+        if self._prediction is None:
+            self._prediction = self._exact_predict()
+        output = self._prediction.copy()
+        if self._active_tree is not None:
+            output += self._active_tree.predict()
+        return output
+
+    def _exact_predict(self) -> np.ndarray:
         output = np.sum([tree.predict() for tree in self.trees], axis=0)
         return output
 
@@ -74,12 +92,19 @@ class Model:
         return self._trees
 
     def refreshed_trees(self) -> Generator[Tree, None, None]:        
-        if self._prediction is None:
-            self._prediction = self.predict()
-        for tree in self._trees:
+        if self._prediction is None or self._n_passes % EXACT_PREDICTION_PERIOD == 0:
+            self._prediction = self._exact_predict()
+        self._n_passes += 1
+        if self._residuals is None or self._residuals.shape[0] != len(self._trees):
+            self._residuals = np.empty((len(self._trees), len(self._prediction)))
+        for i, tree in enumerate(self._trees):
             self._prediction -= tree.predict()
-            tree.update_y(self.data.y.values - self._prediction)
+            self._active_tree = tree
+            residuals = self._residuals[i]
+            np.subtract(self.data.y.values, self._prediction, out=residuals)
+            tree.update_y(residuals)
             yield tree
+            self._active_tree = None
             self._prediction += tree.predict()
 
     @property
@@ -118,7 +143,8 @@ class ModelCGM:
                  **kwargs,
                 ):
 
-        self.data = deepcopy(data)
+        # The model only ever reads its data, each tree gets its own target over it in `initialize_trees_g` / `initialize_trees_h`
+        self.data = data
         self.alpha_g = float(alpha_g)
         self.beta_g = float(beta_g)
         self.alpha_h = float(alpha_h)
@@ -130,19 +156,36 @@ class ModelCGM:
         self._sigma_g = sigma_g
         self._mu_g=mu_g
         self._mu_h=mu_h
+        # Running sums of the in sample predictions of each ensemble, excluding the active tree while it's being sampled
         self._prediction_g = None
         self._prediction_h = None
+        self._active_tree_g = None
+        self._active_tree_h = None
+        self._n_passes_g = 0
+        self._n_passes_h = 0
         self._initializer = initializer
         self.kwargs=kwargs
         self.fix_g = fix_g
         self.fix_h = fix_h
         self.fix_sigma = fix_sigma
+
+        # Loop invariants of the Gibbs sweep, W and p never change so these are only computed once
+        # The targets and per tree residuals are preallocated and rewritten in place on every pass
+        self._pbw = None
+        self._h_factor = None
+        if data is not None:
+            W = data.W.values
+            p = data.p.values
+            self._pbw = W*(1-p) - p*(1-W)
+            self._h_factor = (W/(1-p)) - ((1-W)/p)
+        self._target_g = None
+        self._target_h = None
+        self._residuals_g = None
+        self._residuals_h = None
         
         if trees_g is None:
             self.n_trees_g = n_trees_g
             self._trees_g = self.initialize_trees_g()
-            if self._initializer is not None:
-                self._initializer.initialize_trees_g(self.refreshed_trees_g())
         else:
             self.n_trees_g = len(trees_g)
             self._trees_g = trees_g
@@ -150,24 +193,26 @@ class ModelCGM:
         if trees_h is None:
             self.n_trees_h = n_trees_h
             self._trees_h = self.initialize_trees_h()
-            if self._initializer is not None:
-                self._initializer.initialize_trees_h(self.refreshed_trees_h())
         else:
             self.n_trees_h = len(trees_h)
             self._trees_h = trees_h
+
+        # Both sets of trees need to exist before either can be fit to the residuals of the other
+        if self._initializer is not None and trees_g is None and trees_h is None:
+            self._initializer.initialize_model_cgm(self)
         
         #print("self._mu_g=",self._mu_g)
         #print("self.fix_g =", fix_g )
         #print("self.fix_h =", fix_h )
         
     def initialize_trees_g(self) -> List[Tree]:
-        trees = [Tree([LeafNode(Split(deepcopy(self.data)))]) for _ in range(self.n_trees_g)]
+        trees = [Tree([LeafNode(Split(self.data.shared_copy()))]) for _ in range(self.n_trees_g)]
         for tree in trees:
             tree.update_y(tree.update_y(self.data.y.values / self.n_trees_g))
         return trees
     
     def initialize_trees_h(self) -> List[Tree]:
-        trees = [Tree([LeafNode(Split(deepcopy(self.data)))]) for _ in range(self.n_trees_h)]
+        trees = [Tree([LeafNode(Split(self.data.shared_copy()))]) for _ in range(self.n_trees_h)]
         for tree in trees:
             tree.update_y(tree.update_y(self.data.y.values / self.n_trees_h))
         return trees
@@ -175,14 +220,11 @@ class ModelCGM:
     def residuals(self) -> np.ndarray:
         #print("enter bartpy/bartpy/model.py ModelCGM residuals")
         ##print("self.predict_g()=",self.predict_g())
-        W=self.data.W.values
-        p=self.data.p.values
         #paw = W*p**2 + (1-W)*(1-p)**2
-        pbw = W*(1-p) - p*(1-W)
         #print("Computing Residuals with self.data.y.values=", self.data.y.values[:10])
         ##print("mean self.data.y.values=", np.mean(self.data.y.values))
         ##print("var self.data.y.values=", np.var(self.data.y.values))
-        output = self.data.y.values - self.predict_g() - pbw*self.predict_h()
+        output = self.data.y.values - self.predict_g() - self._pbw*self.predict_h()
         #print("-exit bartpy/bartpy/model.py ModelCGM residuals")
         return output
 
@@ -230,7 +272,11 @@ class ModelCGM:
         if self.fix_g is None:
             #print("stage 2")
             #print("using trees for model.predict_g")
-            output = np.sum([tree.predict_g() for tree in self.trees_g], axis=0)
+            if self._prediction_g is None:
+                self._prediction_g = self._exact_predict_g()
+            output = self._prediction_g.copy()
+            if self._active_tree_g is not None:
+                output += self._active_tree_g.predict_g()
         else:
             #print("using fix_g for model.predict_g")
             output = self.fix_g
@@ -248,12 +294,32 @@ class ModelCGM:
             return output
         if self.fix_h is None:
             #print("using trees for predict_h")
-            output = np.sum([tree.predict_h() for tree in self.trees_h], axis=0)
+            if self._prediction_h is None:
+                self._prediction_h = self._exact_predict_h()
+            output = self._prediction_h.copy()
+            if self._active_tree_h is not None:
+                output += self._active_tree_h.predict_h()
         else:
             #print("using fix_h for predict_h")
             output=self.fix_h
         return output
 
+    def _sweep_buffers(self, trees: List[Tree], target: Optional[np.ndarray], residuals: Optional[np.ndarray]):
+        n_obsv = len(self.data.y.values)
+        if target is None:
+            target = np.empty(n_obsv)
+        if residuals is None or residuals.shape[0] != len(trees):
+            residuals = np.empty((len(trees), n_obsv))
+        return target, residuals
+
+    def _exact_predict_g(self) -> np.ndarray:
+        output = np.sum([tree.predict_g() for tree in self.trees_g], axis=0)
+        return output
+
+    def _exact_predict_h(self) -> np.ndarray:
+        output = np.sum([tree.predict_h() for tree in self.trees_h], axis=0)
+        return output
+
     def _out_of_sample_predict_g(self, X: np.ndarray) -> np.ndarray:
         #print("enter model._out_of_sample_predict_g")
         if type(X) == pd.DataFrame:
@@ -299,23 +365,32 @@ class ModelCGM:
         if self.fix_h is not None:
             current_h_of_X = self.fix_h
         else:
-            current_h_of_X = self.predict_h()
+            if self._prediction_h is None:
+                self._prediction_h = self._exact_predict_h()
+            # No h tree is being sampled during the g pass, so the running sum is the full prediction
+            current_h_of_X = self._prediction_h
         
-        if self._prediction_g is None:
-            self._prediction_g = self.predict_g()
+        if self._prediction_g is None or self._n_passes_g % EXACT_PREDICTION_PERIOD == 0:
+            self._prediction_g = self._exact_predict_g()
+        self._n_passes_g += 1
         #print("*******************************************")
         #print("**                  G                    **")
         #print("*******************************************")
         #tree_counter = 0
-        for tree in self._trees_g:
+        self._target_g, self._residuals_g = self._sweep_buffers(self._trees_g, self._target_g, self._residuals_g)
+        y_vals = self._target_g
+        np.multiply(self._pbw, current_h_of_X, out=y_vals)
+        np.subtract(self.data.y.values, y_vals, out=y_vals)
+        for i, tree in enumerate(self._trees_g):
             #tree_counter+=1
             #print("g tree:",str(tree_counter))
             self._prediction_g -= tree.predict_g()
-            W = self.data.W.values
-            p = self.data.p.values
-            y_vals = self.data.y.values - (W*(1-p)-(1-W)*p)*current_h_of_X
-            tree.update_y(y_vals - self._prediction_g)
+            self._active_tree_g = tree
+            residuals = self._residuals_g[i]
+            np.subtract(y_vals, self._prediction_g, out=residuals)
+            tree.update_y(residuals)
             yield tree
+            self._active_tree_g = None
             self._prediction_g += tree.predict_g()
         #print("returning after doing work in model.refreshed_trees_g")
         #print("exit model.refreshed_trees_g")
@@ -328,26 +403,33 @@ class ModelCGM:
         if self.fix_g is not None:
             current_g_of_X = self.fix_g
         else:
-            current_g_of_X = self.predict_g()
+            if self._prediction_g is None:
+                self._prediction_g = self._exact_predict_g()
+            # No g tree is being sampled during the h pass, so the running sum is the full prediction
+            current_g_of_X = self._prediction_g
         
-        if self._prediction_h is None:
-            self._prediction_h = self.predict_h()
+        if self._prediction_h is None or self._n_passes_h % EXACT_PREDICTION_PERIOD == 0:
+            self._prediction_h = self._exact_predict_h()
+        self._n_passes_h += 1
         #print("*******************************************")
         #print("**                  H                    **")
         #print("*******************************************")
         #tree_counter = 0
-        for tree in self._trees_h:
+        self._target_h, self._residuals_h = self._sweep_buffers(self._trees_h, self._target_h, self._residuals_h)
+        y_vals = self._target_h
+        np.subtract(self.data.y.values, current_g_of_X, out=y_vals)
+        np.multiply(y_vals, self._h_factor, out=y_vals)
+        for i, tree in enumerate(self._trees_h):
             #tree_counter+=1
             #print("h tree:",str(tree_counter))
             self._prediction_h -= tree.predict_h() # sum of trees minus j_th tree
-            W = self.data.W.values
-            p = self.data.p.values
-            factor = (W/(1-p)) - ((1-W)/p)
+            self._active_tree_h = tree
             #print("first self.data.y.values[:10]=", self.data.y.values[:10])
-            #print("(self.data.y.values - current_g_of_X)*factor=",((self.data.y.values - current_g_of_X)*factor)[:10])
-            y_vals = (self.data.y.values - current_g_of_X)*factor
-            tree.update_y(y_vals - self._prediction_h)
+            residuals = self._residuals_h[i]
+            np.subtract(y_vals, self._prediction_h, out=residuals)
+            tree.update_y(residuals)
             yield tree
+            self._active_tree_h = None
             self._prediction_h += tree.predict_h()
     
     @property
@@ -1,4 +1,8 @@
-from bartpy.bartpy.node import TreeNode, DecisionNode, LeafNode
+from typing import Optional, Tuple, Union
+
+from bartpy.bartpy.data import Data, SplitStatistics
+from bartpy.bartpy.node import TreeNode, DecisionNode, LeafNode, split_node
+from bartpy.bartpy.splitcondition import SplitCondition
 
 
 class TreeMutation(object):
@@ -34,11 +38,119 @@ class PruneMutation(TreeMutation):
         #print("-exit bartpy/bartpy/mutation.py PruneMutation __init__")
 
 
+class ChangeMutation(TreeMutation):
+    """
+    Re-draw the splitting rule of a decision node
+
+    The subtree below the node keeps its shape and the rules of its other decision nodes, but is rebuilt
+    on the data reaching each node under the new rule.
+    `updated_node` is None if the new rule would leave any node of the subtree empty
+    """
+
+    def __init__(self, existing_node: DecisionNode, updated_node: Optional[DecisionNode]):
+        #print("enter bartpy/bartpy/mutation.py ChangeMutation __init__")
+        if type(existing_node) != DecisionNode:
+            raise TypeError("Can only change the rule of decision nodes")
+        super().__init__("change", existing_node, updated_node)
+        #print("-exit bartpy/bartpy/mutation.py ChangeMutation __init__")
+
+
+class SwapMutation(TreeMutation):
+    """
+    Exchange the splitting rules of a decision node and one of its decision node children
+
+    `existing_node` is the parent, and the subtree below it is rebuilt with the two rules exchanged.
+    `updated_node` is None if the exchange would leave any node of the subtree empty
+    """
+
+    def __init__(self, existing_node: DecisionNode, updated_node: Optional[DecisionNode]):
+        #print("enter bartpy/bartpy/mutation.py SwapMutation __init__")
+        if type(existing_node) != DecisionNode:
+            raise TypeError("Can only swap the rules of decision nodes")
+        super().__init__("swap", existing_node, updated_node)
+        #print("-exit bartpy/bartpy/mutation.py SwapMutation __init__")
+
+
 class GrowMutation(TreeMutation):
+    """
+    Split a leaf node into a decision node with two leaf children
+
+    Can be constructed from the split conditions alone, in which case only the statistics of the two
+    children needed by the likelihood ratio are computed, and the decision node is built the first time
+    `updated_node` is accessed, i.e. once the mutation has been accepted
+    """
 
-    def __init__(self, existing_node: LeafNode, updated_node: DecisionNode):
+    def __init__(self,
+                 existing_node: LeafNode,
+                 updated_node: Optional[DecisionNode]=None,
+                 split_conditions: Optional[Tuple[SplitCondition, SplitCondition]]=None):
         #print("enter bartpy/bartpy/mutation.py GrowMutation __init__")
         if type(existing_node) != LeafNode:
             raise TypeError("Can only grow Leaf nodes")
+        if updated_node is None and split_conditions is None:
+            raise TypeError("Grow mutations need either the updated node or the split conditions")
+        self._split_conditions = split_conditions
+        self._child_statistics = None
         super().__init__("grow", existing_node, updated_node)
-        #print("-exit bartpy/bartpy/mutation.py GrowMutation __init__")
\ No newline at end of file
+        #print("-exit bartpy/bartpy/mutation.py GrowMutation __init__")
+
+    @property
+    def updated_node(self) -> DecisionNode:
+        #print("enter bartpy/bartpy/mutation.py GrowMutation updated_node")
+        if self._updated_node is None:
+            if self._child_statistics is not None:
+                self._child_statistics[0].carry(self._split_conditions[0])
+            self._updated_node = split_node(self.existing_node, self._split_conditions)
+        #print("-exit bartpy/bartpy/mutation.py GrowMutation updated_node")
+        return self._updated_node
+
+    @updated_node.setter
+    def updated_node(self, updated_node: Optional[DecisionNode]) -> None:
+        #print("enter bartpy/bartpy/mutation.py GrowMutation updated_node setter")
+        self._updated_node = updated_node
+        #print("-exit bartpy/bartpy/mutation.py GrowMutation updated_node setter")
+
+    @property
+    def is_materialized(self) -> bool:
+        """
+        Whether the decision node replacing the leaf has been built
+        """
+        #print("enter bartpy/bartpy/mutation.py GrowMutation is_materialized")
+        #print("-exit bartpy/bartpy/mutation.py GrowMutation is_materialized")
+        return self._updated_node is not None
+
+    @property
+    def split_condition(self) -> SplitCondition:
+        """
+        The condition leading to the left child of the new decision node
+        """
+        #print("enter bartpy/bartpy/mutation.py GrowMutation split_condition")
+        if self._updated_node is None:
+            output = self._split_conditions[0]
+        else:
+            output = self._updated_node.most_recent_split_condition()
+        #print("-exit bartpy/bartpy/mutation.py GrowMutation split_condition")
+        return output
+
+    @property
+    def child_depth(self) -> int:
+        #print("enter bartpy/bartpy/mutation.py GrowMutation child_depth")
+        #print("-exit bartpy/bartpy/mutation.py GrowMutation child_depth")
+        return self.existing_node.depth + 1
+
+    def child_statistics(self) -> Tuple[Union[Data, SplitStatistics], Union[Data, SplitStatistics]]:
+        """
+        Sufficient statistics of the left and right children
+        Read from the children's data if they have been built, otherwise computed from the split condition
+        """
+        #print("enter bartpy/bartpy/mutation.py GrowMutation child_statistics")
+        if self._updated_node is not None:
+            output = self._updated_node.left_child.data, self._updated_node.right_child.data
+            #print("-exit bartpy/bartpy/mutation.py GrowMutation child_statistics")
+            return output
+        if self._child_statistics is None:
+            data = self.existing_node.data
+            left = SplitStatistics(data, data.X.update_idx(self._split_conditions[0]))
+            self._child_statistics = left, left.complement()
+        #print("-exit bartpy/bartpy/mutation.py GrowMutation child_statistics")
+        return self._child_statistics
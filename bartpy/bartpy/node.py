@@ -1,4 +1,4 @@
-from typing import Union, Tuple
+from typing import List, Mapping, Optional, Union, Tuple
 
 from bartpy.bartpy.data import Data
 from bartpy.bartpy.split import Split, SplitCondition
@@ -45,11 +45,11 @@ class TreeNode(object):
         return self._split
 
     def update_y(self, y):
+        """
+        All nodes of a tree share the same target, so this updates the node and all of its descendants
+        """
         #print("enter bartpy/bartpy/node.py TreeNode update_y")
         self.data.update_y(y)
-        if self.left_child is not None:
-            self.left_child.update_y(y)
-            self.right_child.update_y(y)
         #print("-exit bartpy/bartpy/node.py TreeNode update_y")
 
     #def update_y_tilde_g(self, y_tilde_g):
@@ -154,8 +154,7 @@ def split_node(node: LeafNode, split_conditions: Tuple[SplitCondition, SplitCond
     """
     #print("enter bartpy/bartpy/node.py split_node")
     left_split = node.split + split_conditions[0]
-    split_conditions[1].carry_n_obsv = node.data.X.n_obsv - left_split.data.X.n_obsv
-    split_conditions[1].carry_y_sum = node.data.y.summed_y() - left_split.data.y.summed_y()
+    node.data.carry_complement(left_split.data, split_conditions[1])
 
     right_split = node.split + split_conditions[1]
     output = DecisionNode(node.split,
@@ -166,6 +165,61 @@ def split_node(node: LeafNode, split_conditions: Tuple[SplitCondition, SplitCond
     return output
 
 
+def subtree_nodes(node: TreeNode) -> List[TreeNode]:
+    """
+    The node and all of its descendants, parents before their children
+    """
+    #print("enter bartpy/bartpy/node.py subtree_nodes")
+    output, to_visit = [], [node]
+    while to_visit:
+        node = to_visit.pop()
+        output.append(node)
+        if type(node) == DecisionNode:
+            to_visit.append(node.right_child)
+            to_visit.append(node.left_child)
+    #print("-exit bartpy/bartpy/node.py subtree_nodes")
+    return output
+
+
+def rebuild_node(node: TreeNode,
+                 split: Split,
+                 conditions: Mapping[TreeNode, Tuple[SplitCondition, SplitCondition]]=None) -> Optional[TreeNode]:
+    """
+    Copy of the subtree below a node, built on the data of `split`
+
+    Decision nodes keep their splitting rule, unless a replacement is given for them in `conditions`.
+    Leaves keep their value.
+    The rules are copied without the sums carried by the original conditions, which belong to the old data
+
+    Returns None if any node of the copy would have no data
+    """
+    #print("enter bartpy/bartpy/node.py rebuild_node")
+    if split.data.n_obsv == 0:
+        #print("-exit bartpy/bartpy/node.py rebuild_node")
+        return None
+    if type(node) == LeafNode:
+        #print("-exit bartpy/bartpy/node.py rebuild_node")
+        return LeafNode(split, depth=node.depth, value=node.current_value)
+    if conditions is not None and node in conditions:
+        left_condition, right_condition = conditions[node]
+    else:
+        left_condition = node.left_child.split.most_recent_split_condition()
+        right_condition = node.right_child.split.most_recent_split_condition()
+    left_condition = SplitCondition(left_condition.splitting_variable, left_condition.splitting_value, left_condition.operator)
+    right_condition = SplitCondition(right_condition.splitting_variable, right_condition.splitting_value, right_condition.operator)
+    left_child = rebuild_node(node.left_child, split + left_condition, conditions)
+    if left_child is None:
+        #print("-exit bartpy/bartpy/node.py rebuild_node")
+        return None
+    right_child = rebuild_node(node.right_child, split + right_condition, conditions)
+    if right_child is None:
+        #print("-exit bartpy/bartpy/node.py rebuild_node")
+        return None
+    output = DecisionNode(split, left_child, right_child, depth=node.depth)
+    #print("-exit bartpy/bartpy/node.py rebuild_node")
+    return output
+
+
 def deep_copy_node(node: TreeNode):
     #print("enter bartpy/bartpy/node.py deep_copy_node")
     if type(node) == LeafNode:
@@ -0,0 +1,40 @@
+import warnings
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """
+        Stand in for `numba.njit` when numba isn't installed, the kernels then run as plain Python
+        """
+        if len(args) == 1 and callable(args[0]) and len(kwargs) == 0:
+            return args[0]
+        return lambda f: f
+
+
+# Ways of running the Gibbs sweeps
+BACKENDS = ("python", "numba")
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    The backend that will actually be used for the requested one
+
+    "numba" falls back to "python" with a warning if numba can't be imported
+
+    Parameters
+    ----------
+    backend: str
+        One of `BACKENDS`
+    """
+    #print("enter bartpy/bartpy/samplers/compiled/backend.py resolve_backend")
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend {}, must be one of {}".format(backend, BACKENDS))
+    if backend == "numba" and not NUMBA_AVAILABLE:
+        warnings.warn("numba is not installed, falling back to the python backend")
+        backend = "python"
+    #print("-exit bartpy/bartpy/samplers/compiled/backend.py resolve_backend")
+    return backend
@@ -0,0 +1,419 @@
+"""
+Compiled kernels of a Gibbs sweep over array backed trees
+
+Every kernel mirrors a step of the python samplers, so that a sweep targets exactly the same posterior:
+ - `log_grow_ratio_cgm` is `log_grow_ratio_cgm_g` / `log_grow_ratio_cgm_h` on summed statistics
+ - `log_grow_probability_ratio` / `log_prune_probability_ratio` are `UniformTreeMutationLikihoodRatio`
+ - `tree_step` is `UnconstrainedTreeMutationSampler` with the grow and prune proposals of `UniformMutationProposer`
+ - `sample_leaves` is `LeafNodeSampler._sample_tree_cgm`
+ - `sample_sigma` is `SigmaSampler.sample_cgm`
+
+The trees of an ensemble are the arrays of a `bartpy.bartpy.treearena.TreeArena`, passed in one by one
+
+Random draws come from numba's own generator, seeded through `seed`
+"""
+import numpy as np
+
+from bartpy.bartpy.samplers.compiled.backend import njit
+from bartpy.bartpy.treearena import (FEATURE, LEFT, RIGHT, PARENT, DEPTH, START, END, SPLITTABLE,
+                                     SUMMED_WEIGHTS, SUMMED_Y, LEAF, FREE, UNKNOWN)
+
+# Upper bound on the number of times a move is redrawn because it can't be made on the tree
+MAX_PROPOSALS = 100
+
+
+@njit(cache=True)
+def seed(value):
+    np.random.seed(value)
+
+
+@njit(cache=True)
+def log_grow_ratio_cgm(var, var_mu, mu, summed_weights, summed_y, left_weights, left_y, right_weights, right_y):
+    a_combined = 1. / var_mu + summed_weights / var
+    a_left = 1. / var_mu + left_weights / var
+    a_right = 1. / var_mu + right_weights / var
+    first_term = -.5 * (np.log(var_mu) + .5 * np.log(a_combined) - .5 * np.log(a_left) - .5 * np.log(a_right))
+    resp_contribution = (-.5 * (mu ** 2) / var_mu
+                         + .5 * (left_y / var + mu / var_mu) ** 2 / a_left
+                         + .5 * (right_y / var + mu / var_mu) ** 2 / a_right
+                         - .5 * (summed_y / var + mu / var_mu) ** 2 / a_combined)
+    return first_term + resp_contribution
+
+
+@njit(cache=True)
+def log_probability_node_split(alpha, beta, depth):
+    return np.log(alpha * np.power(1. + depth, -beta))
+
+
+@njit(cache=True)
+def log_probability_node_not_split(alpha, beta, depth):
+    return np.log(1. - alpha * np.power(1. + depth, -beta))
+
+
+@njit(cache=True)
+def node_sums(order, start, end, weights, residuals):
+    summed_weights = 0.
+    summed_y = 0.
+    for i in range(start, end):
+        row = order[i]
+        summed_weights += weights[row]
+        summed_y += weights[row] * residuals[row]
+    return summed_weights, summed_y
+
+
+@njit(cache=True)
+def left_sums(X, order, start, end, variable, value, weights, residuals):
+    n_left = 0
+    summed_weights = 0.
+    summed_y = 0.
+    for i in range(start, end):
+        row = order[i]
+        if X[row, variable] <= value:
+            n_left += 1
+            summed_weights += weights[row]
+            summed_y += weights[row] * residuals[row]
+    return n_left, summed_weights, summed_y
+
+
+@njit(cache=True)
+def is_splittable(X, order, start, end):
+    for variable in range(X.shape[1]):
+        first = X[order[start], variable]
+        for i in range(start + 1, end):
+            if X[order[i], variable] != first:
+                return True
+    return False
+
+
+@njit(cache=True)
+def splittable_variables(X, order, start, end, out):
+    """
+    Fill `out` with the variables taking more than one value in the node, returning how many there are
+    """
+    n_variables = 0
+    for variable in range(X.shape[1]):
+        first = X[order[start], variable]
+        for i in range(start + 1, end):
+            if X[order[i], variable] != first:
+                out[n_variables] = variable
+                n_variables += 1
+                break
+    return n_variables
+
+
+@njit(cache=True)
+def log_probability_split(X, order, start, end, variable, value, n_variables):
+    """
+    log(P(splitting_value | splitting_variable, node) * P(splitting_variable | node))
+    """
+    n_value = 0
+    for i in range(start, end):
+        if X[order[i], variable] == value:
+            n_value += 1
+    if n_value == 0:
+        return -np.inf
+    return -np.log(n_variables) + np.log(n_value / (end - start))
+
+
+@njit(cache=True)
+def random_split_value(X, order, start, end, variable):
+    """
+    The value of a uniformly drawn row of the node among those below the node's maximum of the variable
+    """
+    max_value = -np.inf
+    for i in range(start, end):
+        max_value = max(max_value, X[order[i], variable])
+    n_below_max = 0
+    for i in range(start, end):
+        if X[order[i], variable] < max_value:
+            n_below_max += 1
+    chosen = np.random.randint(0, n_below_max)
+    for i in range(start, end):
+        value = X[order[i], variable]
+        if value < max_value:
+            if chosen == 0:
+                return value
+            chosen -= 1
+    return max_value
+
+
+@njit(cache=True)
+def tree_counts(nodes, n_slots, X, order):
+    """
+    Number of splittable leaves and of prunable decision nodes, checking any leaf not yet known to be splittable
+    """
+    n_splittable = 0
+    n_prunable = 0
+    for k in range(n_slots):
+        if nodes[k, FEATURE] == LEAF:
+            if nodes[k, SPLITTABLE] == UNKNOWN:
+                nodes[k, SPLITTABLE] = 1 if is_splittable(X, order, nodes[k, START], nodes[k, END]) else 0
+            n_splittable += nodes[k, SPLITTABLE]
+        elif nodes[k, FEATURE] >= 0 and nodes[nodes[k, LEFT], FEATURE] == LEAF and nodes[nodes[k, RIGHT], FEATURE] == LEAF:
+            n_prunable += 1
+    return n_splittable, n_prunable
+
+
+@njit(cache=True)
+def nth_splittable_leaf(nodes, n_slots, n):
+    for k in range(n_slots):
+        if nodes[k, FEATURE] == LEAF and nodes[k, SPLITTABLE] == 1:
+            if n == 0:
+                return k
+            n -= 1
+    return -1
+
+
+@njit(cache=True)
+def nth_prunable_node(nodes, n_slots, n):
+    for k in range(n_slots):
+        if nodes[k, FEATURE] >= 0 and nodes[nodes[k, LEFT], FEATURE] == LEAF and nodes[nodes[k, RIGHT], FEATURE] == LEAF:
+            if n == 0:
+                return k
+            n -= 1
+    return -1
+
+
+@njit(cache=True)
+def leaf_statistics(nodes, statistics, n_slots, order, weights, residuals):
+    """
+    Fill in the summed weights and weighted residuals of every leaf
+    """
+    for k in range(n_slots):
+        if nodes[k, FEATURE] == LEAF:
+            summed_weights, summed_y = node_sums(order, nodes[k, START], nodes[k, END], weights, residuals)
+            statistics[k, SUMMED_WEIGHTS] = summed_weights
+            statistics[k, SUMMED_Y] = summed_y
+
+
+@njit(cache=True)
+def log_grow_probability_ratio(nodes, statistics, X, order, node, variable, value, n_variables, weights, residuals,
+                               var, var_mu, mu, alpha, beta, p_grow, p_prune, n_splittable, n_prunable):
+    """
+    Log acceptance ratio of splitting a leaf
+
+    Returns
+    -------
+    Tuple[float, float, float]
+        the ratio, and the summed weights and weighted residuals of the rows sent left
+    """
+    start, end, depth = nodes[node, START], nodes[node, END], nodes[node, DEPTH]
+    log_p_split_within_tree = -np.log(n_splittable) + log_probability_split(X, order, start, end, variable, value, n_variables)
+    transition = np.log(p_prune / p_grow) - np.log(n_prunable + 1) - log_p_split_within_tree
+
+    summed_weights, summed_y = statistics[node, SUMMED_WEIGHTS], statistics[node, SUMMED_Y]
+    _, left_weights, left_y = left_sums(X, order, start, end, variable, value, weights, residuals)
+    likihood = log_grow_ratio_cgm(var, var_mu, mu, summed_weights, summed_y,
+                                  left_weights, left_y, summed_weights - left_weights, summed_y - left_y)
+
+    tree = (2 * log_probability_node_not_split(alpha, beta, depth + 1)
+            + log_probability_node_split(alpha, beta, depth)
+            + log_p_split_within_tree
+            - log_probability_node_not_split(alpha, beta, depth))
+    return transition + likihood + tree, left_weights, left_y
+
+
+@njit(cache=True)
+def log_prune_probability_ratio(nodes, threshold, statistics, X, order, node, n_variables,
+                                var, var_mu, mu, alpha, beta, p_grow, p_prune, n_splittable, n_prunable):
+    """
+    Log acceptance ratio of collapsing a decision node with two leaf children back into a leaf
+    """
+    start, end, depth = nodes[node, START], nodes[node, END], nodes[node, DEPTH]
+    left, right = nodes[node, LEFT], nodes[node, RIGHT]
+    log_p_split = log_probability_split(X, order, start, end, nodes[node, FEATURE], threshold[node], n_variables)
+    if n_splittable <= 1:
+        log_p_grow_node = -np.inf
+    else:
+        log_p_grow_node = -np.log(n_splittable - 1)
+    transition = np.log(p_grow / p_prune) + log_p_grow_node + log_p_split + np.log(n_prunable)
+
+    left_weights, left_y = statistics[left, SUMMED_WEIGHTS], statistics[left, SUMMED_Y]
+    right_weights, right_y = statistics[right, SUMMED_WEIGHTS], statistics[right, SUMMED_Y]
+    likihood = -log_grow_ratio_cgm(var, var_mu, mu, left_weights + right_weights, left_y + right_y,
+                                   left_weights, left_y, right_weights, right_y)
+
+    tree = (log_probability_node_not_split(alpha, beta, depth)
+            - 2 * log_probability_node_not_split(alpha, beta, depth + 1)
+            - log_probability_node_split(alpha, beta, depth)
+            - log_p_split)
+    return transition + likihood + tree
+
+
+@njit(cache=True)
+def allocate_node(free, n_free, n_slots, t):
+    """
+    A slot for a new node of tree t, off the free list if there is one there
+    """
+    if n_free[t] > 0:
+        n_free[t] -= 1
+        return free[n_free[t]]
+    n_slots[t] += 1
+    return n_slots[t] - 1
+
+
+@njit(cache=True)
+def free_node(nodes, free, n_free, t, k):
+    nodes[k, FEATURE] = FREE
+    free[n_free[t]] = k
+    n_free[t] += 1
+
+
+@njit(cache=True)
+def apply_grow(nodes, threshold, statistics, free, n_free, n_slots, t, X, order, node, variable, value, left_weights, left_y):
+    """
+    Split a leaf, partitioning its rows in place so that each child owns a contiguous range
+    """
+    start, end = nodes[node, START], nodes[node, END]
+    i = start
+    j = end - 1
+    while i <= j:
+        if X[order[i], variable] <= value:
+            i += 1
+        else:
+            row = order[i]
+            order[i] = order[j]
+            order[j] = row
+            j -= 1
+    left = allocate_node(free, n_free, n_slots, t)
+    right = allocate_node(free, n_free, n_slots, t)
+    for child, child_start, child_end in ((left, start, i), (right, i, end)):
+        nodes[child, FEATURE] = LEAF
+        nodes[child, LEFT] = -1
+        nodes[child, RIGHT] = -1
+        nodes[child, PARENT] = node
+        nodes[child, DEPTH] = nodes[node, DEPTH] + 1
+        nodes[child, START] = child_start
+        nodes[child, END] = child_end
+        nodes[child, SPLITTABLE] = UNKNOWN
+    statistics[left, SUMMED_WEIGHTS] = left_weights
+    statistics[left, SUMMED_Y] = left_y
+    statistics[right, SUMMED_WEIGHTS] = statistics[node, SUMMED_WEIGHTS] - left_weights
+    statistics[right, SUMMED_Y] = statistics[node, SUMMED_Y] - left_y
+    nodes[node, FEATURE] = variable
+    nodes[node, LEFT] = left
+    nodes[node, RIGHT] = right
+    threshold[node] = value
+
+
+@njit(cache=True)
+def apply_prune(nodes, statistics, free, n_free, t, node):
+    """
+    Collapse a decision node with two leaf children, its rows already form a single range
+    """
+    left, right = nodes[node, LEFT], nodes[node, RIGHT]
+    statistics[node, SUMMED_WEIGHTS] = statistics[left, SUMMED_WEIGHTS] + statistics[right, SUMMED_WEIGHTS]
+    statistics[node, SUMMED_Y] = statistics[left, SUMMED_Y] + statistics[right, SUMMED_Y]
+    nodes[node, FEATURE] = LEAF
+    nodes[node, LEFT] = -1
+    nodes[node, RIGHT] = -1
+    nodes[node, SPLITTABLE] = 1
+    free_node(nodes, free, n_free, t, right)
+    free_node(nodes, free, n_free, t, left)
+
+
+@njit(cache=True)
+def tree_step(nodes, threshold, statistics, free, n_free, n_slots, versions, t, X, order, weights, residuals,
+              var, var_mu, mu, alpha, beta, p_grow, p_prune, variables):
+    """
+    Propose a grow or prune of tree t and accept it with the Metropolis Hastings rule of the python sampler
+
+    Moves that can't be made on the tree are redrawn, as `UniformMutationProposer` does
+    The leaf statistics have to be up to date with the residuals, and are kept so by the move
+
+    Returns
+    -------
+    bool
+        Whether the move was accepted
+    """
+    n_splittable, n_prunable = tree_counts(nodes, n_slots[t], X, order)
+    for _ in range(MAX_PROPOSALS):
+        if np.random.random() < p_grow:
+            if n_splittable == 0:
+                continue
+            node = nth_splittable_leaf(nodes, n_slots[t], np.random.randint(0, n_splittable))
+            start, end = nodes[node, START], nodes[node, END]
+            n_variables = splittable_variables(X, order, start, end, variables)
+            variable = variables[np.random.randint(0, n_variables)]
+            split_value = random_split_value(X, order, start, end, variable)
+            ratio, left_weights, left_y = log_grow_probability_ratio(nodes, statistics, X, order, node, variable, split_value, n_variables,
+                                                                     weights, residuals, var, var_mu, mu, alpha, beta,
+                                                                     p_grow, p_prune, n_splittable, n_prunable)
+            if np.random.random() < ratio:
+                apply_grow(nodes, threshold, statistics, free, n_free, n_slots, t, X, order, node, variable, split_value, left_weights, left_y)
+                versions[t] += 1
+                return True
+            return False
+        else:
+            if n_prunable == 0:
+                continue
+            node = nth_prunable_node(nodes, n_slots[t], np.random.randint(0, n_prunable))
+            n_variables = splittable_variables(X, order, nodes[node, START], nodes[node, END], variables)
+            ratio = log_prune_probability_ratio(nodes, threshold, statistics, X, order, node, n_variables,
+                                                var, var_mu, mu, alpha, beta, p_grow, p_prune, n_splittable, n_prunable)
+            if np.random.random() < ratio:
+                apply_prune(nodes, statistics, free, n_free, t, node)
+                versions[t] += 1
+                return True
+            return False
+    return False
+
+
+@njit(cache=True)
+def sample_leaves(nodes, value, statistics, n_slots, var, var_mu, mu, n_trees):
+    for k in range(n_slots):
+        if nodes[k, FEATURE] == LEAF:
+            posterior_variance = 1. / (1. / var_mu + statistics[k, SUMMED_WEIGHTS] / var)
+            posterior_mean = posterior_variance * (statistics[k, SUMMED_Y] / var + mu / var_mu)
+            value[k] = posterior_mean + np.random.standard_normal() * np.sqrt(posterior_variance / n_trees)
+
+
+@njit(cache=True)
+def add_tree_predictions(nodes, value, n_slots, order, predictions, sign):
+    for k in range(n_slots):
+        if nodes[k, FEATURE] == LEAF:
+            for i in range(nodes[k, START], nodes[k, END]):
+                predictions[order[i]] += sign * value[k]
+
+
+@njit(cache=True)
+def sweep_ensemble(nodes, threshold, value, statistics, free, n_free, n_slots, versions, order,
+                   X, weights, target, predictions, residuals, var, var_mu, mu, alpha, beta, p_grow, p_prune):
+    """
+    One Gibbs pass over every tree of an ensemble, each fit to the target minus the other trees' predictions
+
+    `predictions` is overwritten with the summed predictions of the ensemble at the end of the pass
+
+    Returns
+    -------
+    int
+        Number of accepted tree moves
+    """
+    n_trees = nodes.shape[0]
+    predictions[:] = 0.
+    for t in range(n_trees):
+        add_tree_predictions(nodes[t], value[t], n_slots[t], order[t], predictions, 1.)
+    variables = np.empty(X.shape[1], dtype=np.int64)
+    n_accepted = 0
+    for t in range(n_trees):
+        add_tree_predictions(nodes[t], value[t], n_slots[t], order[t], predictions, -1.)
+        for i in range(len(target)):
+            residuals[i] = target[i] - predictions[i]
+        leaf_statistics(nodes[t], statistics[t], n_slots[t], order[t], weights, residuals)
+        if tree_step(nodes[t], threshold[t], statistics[t], free[t], n_free, n_slots, versions, t, X, order[t], weights, residuals,
+                     var, var_mu, mu, alpha, beta, p_grow, p_prune, variables):
+            n_accepted += 1
+        sample_leaves(nodes[t], value[t], statistics[t], n_slots[t], var, var_mu, mu, n_trees)
+        add_tree_predictions(nodes[t], value[t], n_slots[t], order[t], predictions, 1.)
+    return n_accepted
+
+
+@njit(cache=True)
+def sample_sigma(y, predictions_g, predictions_h, pbw, paw2, alpha, beta):
+    summed_squares = 0.
+    for i in range(len(y)):
+        residual = y[i] - predictions_g[i] - pbw[i] * predictions_h[i]
+        summed_squares += paw2[i] * residual * residual
+    posterior_alpha = alpha + len(y) / 2.
+    posterior_beta = beta + 0.5 * summed_squares
+    return np.power(np.random.gamma(posterior_alpha, 1. / posterior_beta), -0.5)
@@ -0,0 +1,204 @@
+from copy import deepcopy
+from typing import Mapping, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from bartpy.bartpy.data import precision_weights_g, precision_weights_h
+from bartpy.bartpy.model import ModelCGM
+from bartpy.bartpy.samplers.compiled import kernels
+from bartpy.bartpy.samplers.modelsampler import Chain, STEP_KINDS, acceptance_rates, stored_iterations
+from bartpy.bartpy.samplers.sampler import Sampler
+from bartpy.bartpy.samplers.unconstrainedtree.proposer import UniformMutationProposer, uniformly_sample_grow_mutation, uniformly_sample_prune_mutation
+from bartpy.bartpy.samplers.unconstrainedtree.treemutation import UnconstrainedTreeMutationSampler
+from bartpy.bartpy.snapshot import ModelSnapshotCGM
+from bartpy.bartpy.treearena import TreeArena
+
+
+class CompiledSweepCGM:
+    """
+    The state of a `ModelCGM` as plain arrays, for sampling with the compiled kernels
+
+    Sampling starts from the model's current trees and sigma, after that the model's trees are left alone
+    and only `model.sigma` is kept up to date
+
+    Parameters
+    ----------
+    model: ModelCGM
+    """
+
+    def __init__(self, model: ModelCGM):
+        #print("enter bartpy/bartpy/samplers/compiled/modelsampler.py CompiledSweepCGM __init__")
+        self.model = model
+        data = model.data
+        n_obsv = data.X.n_obsv
+        self.X = np.ascontiguousarray(data.X.values, dtype=float)
+        self.y = np.ascontiguousarray(data.y.values, dtype=float)
+        W, p = data.W.values, data.p.values
+        self.weights_g = np.ascontiguousarray(precision_weights_g(W, p), dtype=float)
+        self.weights_h = np.ascontiguousarray(precision_weights_h(p), dtype=float)
+        self.paw2 = np.ascontiguousarray(W * (p ** 2) + (1 - W) * ((1 - p) ** 2), dtype=float)
+        self.pbw = np.ascontiguousarray(model._pbw, dtype=float)
+        self.h_factor = np.ascontiguousarray(model._h_factor, dtype=float)
+
+        self.arena_g = None if model.fix_g is not None else TreeArena.from_trees(model.trees_g, self.X)
+        self.arena_h = None if model.fix_h is not None else TreeArena.from_trees(model.trees_h, self.X)
+        self.predictions_g = self._fixed_or_predicted(model.fix_g, self.arena_g, n_obsv)
+        self.predictions_h = self._fixed_or_predicted(model.fix_h, self.arena_h, n_obsv)
+        self.target = np.empty(n_obsv)
+        self.residuals = np.empty(n_obsv)
+        #print("-exit bartpy/bartpy/samplers/compiled/modelsampler.py CompiledSweepCGM __init__")
+
+    @staticmethod
+    def _fixed_or_predicted(fixed, arena: Optional[TreeArena], n_obsv: int) -> np.ndarray:
+        if arena is None:
+            return np.array(np.broadcast_to(np.asarray(fixed, dtype=float), n_obsv))
+        return arena.predict()
+
+    def _sweep(self, arena: TreeArena, weights: np.ndarray, predictions: np.ndarray,
+               sigma_mu: float, mu: float, alpha: float, beta: float, p_grow: float, p_prune: float) -> int:
+        arena.ensure_capacity()
+        var = self.model.sigma.current_value() ** 2
+        output = kernels.sweep_ensemble(arena.nodes, arena.threshold, arena.value, arena.statistics, arena.free, arena.n_free,
+                                        arena.n_slots, arena.versions, arena.order, self.X, weights, self.target, predictions,
+                                        self.residuals, var, sigma_mu ** 2, mu, alpha, beta, p_grow, p_prune)
+        return output
+
+    def step(self, p_grow: float, p_prune: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        One Gibbs step over the g trees, the h trees and sigma
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Number of accepted and of proposed steps of each kind in `STEP_KINDS`
+        """
+        model = self.model
+        accepted = np.zeros(len(STEP_KINDS))
+        proposed = np.zeros(len(STEP_KINDS))
+        tree = STEP_KINDS.index("Tree")
+        if self.arena_g is not None:
+            np.subtract(self.y, self.pbw * self.predictions_h, out=self.target)
+            accepted[tree] += self._sweep(self.arena_g, self.weights_g, self.predictions_g,
+                                          model.sigma_g, model.mu_g, model.alpha_g, model.beta_g, p_grow, p_prune)
+            proposed[tree] += self.arena_g.n_trees
+        if self.arena_h is not None:
+            np.multiply(self.y - self.predictions_g, self.h_factor, out=self.target)
+            accepted[tree] += self._sweep(self.arena_h, self.weights_h, self.predictions_h,
+                                          model.sigma_h, model.mu_h, model.alpha_h, model.beta_h, p_grow, p_prune)
+            proposed[tree] += self.arena_h.n_trees
+        if model.fix_sigma is None:
+            model.sigma.set_value(kernels.sample_sigma(self.y, self.predictions_g, self.predictions_h, self.pbw, self.paw2,
+                                                       model.sigma.alpha, model.sigma.beta))
+        else:
+            model.sigma.set_value(model.fix_sigma)
+        return accepted, proposed
+
+    def snapshot(self) -> ModelSnapshotCGM:
+        model = self.model
+        output = ModelSnapshotCGM(
+            trees_g=[] if self.arena_g is None else self.arena_g.snapshots(),
+            trees_h=[] if self.arena_h is None else self.arena_h.snapshots(),
+            sigma=deepcopy(model.sigma),
+            mu_g=model.mu_g,
+            mu_h=model.mu_h,
+            fix_g=model.fix_g,
+            fix_h=model.fix_h,
+            fix_sigma=model.fix_sigma,
+            alpha_g=model.alpha_g,
+            beta_g=model.beta_g,
+            alpha_h=model.alpha_h,
+            beta_h=model.beta_h,
+        )
+        return output
+
+
+class CompiledModelSamplerCGM(Sampler):
+    """
+    Samples a `ModelCGM` with whole Gibbs sweeps run by the compiled kernels
+
+    Targets the same posterior as a `ModelSamplerCGM` with the default schedule,
+    but the trees are only changed by grow and prune moves
+
+    Parameters
+    ----------
+    p_grow: float
+        probability of proposing a grow move, the remaining proposals are prunes
+    p_prune: float
+    """
+
+    def __init__(self, p_grow: float=0.5, p_prune: float=0.5):
+        #print("enter bartpy/bartpy/samplers/compiled/modelsampler.py CompiledModelSamplerCGM __init__")
+        self.p_grow = p_grow / (p_grow + p_prune)
+        self.p_prune = p_prune / (p_grow + p_prune)
+        self._generator = None
+        #print("-exit bartpy/bartpy/samplers/compiled/modelsampler.py CompiledModelSamplerCGM __init__")
+
+    @classmethod
+    def from_tree_sampler(cls, tree_sampler: Sampler) -> 'CompiledModelSamplerCGM':
+        """
+        The compiled equivalent of sampling with `tree_sampler`, using the same grow and prune probabilities
+
+        Raises a ValueError unless `tree_sampler` is an unconstrained tree sampler proposing grow and prune moves only,
+        as nothing else has a compiled equivalent
+        """
+        proposer = getattr(tree_sampler, "proposer", None)
+        if type(tree_sampler) != UnconstrainedTreeMutationSampler or type(proposer) != UniformMutationProposer:
+            raise ValueError("The numba backend only runs the grow and prune tree sampler, got {}".format(type(tree_sampler).__name__))
+        lookup = proposer.prob_method_lookup
+        if not set(lookup).issubset({uniformly_sample_grow_mutation, uniformly_sample_prune_mutation}):
+            raise ValueError("The numba backend only runs grow and prune moves, the tree sampler also proposes other moves")
+        output = cls(lookup.get(uniformly_sample_grow_mutation, 0.), lookup.get(uniformly_sample_prune_mutation, 0.))
+        return output
+
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._generator = generator
+
+    def _seed_kernels(self) -> None:
+        # The kernels draw from numba's own generator, which is seeded from the chain's stream
+        if self._generator is None:
+            kernels.seed(int(np.random.randint(2 ** 31)))
+        else:
+            kernels.seed(int(self._generator.integers(2 ** 31)))
+
+    def step(self, model: ModelCGM, sweep: CompiledSweepCGM) -> Mapping[str, float]:
+        #print("enter bartpy/bartpy/samplers/compiled/modelsampler.py CompiledModelSamplerCGM step")
+        output = acceptance_rates(sweep.step(self.p_grow, self.p_prune))
+        #print("-exit bartpy/bartpy/samplers/compiled/modelsampler.py CompiledModelSamplerCGM step")
+        return output
+
+    def samples(self, model: ModelCGM,
+                n_samples: int,
+                n_burn: int,
+                thin: float=0.1,
+                store_in_sample_predictions: bool=True,
+                store_acceptance: bool=True,
+                dtype=np.float64) -> Chain:
+        print("")
+        #print("enter bartpy/bartpy/samplers/compiled/modelsampler.py CompiledModelSamplerCGM samples")
+        print("Starting burn")
+
+        self._seed_kernels()
+        sweep = CompiledSweepCGM(model)
+
+        for _ in tqdm(range(n_burn)):
+            sweep.step(self.p_grow, self.p_prune)
+        print("Starting sampling")
+
+        stored = set(stored_iterations(n_samples, thin))
+        n_obsv = model.data.X.n_obsv if store_in_sample_predictions else 0
+        chain = Chain(len(stored), n_obsv, ["in_sample_predictions_g", "in_sample_predictions_h"], store_acceptance, dtype)
+        row = 0
+        for ss in tqdm(range(n_samples)):
+            counts = sweep.step(self.p_grow, self.p_prune)
+            if ss in stored:
+                predictions = {}
+                if store_in_sample_predictions:
+                    predictions["in_sample_predictions_g"] = sweep.predictions_g
+                    predictions["in_sample_predictions_h"] = sweep.predictions_h
+                chain.record(row, predictions, model.sigma.current_value(), counts)
+                chain.models.append(sweep.snapshot())
+                row += 1
+        #print("-exit bartpy/bartpy/samplers/compiled/modelsampler.py CompiledModelSamplerCGM samples")
+        print("")
+        return chain
@@ -0,0 +1,138 @@
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from bartpy.bartpy.data import Data
+
+
+class CandidateStatistics:
+    """
+    Sufficient statistics of one side of every candidate split of a node, as arrays with one entry per candidate
+
+    Quacks like the `Data` of a node, so the grow ratios in `unconstrainedtree.likihoodratio` can be evaluated
+    for all candidates at once.
+    The statistics only hold a single weighting, so the g and h accessors return the same arrays
+
+    Parameters
+    ----------
+    n_obsv: np.ndarray
+        Number of rows
+    summed_weights: np.ndarray
+        Summed precision weights, or number of rows for the unweighted model
+    summed_y: np.ndarray
+        Summed target, weighted by the precision weights if there are any
+    """
+
+    def __init__(self, n_obsv: np.ndarray, summed_weights: np.ndarray, summed_y: np.ndarray):
+        self.n_obsv = n_obsv
+        self._summed_weights = summed_weights
+        self._summed_y = summed_y
+
+    def summed_y(self) -> np.ndarray:
+        return self._summed_y
+
+    def summed_weights_g(self) -> np.ndarray:
+        return self._summed_weights
+
+    def summed_weights_h(self) -> np.ndarray:
+        return self._summed_weights
+
+    def summed_y_tilde_g(self) -> np.ndarray:
+        return self._summed_y
+
+    def summed_y_tilde_h(self) -> np.ndarray:
+        return self._summed_y
+
+
+def split_candidates(data: Data,
+                     weights: Optional[np.ndarray]=None,
+                     total_weights: float=None,
+                     total_y: float=None) -> Tuple[np.ndarray, np.ndarray, CandidateStatistics, CandidateStatistics]:
+    """
+    Every split of every splittable variable of a node, along with the statistics of the two children it would create
+
+    Parameters
+    ----------
+    data: Data
+        Data of the node being split
+    weights: np.ndarray
+        Full length precision weights, e.g. `weights_g.values`, rows are counted if not passed
+    total_weights, total_y: float
+        The node's summed weights and weighted summed target, needed to get the right children as complements
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, CandidateStatistics, CandidateStatistics]
+        splitting variable and splitting value of each candidate, and statistics of the left and right children
+    """
+    #print("enter bartpy/bartpy/samplers/growfromroot/likihood.py split_candidates")
+    variables, values, left_weights, left_y, left_n = [], [], [], [], []
+    for variable in data.X.splittable_variables():
+        splitting_values, summed_weights, summed_y = data.cumulative_statistics(variable, weights)
+        variables.append(np.full(len(splitting_values), variable))
+        values.append(splitting_values)
+        left_weights.append(summed_weights)
+        left_y.append(summed_y)
+        if weights is not None:
+            left_n.append(data.X.split_ends(variable)[1] + 1)
+    if len(variables) == 0:
+        empty = CandidateStatistics(np.zeros(0), np.zeros(0), np.zeros(0))
+        #print("-exit bartpy/bartpy/samplers/growfromroot/likihood.py split_candidates")
+        return np.zeros(0, dtype=int), np.zeros(0), empty, empty
+
+    left_weights, left_y = np.concatenate(left_weights), np.concatenate(left_y)
+    left_n = np.concatenate(left_n) if weights is not None else left_weights
+    if weights is None:
+        total_weights, total_y = data.n_obsv, data.summed_y()
+    left = CandidateStatistics(left_n, left_weights, left_y)
+    right = CandidateStatistics(data.n_obsv - left_n, total_weights - left_weights, total_y - left_y)
+    #print("-exit bartpy/bartpy/samplers/growfromroot/likihood.py split_candidates")
+    return np.concatenate(variables), np.concatenate(values), left, right
+
+
+def sample_split(data: Data,
+                 log_grow_ratio: Callable[[Data, CandidateStatistics, CandidateStatistics], np.ndarray],
+                 log_probability_split: float,
+                 log_probability_not_split: float,
+                 uniform: float,
+                 weights: Optional[np.ndarray]=None,
+                 total_weights: float=None,
+                 total_y: float=None) -> Optional[Tuple[int, float]]:
+    """
+    Draw the split of a node, or no split, from their posterior probabilities
+
+    Each candidate has prior probability P(split) / n_candidates and the node is left unsplit with
+    probability 1 - P(split), both scaled by the marginal likelihood ratio of the split against the unsplit node
+
+    Parameters
+    ----------
+    data: Data
+        Data of the node
+    log_grow_ratio: Callable[[Data, CandidateStatistics, CandidateStatistics], np.ndarray]
+        Log marginal likelihood ratio of splitting the node, one of the grow ratios with the model parameters bound
+    log_probability_split, log_probability_not_split: float
+        Tree prior of the node at its depth
+    uniform: float
+        A uniform(0, 1) draw
+    weights, total_weights, total_y:
+        See `split_candidates`
+
+    Returns
+    -------
+    Optional[Tuple[int, float]]
+        Splitting variable and value, None if the node isn't split
+    """
+    #print("enter bartpy/bartpy/samplers/growfromroot/likihood.py sample_split")
+    variables, values, left, right = split_candidates(data, weights, total_weights, total_y)
+    if len(variables) == 0:
+        #print("-exit bartpy/bartpy/samplers/growfromroot/likihood.py sample_split")
+        return None
+    log_weights = np.append(log_grow_ratio(data, left, right) + log_probability_split - np.log(len(variables)),
+                            log_probability_not_split)
+    cumulative = np.cumsum(np.exp(log_weights - np.max(log_weights)))
+    chosen = min(int(np.searchsorted(cumulative, uniform * cumulative[-1], side="right")), len(variables))
+    if chosen == len(variables):
+        #print("-exit bartpy/bartpy/samplers/growfromroot/likihood.py sample_split")
+        return None
+    #print("-exit bartpy/bartpy/samplers/growfromroot/likihood.py sample_split")
+    return int(variables[chosen]), values[chosen]
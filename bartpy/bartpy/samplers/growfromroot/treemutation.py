@@ -0,0 +1,127 @@
+from operator import le, gt
+from typing import Callable, Optional
+
+import numpy as np
+
+from bartpy.bartpy.model import Model, ModelCGM
+from bartpy.bartpy.mutation import GrowMutation, PruneMutation
+from bartpy.bartpy.node import LeafNode
+from bartpy.bartpy.samplers.growfromroot.likihood import sample_split
+from bartpy.bartpy.samplers.sampler import Sampler
+from bartpy.bartpy.samplers.scalar import UniformScalarSampler
+from bartpy.bartpy.samplers.unconstrainedtree.likihoodratio import (
+    log_grow_ratio, log_grow_ratio_cgm_g, log_grow_ratio_cgm_h,
+    log_probability_node_split, log_probability_node_split_g, log_probability_node_split_h,
+    log_probability_node_not_split, log_probability_node_not_split_g, log_probability_node_not_split_h)
+from bartpy.bartpy.split import SplitCondition
+from bartpy.bartpy.tree import Tree, mutate
+
+
+def prune_to_root(tree: Tree) -> None:
+    """
+    Prune the tree back to a single leaf, one prunable decision node at a time
+    """
+    #print("enter bartpy/bartpy/samplers/growfromroot/treemutation.py prune_to_root")
+    while tree.n_prunable_decision_nodes > 0:
+        node = tree.prunable_decision_nodes[0]
+        mutate(tree, PruneMutation(node, LeafNode(node.split, depth=node.depth)))
+    #print("-exit bartpy/bartpy/samplers/growfromroot/treemutation.py prune_to_root")
+
+
+class GrowFromRootSampler(Sampler):
+    """
+    A sampler that regrows the whole tree from its root every time it is stepped
+
+    Rather than proposing a single grow or prune move, the tree is cut back to its root and then each leaf is,
+    in turn, either split or kept, drawing the split from all of its candidate cut points at once.
+    The candidates are weighted by the same marginal likelihood ratios as the grow moves of
+    `UnconstrainedTreeMutationSampler`, evaluated for every cut point of a variable in one pass over its presorted rows
+
+    The leaves of the regrown tree have no value, so the sampler must be followed by a leaf node step,
+    as in `SampleSchedule` / `SampleScheduleCGM`
+    """
+
+    def __init__(self, scalar_sampler: UniformScalarSampler=None):
+        #print("enter bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler __init__")
+        if scalar_sampler is None:
+            scalar_sampler = UniformScalarSampler()
+        self._scalar_sampler = scalar_sampler
+        #print("-exit bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler __init__")
+
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._scalar_sampler.set_generator(generator)
+
+    def _grow(self,
+              tree: Tree,
+              ratio: Callable,
+              p_split: Callable[[int], float],
+              p_not_split: Callable[[int], float],
+              weights: Callable=None) -> Optional[GrowMutation]:
+        """
+        Regrow the tree, returning the mutation that split the root, or None if the tree is left as a single leaf
+        """
+        #print("enter bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler _grow")
+        prune_to_root(tree)
+        root_mutation = None
+        to_grow = [tree.root]
+        while to_grow:
+            node = to_grow.pop()
+            if not node.is_splittable():
+                continue
+            if weights is None:
+                split = sample_split(node.data, ratio, p_split(node.depth), p_not_split(node.depth),
+                                     self._scalar_sampler.sample())
+            else:
+                split = sample_split(node.data, ratio, p_split(node.depth), p_not_split(node.depth),
+                                     self._scalar_sampler.sample(), *weights(node.data))
+            if split is None:
+                continue
+            variable, value = split
+            mutation = GrowMutation(node, split_conditions=(SplitCondition(variable, value, le),
+                                                            SplitCondition(variable, value, gt)))
+            mutate(tree, mutation)
+            if root_mutation is None:
+                root_mutation = mutation
+            to_grow.append(mutation.updated_node.right_child)
+            to_grow.append(mutation.updated_node.left_child)
+        #print("-exit bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler _grow")
+        return root_mutation
+
+    def step(self, model: Model, tree: Tree) -> Optional[GrowMutation]:
+        #print("enter bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler step")
+        output = self._grow(
+            tree,
+            lambda data, left, right: log_grow_ratio(data, left, right, model.sigma, model.sigma_m),
+            lambda depth: log_probability_node_split(model, depth),
+            lambda depth: log_probability_node_not_split(model, depth))
+        #print("-exit bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler step")
+        return output
+
+    def step_cgm_g(self, model: ModelCGM, tree: Tree) -> Optional[GrowMutation]:
+        #print("enter bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler step_cgm_g")
+        output = self._grow(
+            tree,
+            lambda data, left, right: log_grow_ratio_cgm_g(data, left, right, model.sigma, model.sigma_g, model.mu_g),
+            lambda depth: log_probability_node_split_g(model, depth),
+            lambda depth: log_probability_node_not_split_g(model, depth),
+            lambda data: (data.weights_g.values, data.summed_weights_g(), data.summed_y_tilde_g()))
+        #print("-exit bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler step_cgm_g")
+        return output
+
+    def step_cgm_h(self, model: ModelCGM, tree: Tree) -> Optional[GrowMutation]:
+        #print("enter bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler step_cgm_h")
+        output = self._grow(
+            tree,
+            lambda data, left, right: log_grow_ratio_cgm_h(data, left, right, model.sigma, model.sigma_h, model.mu_h),
+            lambda depth: log_probability_node_split_h(model, depth),
+            lambda depth: log_probability_node_not_split_h(model, depth),
+            lambda data: (data.weights_h.values, data.summed_weights_h(), data.summed_y_tilde_h()))
+        #print("-exit bartpy/bartpy/samplers/growfromroot/treemutation.py GrowFromRootSampler step_cgm_h")
+        return output
+
+
+def get_tree_sampler() -> Sampler:
+    #print("enter bartpy/bartpy/samplers/growfromroot/treemutation.py get_tree_sampler")
+    output = GrowFromRootSampler()
+    #print("-exit bartpy/bartpy/samplers/growfromroot/treemutation.py get_tree_sampler")
+    return output
@@ -1,9 +1,12 @@
+from typing import List, Optional
+
 import numpy as np
 
 from bartpy.bartpy.model import Model, ModelCGM
 from bartpy.bartpy.node import LeafNode
 from bartpy.bartpy.samplers.sampler import Sampler
 from bartpy.bartpy.samplers.scalar import NormalScalarSampler
+from bartpy.bartpy.tree import Tree
 
 
 class LeafNodeSampler(Sampler):
@@ -15,11 +18,16 @@ class LeafNodeSampler(Sampler):
     """
 
     def __init__(self,
-                 scalar_sampler=NormalScalarSampler(60000)):
+                 scalar_sampler: NormalScalarSampler=None):
         #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler __init__")
+        if scalar_sampler is None:
+            scalar_sampler = NormalScalarSampler(60000)
         self._scalar_sampler = scalar_sampler
         #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._scalar_sampler.set_generator(generator)
+
     def step(self, model: Model, node: LeafNode) -> float:
         #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler step")
         sampled_value = self.sample(model, node)
@@ -56,26 +64,13 @@ class LeafNodeSampler(Sampler):
     def sample_cgm_g(self, model: ModelCGM, node: LeafNode) -> float:
         #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_cgm_g")
 
-        group = ~node.data.mask
-        #print("g tree N in Node:", sum(group))
-        
         prior_var = model.sigma_g ** 2
         prior_mean = model.mu_g
-        W = node.data.W.values # needs to apply mask
-        p = node.data.p.values # needs to apply mask
-        sigma_g_i = (W/p + (1-W)/(1-p))*model.sigma.current_value()
-        
-        one_over_sigma_g_i_sqrd = 1./(sigma_g_i**2)
-        posterior_variance = (
-            1./(
-                (1./prior_var) + 
-                np.sum( (~node.data.mask).astype(int) * one_over_sigma_g_i_sqrd)
-            )
-        )
+        var = model.sigma.current_value() ** 2
+        # 1 / sigma_g_i^2 = w_g_i / sigma^2, with the node sums of w_g_i and w_g_i * y_i cached on the node
+        posterior_variance = 1./( (1./prior_var) + node.data.summed_weights_g() / var)
         
-        post_mean_numerator = np.sum( 
-            (~node.data.mask).astype(int) * (node.data.y.values*one_over_sigma_g_i_sqrd)
-        )
+        post_mean_numerator = node.data.summed_y_tilde_g() / var
         posterior_mean = posterior_variance*(post_mean_numerator + prior_mean/prior_var)
         output = posterior_mean + (self._scalar_sampler.sample() * np.power(posterior_variance / model.n_trees_g, 0.5))
         #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_cgm_g")
@@ -91,23 +86,10 @@ class LeafNodeSampler(Sampler):
         
         #print("true sigma:",model.sigma.current_value())
         
-        group = ~node.data.mask
-        #print("h tree N in Node:", sum(group))
-        p = node.data.p.values[group] # needs to apply mask
-        sigma_h_i = ((1./(p*(1-p)))*model.sigma.current_value())
-        node_values = node.data.y.values[group]
-        
-        #sigma_h_i = (1./(p*(1-p)))*model.sigma.current_value()
-        
-        one_over_sigma_h_i_sqrd = 1./(sigma_h_i**2)
-        #print("one_over_sigma_h_i_sqrd=",one_over_sigma_h_i_sqrd)
-        #posterior_variance = 1./( (1/prior_var) + np.sum(((~node.data.mask).astype(int))*(one_over_sigma_h_i_sqrd)))
-        posterior_variance = 1./( (1/prior_var) + np.sum( one_over_sigma_h_i_sqrd))
-        
-        #print("(~node.data.mask).astype(int):", (~node.data.mask).astype(int) )
-        #print("~node.data.mask:", ~node.data.mask )
-        #post_mean_numerator = np.sum((~node.data.mask).astype(int)*(node.data.y.values*one_over_sigma_h_i_sqrd))
-        post_mean_numerator = np.sum( node_values*one_over_sigma_h_i_sqrd)
+        var = model.sigma.current_value() ** 2
+        # 1 / sigma_h_i^2 = w_h_i / sigma^2, with the node sums of w_h_i and w_h_i * y_i cached on the node
+        posterior_variance = 1./( (1/prior_var) + node.data.summed_weights_h() / var)
+        post_mean_numerator = node.data.summed_y_tilde_h() / var
         posterior_mean = posterior_variance*(post_mean_numerator + prior_mean/prior_var)
         #print("posterior_mean=",posterior_mean)
         #print("posterior_variance=",posterior_variance)
@@ -115,6 +97,86 @@ class LeafNodeSampler(Sampler):
         #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_cgm_h")
         return output
 
+    def step_tree(self, model: Model, tree: Tree) -> np.ndarray:
+        """
+        Sample the values of all of the leaves of a tree in one go
+        Equivalent to calling `step` on each of `tree.leaf_nodes` in turn
+        """
+        #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler step_tree")
+        leaves = tree.leaf_nodes
+        sampled_values = self.sample_tree(model, tree, leaves)
+        set_leaf_values(leaves, sampled_values)
+        #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler step_tree")
+        return sampled_values
+
+    def step_tree_cgm_g(self, model: ModelCGM, tree: Tree) -> np.ndarray:
+        #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler step_tree_cgm_g")
+        leaves = tree.leaf_nodes
+        sampled_values = self.sample_tree_cgm_g(model, tree, leaves)
+        set_leaf_values(leaves, sampled_values)
+        #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler step_tree_cgm_g")
+        return sampled_values
+
+    def step_tree_cgm_h(self, model: ModelCGM, tree: Tree) -> np.ndarray:
+        #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler step_tree_cgm_h")
+        leaves = tree.leaf_nodes
+        sampled_values = self.sample_tree_cgm_h(model, tree, leaves)
+        set_leaf_values(leaves, sampled_values)
+        #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler step_tree_cgm_h")
+        return sampled_values
+
+    def sample_tree(self, model: Model, tree: Tree, leaves: List[LeafNode]) -> np.ndarray:
+        #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_tree")
+        # Per leaf aggregates for every leaf at once, in the order of `leaves`
+        slots = leaf_slots(tree, leaves)
+        n = tree.leaf_summed_weights()[slots]
+        summed_y = tree.leaf_summed_y()[slots]
+
+        prior_var = model.sigma_m ** 2
+        likihood_var = (model.sigma.current_value() ** 2) / n
+        likihood_mean = summed_y / n
+        posterior_variance = 1. / (1. / prior_var + 1. / likihood_var)
+        posterior_mean = likihood_mean * (prior_var / (likihood_var + prior_var))
+        output = posterior_mean + (self._scalar_sampler.sample_batch(len(leaves)) * np.power(posterior_variance / model.n_trees, 0.5))
+        #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_tree")
+        return output
+
+    def sample_tree_cgm_g(self, model: ModelCGM, tree: Tree, leaves: List[LeafNode]) -> np.ndarray:
+        #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_tree_cgm_g")
+        weights = tree.root.data.weights_g.values
+        output = self._sample_tree_cgm(tree, leaves, weights, model.sigma_g ** 2, model.mu_g, model.sigma.current_value() ** 2, model.n_trees_g)
+        #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_tree_cgm_g")
+        return output
+
+    def sample_tree_cgm_h(self, model: ModelCGM, tree: Tree, leaves: List[LeafNode]) -> np.ndarray:
+        #print("enter bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_tree_cgm_h")
+        weights = tree.root.data.weights_h.values
+        output = self._sample_tree_cgm(tree, leaves, weights, model.sigma_h ** 2, model.mu_h, model.sigma.current_value() ** 2, model.n_trees_h)
+        #print("-exit bartpy/bartpy/samplers/leafnode.py LeafNodeSampler sample_tree_cgm_h")
+        return output
+
+    def _sample_tree_cgm(self, tree: Tree, leaves: List[LeafNode], weights: np.ndarray, prior_var: float, prior_mean: float, var: float, n_trees: int) -> np.ndarray:
+        # Per leaf sums of w_i and w_i * y_i for every leaf at once, in the order of `leaves`
+        slots = leaf_slots(tree, leaves)
+        summed_weights = tree.leaf_summed_weights(weights)[slots]
+        summed_y_tilde = tree.leaf_summed_y(weights)[slots]
+
+        posterior_variance = 1./( (1./prior_var) + summed_weights / var)
+        post_mean_numerator = summed_y_tilde / var
+        posterior_mean = posterior_variance*(post_mean_numerator + prior_mean/prior_var)
+        output = posterior_mean + (self._scalar_sampler.sample_batch(len(leaves)) * np.power(posterior_variance / n_trees, 0.5))
+        return output
+
+
+def leaf_slots(tree: Tree, leaves: List[LeafNode]) -> np.ndarray:
+    output = np.array([tree.leaf_slot(leaf) for leaf in leaves], dtype=np.int64)
+    return output
+
+
+def set_leaf_values(leaves: List[LeafNode], values: np.ndarray) -> None:
+    for leaf, value in zip(leaves, values):
+        leaf.set_value(float(value))
+
 # class VectorizedLeafNodeSampler(Sampler):
 
 #     def step(self, model: Model, nodes: List[LeafNode]) -> float:
@@ -1,5 +1,5 @@
-from collections import defaultdict
-from typing import List, Mapping, Union, Any, Type
+from collections.abc import Mapping
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Type
 
 import numpy as np
 from tqdm import tqdm
@@ -9,7 +9,148 @@ from bartpy.bartpy.samplers.sampler import Sampler
 from bartpy.bartpy.samplers.schedule import SampleSchedule, SampleScheduleCGM
 from bartpy.bartpy.trace import TraceLogger, TraceLoggerCGM
 
-Chain = Mapping[str, Union[List[Any], np.ndarray]]
+# Kinds of step yielded by the sample schedules, in the order of the acceptance counter columns
+STEP_KINDS = ("Tree", "Node")
+
+
+def stored_iterations(n_samples: int, thin: float) -> List[int]:
+    """
+    Which of the post burn in iterations get stored
+    """
+    thin_inverse = 1. / thin
+    output = [ss for ss in range(n_samples) if ss % thin_inverse == 0]
+    return output
+
+
+class Chain(Mapping):
+    """
+    Output of a single MCMC chain
+
+    All numeric output is written into a single preallocated 2D buffer, one row per stored sample,
+    so a chain pickles as one array and chains are joined with a single concatenate
+    The model samples themselves are kept in a plain list
+
+    Behaves as a read only mapping:
+     - "model": list of stored model samples
+     - each prediction name, e.g. "in_sample_predictions": (n_stored, n_obsv) view into the buffer
+     - "sigma": sampled sigma of each stored sample
+     - "accepted" / "proposed": (n_stored, len(STEP_KINDS)) counters of the logged steps in each stored iteration
+     - "acceptance": list of mappings from step kind to acceptance rate, empty unless acceptance is stored
+
+    Parameters
+    ----------
+    n_stored: int
+        number of samples stored by the chain
+    n_obsv: int
+        number of rows of the in sample predictions
+    prediction_names: Sequence[str]
+        keys of the in sample predictions
+    store_acceptance: bool
+        whether "acceptance" should list the acceptance rates
+    dtype:
+        type of the buffer, float32 halves the memory of the prediction matrices
+    """
+
+    def __init__(self,
+                 n_stored: int,
+                 n_obsv: int,
+                 prediction_names: Sequence[str]=(),
+                 store_acceptance: bool=True,
+                 dtype=np.float64):
+        self._columns = {}
+        n_columns = 0
+        for name in prediction_names:
+            self._columns[name] = slice(n_columns, n_columns + n_obsv)
+            n_columns += n_obsv
+        for name, width in [("sigma", 1), ("accepted", len(STEP_KINDS)), ("proposed", len(STEP_KINDS))]:
+            self._columns[name] = slice(n_columns, n_columns + width)
+            n_columns += width
+        self.prediction_names = list(prediction_names)
+        self.store_acceptance = store_acceptance
+        self.values = np.zeros((n_stored, n_columns), dtype=dtype)
+        self.models = []
+
+    @property
+    def n_stored(self) -> int:
+        return self.values.shape[0]
+
+    def record(self,
+               row: int,
+               predictions: Dict[str, np.ndarray],
+               sigma: float,
+               counts: Tuple[np.ndarray, np.ndarray]) -> None:
+        for name, prediction in predictions.items():
+            self.values[row, self._columns[name]] = prediction
+        self.values[row, self._columns["sigma"]] = sigma
+        self.values[row, self._columns["accepted"]] = counts[0]
+        self.values[row, self._columns["proposed"]] = counts[1]
+
+    def acceptance(self) -> List[Mapping]:
+        if not self.store_acceptance:
+            return []
+        accepted, proposed = self["accepted"], self["proposed"]
+        output = []
+        for row in range(self.n_stored):
+            output.append({kind: accepted[row, i] / proposed[row, i] for i, kind in enumerate(STEP_KINDS) if proposed[row, i] > 0})
+        return output
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "model":
+            return self.models
+        if key == "acceptance":
+            return self.acceptance()
+        if key == "sigma":
+            return self.values[:, self._columns[key]][:, 0]
+        if key in self._columns:
+            return self.values[:, self._columns[key]]
+        raise KeyError("No chain output for key {}".format(key))
+
+    def __iter__(self):
+        return iter(["model", "acceptance"] + list(self._columns))
+
+    def __len__(self) -> int:
+        return len(self._columns) + 2
+
+    @staticmethod
+    def concatenate(chains: Sequence['Chain']) -> 'Chain':
+        """
+        Join the output of several chains with the same layout, in order
+        """
+        first = chains[0]
+        output = Chain(0, 0, (), first.store_acceptance, first.values.dtype)
+        output._columns = first._columns
+        output.prediction_names = first.prediction_names
+        output.values = np.concatenate([chain.values for chain in chains], axis=0)
+        output.models = [model for chain in chains for model in chain.models]
+        return output
+
+
+def step_counts(schedule, model, trace_logger) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run one full Gibbs step
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Number of accepted and of logged steps of each kind in `STEP_KINDS`
+    """
+    accepted = np.zeros(len(STEP_KINDS))
+    proposed = np.zeros(len(STEP_KINDS))
+    for step_kind, step in schedule.steps(model):
+        result = step()
+        log_message = trace_logger[step_kind](result)
+        if log_message is not None:
+            i = STEP_KINDS.index(step_kind)
+            proposed[i] += 1
+            if log_message:
+                accepted[i] += 1
+    return accepted, proposed
+
+
+def acceptance_rates(counts: Tuple[np.ndarray, np.ndarray]) -> Mapping[str, float]:
+    accepted, proposed = counts
+    output = {kind: accepted[i] / proposed[i] for i, kind in enumerate(STEP_KINDS) if proposed[i] > 0}
+    return output
 
 
 class ModelSampler(Sampler):
@@ -22,15 +163,12 @@ class ModelSampler(Sampler):
         self.trace_logger_class = trace_logger_class
         #print("-exit bartpy/bartpy/samplers/modelsampler.py ModelSampler __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self.schedule.set_generator(generator)
+
     def step(self, model: Model, trace_logger: TraceLogger):
         #print("enter bartpy/bartpy/samplers/modelsampler.py ModelSampler step")
-        step_result = defaultdict(list)
-        for step_kind, step in self.schedule.steps(model):
-            result = step()
-            log_message = trace_logger[step_kind](result)
-            if log_message is not None:
-                step_result[step_kind].append(log_message)
-        output = {x: np.mean([1 if y else 0 for y in step_result[x]]) for x in step_result}        
+        output = acceptance_rates(step_counts(self.schedule, model, trace_logger))
         #print("-exit bartpy/bartpy/samplers/modelsampler.py ModelSampler step")
         return output
 
@@ -39,7 +177,8 @@ class ModelSampler(Sampler):
                 n_burn: int,
                 thin: float=0.1,
                 store_in_sample_predictions: bool=True,
-                store_acceptance: bool=True) -> Chain:
+                store_acceptance: bool=True,
+                dtype=np.float64) -> Chain:
         print("")
         #print("enter bartpy/bartpy/samplers/modelsampler.py ModelSampler samples")
         print("Starting burn")
@@ -47,34 +186,31 @@ class ModelSampler(Sampler):
         trace_logger = self.trace_logger_class()
 
         for _ in tqdm(range(n_burn)):
-            self.step(model, trace_logger)
-        trace = []
-        model_trace = []
-        acceptance_trace = []
+            step_counts(self.schedule, model, trace_logger)
         print("Starting sampling")
 
-        thin_inverse = 1. / thin
-        #print("thin_inverse=", thin_inverse)
+        stored = set(stored_iterations(n_samples, thin))
+        # Prediction columns have no width when they aren't stored
+        n_obsv = model.data.X.n_obsv if store_in_sample_predictions else 0
+        chain = Chain(len(stored), n_obsv, ["in_sample_predictions"], store_acceptance, dtype)
+        row = 0
         for ss in tqdm(range(n_samples)):
             #print("iteration: ",ss)
-            step_trace_dict = self.step(model, trace_logger)
-            if ss % thin_inverse == 0:
+            counts = step_counts(self.schedule, model, trace_logger)
+            if ss in stored:
+                predictions = {}
                 if store_in_sample_predictions:
                     in_sample_log = trace_logger["In Sample Prediction"](model.predict())
                     if in_sample_log is not None:
-                        trace.append(in_sample_log)
-                if store_acceptance:
-                    acceptance_trace.append(step_trace_dict)
+                        predictions["in_sample_predictions"] = in_sample_log
+                chain.record(row, predictions, model.sigma.current_value(), counts)
                 model_log = trace_logger["Model"](model)
                 if model_log is not None:
-                    model_trace.append(model_log)
+                    chain.models.append(model_log)
+                row += 1
         #print("-exit bartpy/bartpy/samplers/modelsampler.py ModelSampler samples")
         #print("")
-        return {
-            "model": model_trace,
-            "acceptance": acceptance_trace,
-            "in_sample_predictions": trace
-        }
+        return chain
 
 
 class ModelSamplerCGM(Sampler):
@@ -87,15 +223,12 @@ class ModelSamplerCGM(Sampler):
         self.trace_logger_class = trace_logger_class
         #print("-exit bartpy/bartpy/samplers/modelsampler.py ModelSamplerCGM __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self.schedule.set_generator(generator)
+
     def step(self, model: ModelCGM, trace_logger: TraceLogger):
         #print("enter bartpy/bartpy/samplers/modelsampler.py ModelSamplerCGM step")
-        step_result = defaultdict(list)
-        for step_kind, step in self.schedule.steps(model):
-            result = step()
-            log_message = trace_logger[step_kind](result)
-            if log_message is not None:
-                step_result[step_kind].append(log_message)
-        output = {x: np.mean([1 if y else 0 for y in step_result[x]]) for x in step_result}        
+        output = acceptance_rates(step_counts(self.schedule, model, trace_logger))
         #print("-exit bartpy/bartpy/samplers/modelsampler.py ModelSamplerCGM step")
         return output
 
@@ -104,7 +237,8 @@ class ModelSamplerCGM(Sampler):
                 n_burn: int,
                 thin: float=0.1,
                 store_in_sample_predictions: bool=True,
-                store_acceptance: bool=True) -> Chain:
+                store_acceptance: bool=True,
+                dtype=np.float64) -> Chain:
         print("")
         #print("enter bartpy/bartpy/samplers/modelsampler.py ModelSamplerCGM samples")
         print("Starting burn")
@@ -112,36 +246,31 @@ class ModelSamplerCGM(Sampler):
         trace_logger = self.trace_logger_class()
 
         for _ in tqdm(range(n_burn)):
-            self.step(model, trace_logger)
-        trace = []
-        trace_h = []
-        model_trace = []
-        acceptance_trace = []
+            step_counts(self.schedule, model, trace_logger)
         print("Starting sampling")
 
-        thin_inverse = 1. / thin
-        #print("thin_inverse=", thin_inverse)
+        stored = set(stored_iterations(n_samples, thin))
+        # Prediction columns have no width when they aren't stored
+        n_obsv = model.data.X.n_obsv if store_in_sample_predictions else 0
+        chain = Chain(len(stored), n_obsv, ["in_sample_predictions_g", "in_sample_predictions_h"], store_acceptance, dtype)
+        row = 0
         for ss in tqdm(range(n_samples)):
             #print("iteration: ",ss)
-            step_trace_dict = self.step(model, trace_logger)
-            if ss % thin_inverse == 0:
+            counts = step_counts(self.schedule, model, trace_logger)
+            if ss in stored:
+                predictions = {}
                 if store_in_sample_predictions:
                     in_sample_log_g = trace_logger["In Sample Prediction"](model.predict_g())
                     in_sample_log_h = trace_logger["In Sample Prediction"](model.predict_h())
                     if in_sample_log_g is not None:
-                        trace.append(in_sample_log_g)
+                        predictions["in_sample_predictions_g"] = in_sample_log_g
                     if in_sample_log_h is not None:
-                        trace_h.append(in_sample_log_h)
-                if store_acceptance:
-                    acceptance_trace.append(step_trace_dict)
+                        predictions["in_sample_predictions_h"] = in_sample_log_h
+                chain.record(row, predictions, model.sigma.current_value(), counts)
                 model_log = trace_logger["Model"](model)
                 if model_log is not None:
-                    model_trace.append(model_log)
+                    chain.models.append(model_log)
+                row += 1
         #print("-exit bartpy/bartpy/samplers/modelsampler.py ModelSamplerCGM samples")
         print("")
-        return {
-            "model": model_trace,
-            "acceptance": acceptance_trace,
-            "in_sample_predictions_g": trace,
-            "in_sample_predictions_h": trace_h,
-        }
+        return chain
@@ -32,13 +32,19 @@ class UnconstrainedTreeMutationSampler(Sampler):
     def __init__(self,
                  proposer: TreeMutationProposer,
                  likihood_ratio: TreeMutationLikihoodRatio,
-                 scalar_sampler=UniformScalarSampler()):
+                 scalar_sampler: UniformScalarSampler=None):
         #print("enter bartpy/bartpy/samplers/oblivioustrees/treemutation.py UnconstrainedTreeMutationSampler __init__")
+        if scalar_sampler is None:
+            scalar_sampler = UniformScalarSampler()
         self.proposer = proposer
         self.likihood_ratio = likihood_ratio
         self._scalar_sampler = scalar_sampler
         #print("-exit bartpy/bartpy/samplers/oblivioustrees/treemutation.py UnconstrainedTreeMutationSampler __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._scalar_sampler.set_generator(generator)
+        self.proposer.set_generator(generator)
+
     def sample(self, model: Model, tree: Tree) -> Optional[List[TreeMutation]]:
         #print("enter bartpy/bartpy/samplers/oblivioustrees/treemutation.py UnconstrainedTreeMutationSampler sample")
         
@@ -1,4 +1,7 @@
 from abc import abstractmethod, ABC
+from typing import Optional
+
+import numpy as np
 
 from bartpy.bartpy.model import Model
 from bartpy.bartpy.tree import Tree
@@ -11,3 +14,10 @@ class Sampler(ABC):
         #print("enter bartpy/bartpy/samplers/sampler.py Sampler step")
         raise NotImplementedError()
         #print("-exit bartpy/bartpy/samplers/sampler.py Sampler step")
+
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        """
+        Make all of the sampler's random draws from `generator`, or from the global `np.random` state if None
+        Samplers that don't draw anything themselves have nothing to do
+        """
+        pass
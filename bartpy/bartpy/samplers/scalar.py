@@ -1,79 +1,128 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
 import numpy as np
 
 
-class NormalScalarSampler():
+class ScalarSampler():
+    """
+    Serves random draws one at a time out of preallocated blocks, moving a cursor along the current block
+
+    Draws come from `generator` if one is set, otherwise from the global `np.random` state
+    Each chain should be given its own generator through `set_generator`, which makes the chains
+    reproducible and independent no matter which process they run in
+
+    Parameters
+    ----------
+    cache_size: int
+        Number of draws made each time the block runs out
+    generator: np.random.Generator
+        Source of the draws
+    """
 
     def __init__(self,
-                 cache_size: int=1000):
-        #print("enter bartpy/bartpy/samplers/scalar.py NormalScalarSampler __init__")
+                 cache_size: int=1000,
+                 generator: Optional[np.random.Generator]=None):
+        #print("enter bartpy/bartpy/samplers/scalar.py ScalarSampler __init__")
         self._cache_size = cache_size
-        self._cache = []
-        #print("-exit bartpy/bartpy/samplers/scalar.py NormalScalarSampler __init__")
+        self._generator = generator
+        self._cache = np.zeros(0)
+        self._cursor = 0
+        #print("-exit bartpy/bartpy/samplers/scalar.py ScalarSampler __init__")
+
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        """
+        Draw from `generator` from now on, throwing away anything left of the current block
+        """
+        #print("enter bartpy/bartpy/samplers/scalar.py ScalarSampler set_generator")
+        self._generator = generator
+        self._cache = np.zeros(0)
+        self._cursor = 0
+        #print("-exit bartpy/bartpy/samplers/scalar.py ScalarSampler set_generator")
+
+    def draw(self, random, size: int) -> np.ndarray:
+        """
+        A new block of draws
+
+        Parameters
+        ----------
+        random:
+            Either a `np.random.Generator` or the `np.random` module, only methods common to both are used
+        size: int
+        """
+        raise NotImplementedError()
 
     def sample(self):
-        #print("enter bartpy/bartpy/samplers/scalar.py NormalScalarSampler sample")
-        if len(self._cache) == 0:
+        #print("enter bartpy/bartpy/samplers/scalar.py ScalarSampler sample")
+        if self._cursor == len(self._cache):
             self.refresh_cache()
-        output = self._cache.pop()
-        #print("-exit bartpy/bartpy/samplers/scalar.py NormalScalarSampler sample")
+        output = self._cache[self._cursor]
+        self._cursor += 1
+        #print("-exit bartpy/bartpy/samplers/scalar.py ScalarSampler sample")
         return output
 
     def refresh_cache(self):
-        #print("enter bartpy/bartpy/samplers/scalar.py NormalScalarSampler refresh_cache")
-        self._cache = list(np.random.normal(size=self._cache_size))
-        #print("-exit bartpy/bartpy/samplers/scalar.py NormalScalarSampler refresh_cache")
+        #print("enter bartpy/bartpy/samplers/scalar.py ScalarSampler refresh_cache")
+        random = np.random if self._generator is None else self._generator
+        self._cache = self.draw(random, self._cache_size)
+        self._cursor = 0
+        #print("-exit bartpy/bartpy/samplers/scalar.py ScalarSampler refresh_cache")
+
+    def sample_batch(self, n: int) -> np.ndarray:
+        """
+        n draws at once, the same values as n consecutive calls to `sample`
+        """
+        #print("enter bartpy/bartpy/samplers/scalar.py ScalarSampler sample_batch")
+        if self._cursor + n <= len(self._cache):
+            output = self._cache[self._cursor:self._cursor + n]
+            self._cursor += n
+            #print("-exit bartpy/bartpy/samplers/scalar.py ScalarSampler sample_batch")
+            return output
+        blocks = []
+        filled = 0
+        while filled < n:
+            if self._cursor == len(self._cache):
+                self.refresh_cache()
+            n_taken = min(n - filled, len(self._cache) - self._cursor)
+            blocks.append(self._cache[self._cursor:self._cursor + n_taken])
+            self._cursor += n_taken
+            filled += n_taken
+        output = np.concatenate(blocks)
+        #print("-exit bartpy/bartpy/samplers/scalar.py ScalarSampler sample_batch")
+        return output
 
 
-class UniformScalarSampler():
+class NormalScalarSampler(ScalarSampler):
 
-    def __init__(self,
-                 cache_size: int=1000):
-        #print("enter bartpy/bartpy/samplers/scalar.py UniformScalarSampler __init__")
-        self._cache_size = cache_size
-        self._cache = []
-        #print("-exit bartpy/bartpy/samplers/scalar.py UniformScalarSampler __init__")
-
-    def sample(self):
-        #print("enter bartpy/bartpy/samplers/scalar.py UniformScalarSampler sample")
-        if len(self._cache) == 0:
-            self.refresh_cache()
-        output = self._cache.pop()
-        #print("-exit bartpy/bartpy/samplers/scalar.py UniformScalarSampler sample")
+    def draw(self, random, size: int) -> np.ndarray:
+        output = random.standard_normal(size=size)
         return output
 
-    def refresh_cache(self):
-        #print("enter bartpy/bartpy/samplers/scalar.py UniformScalarSampler refresh_cache")
-        self._cache = list(np.random.uniform(size=self._cache_size))
-        #print("-exit bartpy/bartpy/samplers/scalar.py UniformScalarSampler refresh_cache")
 
+class UniformScalarSampler(ScalarSampler):
+
+    def draw(self, random, size: int) -> np.ndarray:
+        output = random.random(size=size)
+        return output
 
-class DiscreteSampler():
+
+class DiscreteSampler(ScalarSampler):
 
     def __init__(self,
                  values: List[Any],
                  probas: List[float]=None,
-                 cache_size: int=1000):
+                 cache_size: int=1000,
+                 generator: Optional[np.random.Generator]=None):
         #print("enter bartpy/bartpy/samplers/scalar.py DiscreteSampler __init__")
+        super().__init__(cache_size, generator)
         self._values = values
         if probas is None:
             probas = [1.0 / len(values) for x in values]
         self._probas = probas
-        self._cache_size = cache_size
-        self._cache = []
+        # Held as an object array so that any kind of value, e.g. a function, can be picked out by index
+        self._value_array = np.empty(len(values), dtype=object)
+        self._value_array[:] = values
         #print("-exit bartpy/bartpy/samplers/scalar.py DiscreteSampler __init__")
 
-    def sample(self):
-        #print("enter bartpy/bartpy/samplers/scalar.py DiscreteSampler sample")
-        if len(self._cache) == 0:
-            self.refresh_cache()
-        output = self._cache.pop()
-        #print("-exit bartpy/bartpy/samplers/scalar.py DiscreteSampler sample")
+    def draw(self, random, size: int) -> np.ndarray:
+        output = self._value_array[random.choice(len(self._values), p=self._probas, size=size)]
         return output
-
-    def refresh_cache(self):
-        #print("enter bartpy/bartpy/samplers/scalar.py DiscreteSampler refresh_cache")
-        self._cache = list(np.random.choice(self._values, p=self._probas, size=self._cache_size))
-        #print("-exit bartpy/bartpy/samplers/scalar.py DiscreteSampler refresh_cache")
-        
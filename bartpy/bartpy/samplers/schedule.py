@@ -1,4 +1,4 @@
-from typing import Callable, Generator, Text, Tuple
+from typing import Callable, Generator, Optional, Text, Tuple
 
 import numpy as np
 import pandas as pd
@@ -35,6 +35,13 @@ class SampleSchedule:
         self.tree_sampler = tree_sampler
         #print("-exit bartpy/bartpy/samplers/schedule.py SampleSchedule __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        """
+        Draw every random number of the tree, leaf and sigma samplers from `generator`
+        """
+        for sampler in [self.tree_sampler, self.leaf_sampler, self.sigma_sampler]:
+            sampler.set_generator(generator)
+
     def steps(self, model: Model) -> Generator[Tuple[Text, Callable[[], float]], None, None]:
         """
         Create a generator of the steps that need to be called to complete a full Gibbs sample
@@ -53,8 +60,8 @@ class SampleSchedule:
 
         for tree in model.refreshed_trees():
             yield "Tree", lambda: self.tree_sampler.step(model, tree)
-            for leaf_node in tree.leaf_nodes:
-                yield "Node", lambda: self.leaf_sampler.step(model, leaf_node)
+            # All of the leaves of the tree are sampled together
+            yield "Node", lambda: self.leaf_sampler.step_tree(model, tree)
         yield "Node", lambda: self.sigma_sampler.step(model, model.sigma)
         #print("-exit bartpy/bartpy/samplers/schedule.py SampleSchedule steps")
 
@@ -84,6 +91,13 @@ class SampleScheduleCGM:
         self.tree_sampler = tree_sampler
         #print("-exit bartpy/bartpy/samplers/schedule.py SampleScheduleCGM __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        """
+        Draw every random number of the tree, leaf and sigma samplers from `generator`
+        """
+        for sampler in [self.tree_sampler, self.leaf_sampler, self.sigma_sampler]:
+            sampler.set_generator(generator)
+
     def steps(self, model: ModelCGM) -> Generator[Tuple[Text, Callable[[], float]], None, None]:
         """
         Create a generator of the steps that need to be called to complete a full Gibbs sample
@@ -102,14 +116,12 @@ class SampleScheduleCGM:
         # sample g
         for tree in model.refreshed_trees_g():
             yield "Tree", lambda: self.tree_sampler.step_cgm_g(model, tree)
-            for leaf_node in tree.leaf_nodes:
-                yield "Node", lambda: self.leaf_sampler.step_cgm_g(model, leaf_node)
+            yield "Node", lambda: self.leaf_sampler.step_tree_cgm_g(model, tree)
         
         # sample h
         for tree in model.refreshed_trees_h():
             yield "Tree", lambda: self.tree_sampler.step_cgm_h(model, tree)
-            for leaf_node in tree.leaf_nodes:
-                yield "Node", lambda: self.leaf_sampler.step_cgm_h(model, leaf_node)
+            yield "Node", lambda: self.leaf_sampler.step_tree_cgm_h(model, tree)
         # sample sigma
         yield "Node", lambda: self.sigma_sampler.step_cgm(model, model.sigma)
         #print("-exit bartpy/bartpy/samplers/schedule.py SampleScheduleCGM steps")
@@ -1,3 +1,5 @@
+from typing import Optional
+
 import numpy as np
 
 from bartpy.bartpy.model import Model, ModelCGM
@@ -7,6 +9,19 @@ from bartpy.bartpy.sigma import Sigma
 
 class SigmaSampler(Sampler):
 
+    def __init__(self, generator: Optional[np.random.Generator]=None):
+        #print("enter bartpy/bartpy/samplers/sigma.py SigmaSampler __init__")
+        self._generator = generator
+        #print("-exit bartpy/bartpy/samplers/sigma.py SigmaSampler __init__")
+
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._generator = generator
+
+    def _gamma(self, shape: float, scale: float) -> float:
+        random = np.random if self._generator is None else self._generator
+        output = random.gamma(shape, scale)
+        return output
+
     def step(self, model: Model, sigma: Sigma) -> float:
         #print("enter bartpy/bartpy/samplers/sigma.py SigmaSampler step")
         sample_value = self.sample(model, sigma)
@@ -39,24 +54,22 @@ class SigmaSampler(Sampler):
         #print("-exit bartpy/bartpy/samplers/sigma.py SigmaSampler step_cgm_h")
         return sample_value
 
-    @staticmethod
-    def sample(model: Model, sigma: Sigma) -> float:
+    def sample(self, model: Model, sigma: Sigma) -> float:
         #print("enter bartpy/bartpy/samplers/sigma.py SigmaSampler sample")
         posterior_alpha = sigma.alpha + (model.data.X.n_obsv / 2.)
         posterior_beta = sigma.beta + (0.5 * (np.sum(np.square(model.residuals()))))
-        draw = np.power(np.random.gamma(posterior_alpha, 1./posterior_beta), -0.5)
+        draw = np.power(self._gamma(posterior_alpha, 1./posterior_beta), -0.5)
         #print("-exit bartpy/bartpy/samplers/sigma.py SigmaSampler sample")
         return draw
 
-    @staticmethod
-    def sample_cgm(model: ModelCGM, sigma: Sigma) -> float:
+    def sample_cgm(self, model: ModelCGM, sigma: Sigma) -> float:
         #print("enter bartpy/bartpy/samplers/sigma.py SigmaSampler sample_cgm")
         paw2 = model.data.W.values*(model.data.p.values**2) + (1-model.data.W.values)*((1-model.data.p.values)**2)
         posterior_alpha = sigma.alpha + (model.data.X.n_obsv / 2.)
         posterior_beta = sigma.beta + (0.5 * (np.sum(paw2*np.square(model.residuals()))))
         #print("posterior_alpha=",posterior_alpha)
         #print("posterior_beta=",posterior_beta)
-        draw = np.power(np.random.gamma(posterior_alpha, 1./posterior_beta), -0.5)
+        draw = np.power(self._gamma(posterior_alpha, 1./posterior_beta), -0.5)
         #print("-exit bartpy/bartpy/samplers/sigma.py SigmaSampler sample_cgm")
         return draw
     
@@ -1,6 +1,8 @@
 from abc import abstractmethod, ABC
 from typing import Optional
 
+import numpy as np
+
 from bartpy.bartpy.model import Model, ModelCGM
 from bartpy.bartpy.mutation import TreeMutation
 from bartpy.bartpy.samplers.sampler import Sampler
@@ -54,6 +56,12 @@ class TreeMutationProposer(ABC):
         raise NotImplementedError()
         #print("-exit bartpy/bartpy/samplers/treemutation.py TreeMutationProposer propose")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        """
+        Make the proposer's own random draws from `generator`, see `Sampler.set_generator`
+        """
+        pass
+
 
 class TreeMutationLikihoodRatio(ABC):
     """
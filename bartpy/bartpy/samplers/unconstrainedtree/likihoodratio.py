@@ -1,33 +1,39 @@
-from typing import List
+from typing import Callable, List, Union
 
 import numpy as np
 
+from bartpy.bartpy.data import Data, SplitStatistics
 from bartpy.bartpy.model import Model, ModelCGM
 from bartpy.bartpy.mutation import TreeMutation, GrowMutation, PruneMutation
-from bartpy.bartpy.node import LeafNode, TreeNode
+from bartpy.bartpy.node import TreeNode, LeafNode, DecisionNode, subtree_nodes
 from bartpy.bartpy.samplers.treemutation import TreeMutationLikihoodRatio
 from bartpy.bartpy.sigma import Sigma
+from bartpy.bartpy.splitcondition import SplitCondition
 from bartpy.bartpy.tree import Tree
 
 
-def log_grow_ratio(combined_node: LeafNode, left_node: LeafNode, right_node: LeafNode, sigma: Sigma, sigma_mu: float):
+# Either the data of a built node or the statistics of a proposed one
+SplitData = Union[Data, SplitStatistics]
+
+
+def log_grow_ratio(combined: Data, left: SplitData, right: SplitData, sigma: Sigma, sigma_mu: float):
 
     var = np.power(sigma.current_value(), 2)
     var_mu = np.power(sigma_mu, 2)
-    n = combined_node.data.X.n_obsv
-    n_l = left_node.data.X.n_obsv
-    n_r = right_node.data.X.n_obsv
+    n = combined.n_obsv
+    n_l = left.n_obsv
+    n_r = right.n_obsv
 
-    first_term = (var * (var + n * sigma_mu)) / ((var + n_l * var_mu) * (var + n_r * var_mu))
+    first_term = (var * (var + n * var_mu)) / ((var + n_l * var_mu) * (var + n_r * var_mu))
     first_term = np.log(np.sqrt(first_term))
 
-    combined_y_sum = combined_node.data.y.summed_y()
-    left_y_sum = left_node.data.y.summed_y()
-    right_y_sum = right_node.data.y.summed_y()
+    combined_y_sum = combined.summed_y()
+    left_y_sum = left.summed_y()
+    right_y_sum = right.summed_y()
 
-    left_resp_contribution = np.square(left_y_sum) / (var + n_l * sigma_mu)
-    right_resp_contribution = np.square(right_y_sum) / (var + n_r * sigma_mu)
-    combined_resp_contribution = np.square(combined_y_sum) / (var + n * sigma_mu)
+    left_resp_contribution = np.square(left_y_sum) / (var + n_l * var_mu)
+    right_resp_contribution = np.square(right_y_sum) / (var + n_r * var_mu)
+    combined_resp_contribution = np.square(combined_y_sum) / (var + n * var_mu)
 
     resp_contribution = left_resp_contribution + right_resp_contribution - combined_resp_contribution
     output = first_term + ((var_mu / (2 * var)) * resp_contribution)
@@ -35,19 +41,19 @@ def log_grow_ratio(combined_node: LeafNode, left_node: LeafNode, right_node: Lea
     return output
 
 
-def log_grow_ratio_cgm_g(combined_node: LeafNode, left_node: LeafNode, right_node: LeafNode, sigma: Sigma, sigma_mu: float, mu_g: float):
+def log_grow_ratio_cgm_g(combined: Data, left: SplitData, right: SplitData, sigma: Sigma, sigma_mu: float, mu_g: float):
     
     var = np.power(sigma.current_value(), 2)
     var_mu = np.power(sigma_mu, 2)
 
-    W=combined_node.data.W.values
-    p=combined_node.data.p.values
-    
-    sigma_g_i_sqr = var * ( W/(p**2) + (1-W)/((1-p)**2) )
-    
-    sum_sigma_g_i_sqr_left = np.sum( (~left_node.data.mask).astype(int) * 1./sigma_g_i_sqr)
-    sum_sigma_g_i_sqr_right = np.sum( (~right_node.data.mask).astype(int) * 1./sigma_g_i_sqr)
-    sum_sigma_g_i_sqr_combined = np.sum( (~combined_node.data.mask).astype(int) * 1./sigma_g_i_sqr)
+    # Sufficient statistics cached on the data, sigma^2 is factored out of the precision weights
+    sum_sigma_g_i_sqr_left = left.summed_weights_g() / var
+    sum_sigma_g_i_sqr_right = right.summed_weights_g() / var
+    sum_sigma_g_i_sqr_combined = combined.summed_weights_g() / var
+
+    sum_y_over_var_left = left.summed_y_tilde_g() / var
+    sum_y_over_var_right = right.summed_y_tilde_g() / var
+    sum_y_over_var_combined = combined.summed_y_tilde_g() / var
     
     A_left = 1/var_mu + sum_sigma_g_i_sqr_left
     A_right = 1/var_mu + sum_sigma_g_i_sqr_right
@@ -61,24 +67,9 @@ def log_grow_ratio_cgm_g(combined_node: LeafNode, left_node: LeafNode, right_nod
          .5 * np.log(A_right))
     )
     
-    y_tilde_g_i = combined_node.data.y.values
-    y_tilde_g_i_over_var_i = y_tilde_g_i/sigma_g_i_sqr
-    
-    A_left_left_sum = (1/A_left)*(
-        np.sum(
-            (~left_node.data.mask).astype(int) * y_tilde_g_i_over_var_i 
-        ) + mu_g/var_mu
-    )**2
-    A_right_right_sum = (1/A_right)*(
-        np.sum(
-            (~right_node.data.mask).astype(int) * y_tilde_g_i_over_var_i 
-        ) + mu_g/var_mu
-    )**2
-    A_combined_combined_sum = (1/A_combined)*(
-        np.sum(
-            (~combined_node.data.mask).astype(int) * y_tilde_g_i_over_var_i
-        ) + mu_g/var_mu
-    )**2
+    A_left_left_sum = (1/A_left)*(sum_y_over_var_left + mu_g/var_mu)**2
+    A_right_right_sum = (1/A_right)*(sum_y_over_var_right + mu_g/var_mu)**2
+    A_combined_combined_sum = (1/A_combined)*(sum_y_over_var_combined + mu_g/var_mu)**2
     
     left_resp_contribution = 0.5 *  A_left_left_sum
     right_resp_contribution = 0.5 *  A_right_right_sum
@@ -91,20 +82,19 @@ def log_grow_ratio_cgm_g(combined_node: LeafNode, left_node: LeafNode, right_nod
     return output
 
 
-def log_grow_ratio_cgm_h(combined_node: LeafNode, left_node: LeafNode, right_node: LeafNode, sigma: Sigma, sigma_mu: float, mu_h: float):
+def log_grow_ratio_cgm_h(combined: Data, left: SplitData, right: SplitData, sigma: Sigma, sigma_mu: float, mu_h: float):
     
     var = np.power(sigma.current_value(), 2)
     var_mu = np.power(sigma_mu, 2)
 
-    W=combined_node.data.W.values
-    p=combined_node.data.p.values
-    
-    #sigma_h_i_sqr = var * ( W/(p**2) + (1-W)/((1-p)**2) )
-    sigma_h_i_sqr = var /((p**2) * (1-p)**2) 
-    
-    sum_sigma_h_i_sqr_left = np.sum( (~left_node.data.mask).astype(int) * 1./sigma_h_i_sqr)
-    sum_sigma_h_i_sqr_right = np.sum( (~right_node.data.mask).astype(int) * 1./sigma_h_i_sqr)
-    sum_sigma_h_i_sqr_combined = np.sum( (~combined_node.data.mask).astype(int) * 1./sigma_h_i_sqr)
+    # Sufficient statistics cached on the data, sigma^2 is factored out of the precision weights
+    sum_sigma_h_i_sqr_left = left.summed_weights_h() / var
+    sum_sigma_h_i_sqr_right = right.summed_weights_h() / var
+    sum_sigma_h_i_sqr_combined = combined.summed_weights_h() / var
+
+    sum_y_over_var_left = left.summed_y_tilde_h() / var
+    sum_y_over_var_right = right.summed_y_tilde_h() / var
+    sum_y_over_var_combined = combined.summed_y_tilde_h() / var
     
     A_left = 1/var_mu + sum_sigma_h_i_sqr_left
     A_right = 1/var_mu + sum_sigma_h_i_sqr_right
@@ -118,24 +108,9 @@ def log_grow_ratio_cgm_h(combined_node: LeafNode, left_node: LeafNode, right_nod
          .5 * np.log(A_right))
     )
     
-    y_tilde_h_i = combined_node.data.y.values
-    y_tilde_h_i_over_var_i = y_tilde_h_i/sigma_h_i_sqr
-    
-    A_left_left_sum = (1/A_left)*(
-        np.sum( 
-            (~left_node.data.mask).astype(int) * y_tilde_h_i_over_var_i
-        ) + mu_h/var_mu
-    )**2
-    A_right_right_sum = (1/A_right)*(
-        np.sum(
-            (~right_node.data.mask).astype(int) * y_tilde_h_i_over_var_i
-        ) + mu_h/var_mu
-    )**2
-    A_combined_combined_sum = (1/A_combined)*(
-        np.sum(
-            (~combined_node.data.mask).astype(int) * y_tilde_h_i_over_var_i
-        ) + mu_h/var_mu
-    )**2
+    A_left_left_sum = (1/A_left)*(sum_y_over_var_left + mu_h/var_mu)**2
+    A_right_right_sum = (1/A_right)*(sum_y_over_var_right + mu_h/var_mu)**2
+    A_combined_combined_sum = (1/A_combined)*(sum_y_over_var_combined + mu_h/var_mu)**2
     
     left_resp_contribution = 0.5 *  A_left_left_sum
     right_resp_contribution = 0.5 *  A_right_right_sum
@@ -147,6 +122,55 @@ def log_grow_ratio_cgm_h(combined_node: LeafNode, left_node: LeafNode, right_nod
     #print("H log grow ratio:", output)
     return output
 
+def log_leaf_likihood(data: Data, sigma: Sigma, sigma_mu: float) -> float:
+    """
+    The contribution of a single leaf to the log marginal likelihood of a tree, up to a constant per leaf
+    i.e. `log_grow_ratio` is the left plus the right child's contribution minus the parent's, plus a constant
+    """
+    var = np.power(sigma.current_value(), 2)
+    var_mu = np.power(sigma_mu, 2)
+    n = data.n_obsv
+    output = - 0.5 * np.log(var + n * var_mu) + (var_mu / (2 * var)) * np.square(data.summed_y()) / (var + n * var_mu)
+    return output
+
+
+def _log_leaf_likihood_cgm(summed_weights: float, summed_y_tilde: float, sigma: Sigma, sigma_mu: float, mu: float) -> float:
+    var = np.power(sigma.current_value(), 2)
+    var_mu = np.power(sigma_mu, 2)
+    A = 1/var_mu + summed_weights / var
+    output = .25 * np.log(A) + 0.5 * (1/A) * (summed_y_tilde / var + mu/var_mu)**2
+    return output
+
+
+def log_leaf_likihood_cgm_g(data: Data, sigma: Sigma, sigma_mu: float, mu_g: float) -> float:
+    """
+    The contribution of a single leaf to the log marginal likelihood of a g tree, consistent with `log_grow_ratio_cgm_g`
+    """
+    output = _log_leaf_likihood_cgm(data.summed_weights_g(), data.summed_y_tilde_g(), sigma, sigma_mu, mu_g)
+    return output
+
+
+def log_leaf_likihood_cgm_h(data: Data, sigma: Sigma, sigma_mu: float, mu_h: float) -> float:
+    """
+    The contribution of a single leaf to the log marginal likelihood of an h tree, consistent with `log_grow_ratio_cgm_h`
+    """
+    output = _log_leaf_likihood_cgm(data.summed_weights_h(), data.summed_y_tilde_h(), sigma, sigma_mu, mu_h)
+    return output
+
+
+def log_subtree_likihood_ratio(mutation: TreeMutation, leaf_likihood: Callable[[Data], float]) -> float:
+    """
+    Log likelihood ratio of a mutation that rebuilds a subtree without changing its shape, i.e. a change or a swap
+    The number of leaves doesn't change, so the constant per leaf cancels out
+    """
+    if mutation.updated_node is None:
+        return - np.inf
+    new = sum(leaf_likihood(x.data) for x in subtree_nodes(mutation.updated_node) if type(x) == LeafNode)
+    old = sum(leaf_likihood(x.data) for x in subtree_nodes(mutation.existing_node) if type(x) == LeafNode)
+    output = new - old
+    return output
+
+
 class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
 
     def __init__(self,
@@ -166,6 +190,12 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
             mutation: GrowMutation = mutation
             output = self.log_grow_transition_ratio(tree, mutation)
             return output
+        if mutation.kind == "change":
+            output = self.log_change_transition_ratio(mutation)
+            return output
+        if mutation.kind == "swap":
+            # The same parent child pair is equally likely to be picked in the swapped tree
+            return 0.
         else:
             raise NotImplementedError("kind {} not supported".format(mutation.kind))
 
@@ -179,6 +209,9 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
             mutation: PruneMutation = mutation
             output = self.log_tree_ratio_prune(model, mutation)
             return output
+        if mutation.kind in ("change", "swap"):
+            output = self.log_tree_ratio_rebuild(mutation)
+            return output
 
     def log_tree_ratio_cgm_g(self, model: ModelCGM, tree: Tree, mutation: TreeMutation):
         #print("enter bartpy/bartpy/samplers/unconstrainedtree/likihoodratio.py UniformTreeMutationLikihoodRatio  log_tree_ratio_cgm")
@@ -191,6 +224,9 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
             mutation: PruneMutation = mutation
             output = self.log_tree_ratio_prune_cgm_g(model, mutation)
             return output
+        if mutation.kind in ("change", "swap"):
+            output = self.log_tree_ratio_rebuild(mutation)
+            return output
         #print("exit bartpy/bartpy/samplers/unconstrainedtree/likihoodratio.py UniformTreeMutationLikihoodRatio  log_tree_ratio_cgm")
         
     def log_tree_ratio_cgm_h(self, model: ModelCGM, tree: Tree, mutation: TreeMutation):
@@ -204,6 +240,9 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
             mutation: PruneMutation = mutation
             output = self.log_tree_ratio_prune_cgm_h(model, mutation)
             return output
+        if mutation.kind in ("change", "swap"):
+            output = self.log_tree_ratio_rebuild(mutation)
+            return output
         #print("exit bartpy/bartpy/samplers/unconstrainedtree/likihoodratio.py UniformTreeMutationLikihoodRatio  log_tree_ratio_cgm")
 
     def log_likihood_ratio(self, model: Model, tree: Tree, proposal: TreeMutation):
@@ -216,8 +255,11 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
             proposal: PruneMutation = proposal
             output = self.log_likihood_ratio_prune(model, proposal)
             return output
+        if proposal.kind in ("change", "swap"):
+            output = log_subtree_likihood_ratio(proposal, lambda data: log_leaf_likihood(data, model.sigma, model.sigma_m))
+            return output
         else:
-            raise NotImplementedError("Only prune and grow mutations supported")
+            raise NotImplementedError("Only prune, grow, change and swap mutations supported")
         
     def log_likihood_ratio_cgm_g(self, model: ModelCGM, tree: Tree, proposal: TreeMutation):
 
@@ -229,8 +271,11 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
             proposal: PruneMutation = proposal
             output = self.log_likihood_ratio_prune_cgm_g(model, proposal) ###########this was an h!!!!!
             return output
+        if proposal.kind in ("change", "swap"):
+            output = log_subtree_likihood_ratio(proposal, lambda data: log_leaf_likihood_cgm_g(data, model.sigma, model.sigma_g, model.mu_g))
+            return output
         else:
-            raise NotImplementedError("Only prune and grow mutations supported")
+            raise NotImplementedError("Only prune, grow, change and swap mutations supported")
 
     def log_likihood_ratio_cgm_h(self, model: ModelCGM, tree: Tree, proposal: TreeMutation):
 
@@ -242,16 +287,20 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
             proposal: PruneMutation = proposal
             output = self.log_likihood_ratio_prune_cgm_h(model, proposal)
             return output
+        if proposal.kind in ("change", "swap"):
+            output = log_subtree_likihood_ratio(proposal, lambda data: log_leaf_likihood_cgm_h(data, model.sigma, model.sigma_h, model.mu_h))
+            return output
         else:
-            raise NotImplementedError("Only prune and grow mutations supported")
+            raise NotImplementedError("Only prune, grow, change and swap mutations supported")
 
     @staticmethod
     def log_likihood_ratio_grow(model: Model, proposal: TreeMutation):
 
+        left, right = proposal.child_statistics()
         output = log_grow_ratio(
-            proposal.existing_node, 
-            proposal.updated_node.left_child, 
-            proposal.updated_node.right_child, 
+            proposal.existing_node.data,
+            left,
+            right, 
             model.sigma, model.sigma_m)
         
         return output
@@ -259,10 +308,11 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     @staticmethod
     def log_likihood_ratio_grow_cgm_g(model: ModelCGM, proposal: TreeMutation):
 
+        left, right = proposal.child_statistics()
         output = log_grow_ratio_cgm_g(
-            proposal.existing_node, 
-            proposal.updated_node.left_child, 
-            proposal.updated_node.right_child,
+            proposal.existing_node.data,
+            left,
+            right,
             model.sigma, model.sigma_g, model.mu_g)
 
         return output
@@ -270,10 +320,11 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     @staticmethod
     def log_likihood_ratio_grow_cgm_h(model: ModelCGM, proposal: TreeMutation):
 
+        left, right = proposal.child_statistics()
         output = log_grow_ratio_cgm_h(
-            proposal.existing_node, 
-            proposal.updated_node.left_child, 
-            proposal.updated_node.right_child, 
+            proposal.existing_node.data,
+            left,
+            right, 
             model.sigma, model.sigma_h, model.mu_h)
 
         return output
@@ -282,9 +333,9 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     def log_likihood_ratio_prune(model: Model, proposal: TreeMutation):
 
         output = - log_grow_ratio(
-            proposal.updated_node, 
-            proposal.existing_node.left_child, 
-            proposal.existing_node.right_child, 
+            proposal.updated_node.data,
+            proposal.existing_node.left_child.data,
+            proposal.existing_node.right_child.data, 
             model.sigma, model.sigma_m)
 
         return output
@@ -293,9 +344,9 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     def log_likihood_ratio_prune_cgm_g(model: ModelCGM, proposal: TreeMutation):
 
         output = - log_grow_ratio_cgm_g(
-            proposal.updated_node, 
-            proposal.existing_node.left_child, 
-            proposal.existing_node.right_child, 
+            proposal.updated_node.data,
+            proposal.existing_node.left_child.data,
+            proposal.existing_node.right_child.data, 
             model.sigma, model.sigma_g, model.mu_g)
 
         return output
@@ -304,9 +355,9 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     def log_likihood_ratio_prune_cgm_h(model: ModelCGM, proposal: TreeMutation):
 
         output = - log_grow_ratio_cgm_h(
-            proposal.updated_node, 
-            proposal.existing_node.left_child, 
-            proposal.existing_node.right_child, 
+            proposal.updated_node.data,
+            proposal.existing_node.left_child.data,
+            proposal.existing_node.right_child.data, 
             model.sigma, model.sigma_h, model.mu_h)
 
         return output
@@ -340,14 +391,39 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
 
         return output
 
+    @staticmethod
+    def log_change_transition_ratio(mutation: TreeMutation):
+        """
+        The new rule is drawn from the same distribution as the reverse move would draw the old one from,
+        and the node to change is picked uniformly from the decision nodes of either tree
+        """
+        if mutation.updated_node is None:
+            return 0.
+        data = mutation.existing_node.data
+        prob_old_rule = log_probability_split_condition(data, mutation.existing_node.most_recent_split_condition())
+        prob_new_rule = log_probability_split_condition(data, mutation.updated_node.most_recent_split_condition())
+        output = prob_old_rule - prob_new_rule
+        return output
+
+    @staticmethod
+    def log_tree_ratio_rebuild(mutation: TreeMutation):
+        """
+        Tree prior ratio of a change or swap
+        The shape of the tree is unchanged, so only the probabilities of the rules within the rebuilt subtree differ
+        """
+        if mutation.updated_node is None:
+            return 0.
+        output = log_probability_subtree_rules(mutation.updated_node) - log_probability_subtree_rules(mutation.existing_node)
+        return output
+
     @staticmethod
     def log_tree_ratio_grow(model: Model, tree: Tree, proposal: GrowMutation):
 
-        denominator = log_probability_node_not_split(model, proposal.existing_node)
+        denominator = log_probability_node_not_split(model, proposal.existing_node.depth)
 
-        prob_left_not_split = log_probability_node_not_split(model, proposal.updated_node.left_child)
-        prob_right_not_split = log_probability_node_not_split(model, proposal.updated_node.right_child)
-        prob_updated_node_split = log_probability_node_split(model, proposal.updated_node)
+        prob_left_not_split = log_probability_node_not_split(model, proposal.child_depth)
+        prob_right_not_split = log_probability_node_not_split(model, proposal.child_depth)
+        prob_updated_node_split = log_probability_node_split(model, proposal.existing_node.depth)
         prob_chosen_split = log_probability_split_within_tree(tree, proposal)
         numerator = prob_left_not_split + prob_right_not_split + prob_updated_node_split + prob_chosen_split
         output = numerator - denominator
@@ -357,11 +433,11 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     @staticmethod
     def log_tree_ratio_grow_cgm_g(model: ModelCGM, tree: Tree, proposal: GrowMutation):
 
-        denominator = log_probability_node_not_split_g(model, proposal.existing_node)
+        denominator = log_probability_node_not_split_g(model, proposal.existing_node.depth)
 
-        prob_left_not_split = log_probability_node_not_split_g(model, proposal.updated_node.left_child)
-        prob_right_not_split = log_probability_node_not_split_g(model, proposal.updated_node.right_child)
-        prob_updated_node_split = log_probability_node_split_g(model, proposal.updated_node)
+        prob_left_not_split = log_probability_node_not_split_g(model, proposal.child_depth)
+        prob_right_not_split = log_probability_node_not_split_g(model, proposal.child_depth)
+        prob_updated_node_split = log_probability_node_split_g(model, proposal.existing_node.depth)
         prob_chosen_split = log_probability_split_within_tree(tree, proposal)
         
         numerator = prob_left_not_split + prob_right_not_split + prob_updated_node_split + prob_chosen_split
@@ -372,11 +448,11 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     @staticmethod
     def log_tree_ratio_grow_cgm_h(model: ModelCGM, tree: Tree, proposal: GrowMutation):
 
-        denominator = log_probability_node_not_split_h(model, proposal.existing_node)
+        denominator = log_probability_node_not_split_h(model, proposal.existing_node.depth)
 
-        prob_left_not_split = log_probability_node_not_split_h(model, proposal.updated_node.left_child)
-        prob_right_not_split = log_probability_node_not_split_h(model, proposal.updated_node.right_child)
-        prob_updated_node_split = log_probability_node_split_h(model, proposal.updated_node)
+        prob_left_not_split = log_probability_node_not_split_h(model, proposal.child_depth)
+        prob_right_not_split = log_probability_node_not_split_h(model, proposal.child_depth)
+        prob_updated_node_split = log_probability_node_split_h(model, proposal.existing_node.depth)
         prob_chosen_split = log_probability_split_within_tree(tree, proposal)
         
         numerator = prob_left_not_split + prob_right_not_split + prob_updated_node_split + prob_chosen_split
@@ -387,16 +463,16 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     @staticmethod
     def log_tree_ratio_prune(model: Model, proposal: PruneMutation):
 
-        numerator = log_probability_node_not_split(model, proposal.updated_node)
+        numerator = log_probability_node_not_split(model, proposal.updated_node.depth)
 
         prob_left_not_split = log_probability_node_not_split(
-            model, proposal.existing_node.left_child
+            model, proposal.existing_node.left_child.depth
         )
         prob_right_not_split = log_probability_node_not_split(
-            model, proposal.existing_node.left_child
+            model, proposal.existing_node.left_child.depth
         )
         prob_updated_node_split = log_probability_node_split(
-            model, proposal.existing_node
+            model, proposal.existing_node.depth
         )
         prob_chosen_split = log_probability_split_within_node(
             GrowMutation(proposal.updated_node, 
@@ -416,16 +492,16 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     @staticmethod
     def log_tree_ratio_prune_cgm_g(model: ModelCGM, proposal: PruneMutation):
 
-        numerator = log_probability_node_not_split_g(model, proposal.updated_node)
+        numerator = log_probability_node_not_split_g(model, proposal.updated_node.depth)
 
         prob_left_not_split = log_probability_node_not_split_g(
-            model, proposal.existing_node.left_child
+            model, proposal.existing_node.left_child.depth
         )
         prob_right_not_split = log_probability_node_not_split_g(
-            model, proposal.existing_node.left_child
+            model, proposal.existing_node.left_child.depth
         )
         prob_updated_node_split = log_probability_node_split_g(
-            model, proposal.existing_node
+            model, proposal.existing_node.depth
         )
         prob_chosen_split = log_probability_split_within_node(
             GrowMutation(proposal.updated_node, 
@@ -445,16 +521,16 @@ class UniformTreeMutationLikihoodRatio(TreeMutationLikihoodRatio):
     @staticmethod
     def log_tree_ratio_prune_cgm_h(model: ModelCGM, proposal: PruneMutation):
 
-        numerator = log_probability_node_not_split_h(model, proposal.updated_node)
+        numerator = log_probability_node_not_split_h(model, proposal.updated_node.depth)
 
         prob_left_not_split = log_probability_node_not_split_h(
-            model, proposal.existing_node.left_child
+            model, proposal.existing_node.left_child.depth
         )
         prob_right_not_split = log_probability_node_not_split_h(
-            model, proposal.existing_node.left_child
+            model, proposal.existing_node.left_child.depth
         )
         prob_updated_node_split = log_probability_node_split_h(
-            model, proposal.existing_node
+            model, proposal.existing_node.depth
         )
         prob_chosen_split = log_probability_split_within_node(
             GrowMutation(proposal.updated_node, 
@@ -477,7 +553,7 @@ def n_prunable_decision_nodes(tree: Tree) -> int:
     The number of prunable decision nodes
     i.e. how many decision nodes have two leaf children
     """
-    output = len(tree.prunable_decision_nodes)
+    output = tree.n_prunable_decision_nodes
     return output
 
 
@@ -486,7 +562,7 @@ def n_splittable_leaf_nodes(tree: Tree) -> int:
     The number of splittable leaf nodes
     i.e. how many leaf nodes have more than one distinct values in their covariate matrix
     """
-    output = len(tree.splittable_leaf_nodes)
+    output = tree.n_splittable_leaf_nodes
     return output
 
 
@@ -513,52 +589,72 @@ def log_probability_split_within_node(mutation: GrowMutation) -> float:
     log(P(splitting_value | splitting_variable, node, grow) * P(splitting_variable | node, grow))
     """
 
-    prob_splitting_variable_selected    = - np.log(mutation.existing_node.data.X.n_splittable_variables)
-    splitting_variable                  = mutation.updated_node.most_recent_split_condition().splitting_variable
-    splitting_value                     = mutation.updated_node.most_recent_split_condition().splitting_value
-    prob_value_selected_within_variable = np.log(
-        mutation.existing_node.data.X.proportion_of_value_in_variable(
-            splitting_variable, splitting_value
-        )
+    output = log_probability_split_condition(mutation.existing_node.data, mutation.split_condition)
+
+    return output
+
+
+def log_probability_split_condition(data: Data, condition: SplitCondition) -> float:
+    """
+    The log probability of drawing the splitting rule of the condition for a node with the given data
+
+    i.e.
+    log(P(splitting_value | splitting_variable, node) * P(splitting_variable | node))
+    """
+
+    prob_splitting_variable_selected    = - np.log(data.X.n_splittable_variables)
+    prob_value_selected_within_variable = data.X.proportion_of_value_in_variable(
+        condition.splitting_variable, condition.splitting_value
     )
-    output = prob_splitting_variable_selected + prob_value_selected_within_variable
+    if prob_value_selected_within_variable == 0:
+        return - np.inf
+    output = prob_splitting_variable_selected + np.log(prob_value_selected_within_variable)
+
+    return output
+
 
+def log_probability_subtree_rules(node: TreeNode) -> float:
+    """
+    The summed log probability of the splitting rules of all decision nodes below and including the node
+    """
+    output = sum(log_probability_split_condition(x.data, x.most_recent_split_condition())
+                 for x in subtree_nodes(node) if type(x) == DecisionNode)
     return output
 
 
-def log_probability_node_split(model: Model, node: TreeNode):
-    #print("split node depth:", node.depth)
-    output = np.log(model.alpha * np.power(1 + node.depth, -model.beta))
+def log_probability_node_split(model: Model, depth: int):
+    #print("split node depth:", depth)
+    output = np.log(model.alpha * np.power(1 + depth, -model.beta))
     #print("ln(P(node depth))=", output)
     return output
 
-def log_probability_node_split_g(model: Model, node: TreeNode):
-    #print("split node depth:", node.depth)
-    output = np.log(model.alpha_g * np.power(1 + node.depth, -model.beta_g))
+def log_probability_node_split_g(model: Model, depth: int):
+    #print("split node depth:", depth)
+    output = np.log(model.alpha_g * np.power(1 + depth, -model.beta_g))
     #print("ln(P(node depth))=", output)
     return output
 
-def log_probability_node_split_h(model: Model, node: TreeNode):
-    #print("split node depth:", node.depth)
-    output = np.log(model.alpha_h * np.power(1 + node.depth, -model.beta_h))
+def log_probability_node_split_h(model: Model, depth: int):
+    #print("split node depth:", depth)
+    output = np.log(model.alpha_h * np.power(1 + depth, -model.beta_h))
     #print("ln(P(node depth))=", output)
     return output
 
 
-def log_probability_node_not_split(model: Model, node: TreeNode):
-    #print("split node depth:", node.depth)
-    output = np.log(1. - model.alpha * np.power(1 + node.depth, -model.beta))
+def log_probability_node_not_split(model: Model, depth: int):
+    #print("split node depth:", depth)
+    output = np.log(1. - model.alpha * np.power(1 + depth, -model.beta))
     #print("ln(1-P(node depth))=", output)
     return output
 
-def log_probability_node_not_split_g(model: Model, node: TreeNode):
-    #print("split node depth:", node.depth)
-    output = np.log(1. - model.alpha_g * np.power(1 + node.depth, -model.beta_g))
+def log_probability_node_not_split_g(model: Model, depth: int):
+    #print("split node depth:", depth)
+    output = np.log(1. - model.alpha_g * np.power(1 + depth, -model.beta_g))
     #print("ln(1-P(node depth))=", output)
     return output
 
-def log_probability_node_not_split_h(model: Model, node: TreeNode):
-    #print("split node depth:", node.depth)
-    output = np.log(1. - model.alpha_h * np.power(1 + node.depth, -model.beta_h))
+def log_probability_node_not_split_h(model: Model, depth: int):
+    #print("split node depth:", depth)
+    output = np.log(1. - model.alpha_h * np.power(1 + depth, -model.beta_h))
     #print("ln(1-P(node depth))=", output)
     return output
@@ -1,58 +1,98 @@
 from operator import le, gt
-from typing import Callable, List, Mapping, Optional, Tuple
+from typing import Any, Callable, List, Mapping, Optional, Tuple
 
 import numpy as np
 
 from bartpy.bartpy.errors import NoSplittableVariableException, NoPrunableNodeException
-from bartpy.bartpy.mutation import TreeMutation, GrowMutation, PruneMutation
-from bartpy.bartpy.node import LeafNode, DecisionNode, split_node
+from bartpy.bartpy.mutation import TreeMutation, GrowMutation, PruneMutation, ChangeMutation, SwapMutation
+from bartpy.bartpy.node import LeafNode, DecisionNode, split_node, rebuild_node
 from bartpy.bartpy.samplers.scalar import DiscreteSampler
 from bartpy.bartpy.samplers.treemutation import TreeMutationProposer
 from bartpy.bartpy.split import SplitCondition
 from bartpy.bartpy.tree import Tree
 
 
-def uniformly_sample_grow_mutation(tree: Tree) -> TreeMutation:
+def uniformly_sample_grow_mutation(tree: Tree, random: Any=np.random) -> TreeMutation:
     #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py uniformly_sample_grow_mutation")
-    node = random_splittable_leaf_node(tree)
-    updated_node = sample_split_node(node)
-    output = GrowMutation(node, updated_node)
+    node = random_splittable_leaf_node(tree, random)
+    conditions = sample_split_condition(node, random)
+    if conditions is None:
+        raise NoSplittableVariableException()
+    # The children are only built if the proposal is accepted
+    output = GrowMutation(node, split_conditions=conditions)
     #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py uniformly_sample_grow_mutation")
     return output
 
 
-def uniformly_sample_prune_mutation(tree: Tree) -> TreeMutation:
+def uniformly_sample_prune_mutation(tree: Tree, random: Any=np.random) -> TreeMutation:
     #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py uniformly_sample_prune_mutation")
-    node = random_prunable_decision_node(tree)
+    node = random_prunable_decision_node(tree, random)
     updated_node = LeafNode(node.split, depth=node.depth)
     output = PruneMutation(node, updated_node)
     #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py uniformly_sample_prune_mutation")
     return output
 
 
+def uniformly_sample_change_mutation(tree: Tree, random: Any=np.random) -> TreeMutation:
+    #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py uniformly_sample_change_mutation")
+    node = random_decision_node(tree, random=random)
+    conditions = sample_split_condition(node, random)
+    if conditions is None:
+        raise NoSplittableVariableException()
+    output = ChangeMutation(node, rebuild_node(node, node.split, {node: conditions}))
+    #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py uniformly_sample_change_mutation")
+    return output
+
+
+def uniformly_sample_swap_mutation(tree: Tree, random: Any=np.random) -> TreeMutation:
+    """
+    Exchange the rules of a random decision node and its parent
+    If the node's sibling is split on the same rule as the node, it takes the parent's rule as well
+    """
+    #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py uniformly_sample_swap_mutation")
+    child = random_decision_node(tree, include_root=False, random=random)
+    parent = tree.parent(child)
+    sibling = parent.right_child if parent.left_child is child else parent.left_child
+    parent_conditions, child_conditions = node_split_conditions(parent), node_split_conditions(child)
+    swapped = {parent: child_conditions, child: parent_conditions}
+    if type(sibling) == DecisionNode and node_split_conditions(sibling) == child_conditions:
+        swapped[sibling] = parent_conditions
+    output = SwapMutation(parent, rebuild_node(parent, parent.split, swapped))
+    #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py uniformly_sample_swap_mutation")
+    return output
+
+
 class UniformMutationProposer(TreeMutationProposer):
 
     def __init__(self,
                  prob_method: List[float]=None,
-                 prob_method_lookup: Mapping[Callable[[Tree], TreeMutation], float]=None):
+                 prob_method_lookup: Mapping[Callable[[Tree, Any], TreeMutation], float]=None):
         #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py UniformMutationProposer __init__")
         if prob_method_lookup is not None:
             self.prob_method_lookup = prob_method_lookup
         else:
             if prob_method is None:
                 prob_method = [0.5, 0.5]
-            self.prob_method_lookup = {x[0]: x[1] for x in zip([uniformly_sample_grow_mutation, uniformly_sample_prune_mutation], prob_method)}
+            methods = [uniformly_sample_grow_mutation, uniformly_sample_prune_mutation,
+                       uniformly_sample_change_mutation, uniformly_sample_swap_mutation]
+            self.prob_method_lookup = {x[0]: x[1] for x in zip(methods, prob_method) if x[1] > 0}
         self.methods = list(self.prob_method_lookup.keys())
         self.method_sampler = DiscreteSampler(list(self.prob_method_lookup.keys()),
                                               list(self.prob_method_lookup.values()),
                                               cache_size=1000)
+        self._generator = None
         #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py UniformMutationProposer __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._generator = generator
+        self.method_sampler.set_generator(generator)
+
     def propose(self, tree: Tree) -> TreeMutation:
         #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py UniformMutationProposer propose")
         method = self.method_sampler.sample()
+        random = np.random if self._generator is None else self._generator
         try:
-            output = method(tree)
+            output = method(tree, random)
             #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py UniformMutationProposer propose")
             return output
         except NoSplittableVariableException:
@@ -65,7 +105,7 @@ class UniformMutationProposer(TreeMutationProposer):
             return output
 
 
-def random_splittable_leaf_node(tree: Tree) -> LeafNode:
+def random_splittable_leaf_node(tree: Tree, random: Any=np.random) -> LeafNode:
     """
     Returns a random leaf node that can be split in a non-degenerate way
     i.e. a random draw from the set of leaf nodes that have at least two distinct values in their covariate matrix
@@ -76,12 +116,12 @@ def random_splittable_leaf_node(tree: Tree) -> LeafNode:
         #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py random_splittable_leaf_node")
         raise NoSplittableVariableException()
     else:
-        output = np.random.choice(splittable_nodes)
+        output = random.choice(splittable_nodes)
         #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py random_splittable_leaf_node")
         return output
 
 
-def random_prunable_decision_node(tree: Tree) -> DecisionNode:
+def random_prunable_decision_node(tree: Tree, random: Any=np.random) -> DecisionNode:
     """
     Returns a random decision node that can be pruned
     i.e. a random draw from the set of decision nodes that have two leaf node children
@@ -90,12 +130,37 @@ def random_prunable_decision_node(tree: Tree) -> DecisionNode:
     leaf_parents = tree.prunable_decision_nodes
     if len(leaf_parents) == 0:
         raise NoPrunableNodeException()
-    output = np.random.choice(leaf_parents)
+    output = random.choice(leaf_parents)
     #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py random_prunable_decision_node")
     return output
 
 
-def sample_split_condition(node: LeafNode) -> Optional[Tuple[SplitCondition, SplitCondition]]:
+def random_decision_node(tree: Tree, include_root: bool=True, random: Any=np.random) -> DecisionNode:
+    """
+    Returns a random decision node, optionally excluding the root
+    """
+    #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py random_decision_node")
+    decision_nodes = tree.decision_nodes
+    if not include_root:
+        decision_nodes = [x for x in decision_nodes if x is not tree.root]
+    if len(decision_nodes) == 0:
+        raise NoPrunableNodeException()
+    output = random.choice(decision_nodes)
+    #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py random_decision_node")
+    return output
+
+
+def node_split_conditions(node: DecisionNode) -> Tuple[SplitCondition, SplitCondition]:
+    """
+    The conditions leading to the left and right children of a decision node
+    """
+    #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py node_split_conditions")
+    output = node.left_child.split.most_recent_split_condition(), node.right_child.split.most_recent_split_condition()
+    #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py node_split_conditions")
+    return output
+
+
+def sample_split_condition(node: LeafNode, random: Any=np.random) -> Optional[Tuple[SplitCondition, SplitCondition]]:
     """
     Randomly sample a splitting rule for a particular leaf node
     Works based on two random draws
@@ -106,8 +171,8 @@ def sample_split_condition(node: LeafNode) -> Optional[Tuple[SplitCondition, Spl
     Returns None if there isn't a possible non-degenerate split
     """
     #print("enter bartpy/bartpy/samplers/unconstrainedtree/proposer.py sample_split_condition")
-    split_variable = np.random.choice(list(node.split.data.X.splittable_variables()))
-    split_value = node.data.X.random_splittable_value(split_variable)
+    split_variable = random.choice(list(node.split.data.X.splittable_variables()))
+    split_value = node.data.X.random_splittable_value(split_variable, random)
     if split_value is None:
         #print("-exit bartpy/bartpy/samplers/unconstrainedtree/proposer.py sample_split_condition")
         return None
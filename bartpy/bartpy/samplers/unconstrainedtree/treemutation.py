@@ -1,5 +1,7 @@
 from typing import Optional
 
+import numpy as np
+
 from bartpy.bartpy.model import Model, ModelCGM
 from bartpy.bartpy.mutation import TreeMutation
 from bartpy.bartpy.samplers.sampler import Sampler
@@ -30,13 +32,19 @@ class UnconstrainedTreeMutationSampler(Sampler):
     def __init__(self,
                  proposer: TreeMutationProposer,
                  likihood_ratio: TreeMutationLikihoodRatio,
-                 scalar_sampler=UniformScalarSampler()):
+                 scalar_sampler: UniformScalarSampler=None):
         #print("enter /bartpy/bartpy/samplers/unconstrainedtree/treemutation.py UnconstrainedTreeMutationSampler __init__")
+        if scalar_sampler is None:
+            scalar_sampler = UniformScalarSampler()
         self.proposer = proposer
         self.likihood_ratio = likihood_ratio
         self._scalar_sampler = scalar_sampler
         #print("-exit /bartpy/bartpy/samplers/unconstrainedtree/treemutation.py UnconstrainedTreeMutationSampler __init__")
 
+    def set_generator(self, generator: Optional[np.random.Generator]) -> None:
+        self._scalar_sampler.set_generator(generator)
+        self.proposer.set_generator(generator)
+
     def sample(self, model: Model, tree: Tree) -> Optional[TreeMutation]:
         #print("enter /bartpy/bartpy/samplers/unconstrainedtree/treemutation.py UnconstrainedTreeMutationSampler sample")
         proposal = self.proposer.propose(tree)
@@ -108,10 +116,20 @@ class UnconstrainedTreeMutationSampler(Sampler):
 
 
 def get_tree_sampler(p_grow: float,
-                     p_prune: float) -> Sampler:
+                     p_prune: float,
+                     p_change: float=0.,
+                     p_swap: float=0.) -> Sampler:
+    """
+    Metropolis Hastings sampler over grow and prune moves, plus optionally
+      - change: re-draw the rule of a random decision node
+      - swap: exchange the rules of a random decision node and its parent
+
+    Change and swap leave the shape of the tree alone, so they help deep trees mix.
+    The probabilities of the four moves should sum to one
+    """
     #print("enter /bartpy/bartpy/samplers/unconstrainedtree/treemutation.py UnconstrainedTreeMutationSampler get_tree_sampler")
-    proposer = UniformMutationProposer([p_grow, p_prune])
-    likihood = UniformTreeMutationLikihoodRatio([p_grow, p_prune])
+    proposer = UniformMutationProposer([p_grow, p_prune, p_change, p_swap])
+    likihood = UniformTreeMutationLikihoodRatio([p_grow, p_prune, p_change, p_swap])
     output = UnconstrainedTreeMutationSampler(proposer, likihood)
     #print("-exit /bartpy/bartpy/samplers/unconstrainedtree/treemutation.py UnconstrainedTreeMutationSampler get_tree_sampler")
     return output
@@ -1,4 +1,4 @@
-from copy import deepcopy
+from copy import copy, deepcopy
 from typing import List, Callable, Mapping, Union, Optional
 
 import numpy as np
@@ -10,10 +10,13 @@ from scipy import optimize
 from joblib import Parallel, delayed
 from sklearn.base import RegressorMixin, BaseEstimator
 
-from bartpy.bartpy.data import Data
+from bartpy.bartpy.compiledforest import CompiledForest, compile_forest
+from bartpy.bartpy.data import Data, bin_covariate_matrix, ensure_numpy_array, quantile_cutpoints
 from bartpy.bartpy.initializers.initializer import Initializer
 from bartpy.bartpy.initializers.sklearntreeinitializer import SklearnTreeInitializer
 from bartpy.bartpy.model import Model, ModelCGM
+from bartpy.bartpy.samplers.compiled.backend import resolve_backend
+from bartpy.bartpy.samplers.compiled.modelsampler import CompiledModelSamplerCGM
 from bartpy.bartpy.samplers.leafnode import LeafNodeSampler
 from bartpy.bartpy.samplers.modelsampler import ModelSampler, ModelSamplerCGM, Chain
 from bartpy.bartpy.samplers.schedule import SampleSchedule, SampleScheduleCGM
@@ -22,6 +25,15 @@ from bartpy.bartpy.samplers.treemutation import TreeMutationSampler
 from bartpy.bartpy.samplers.unconstrainedtree.treemutation import get_tree_sampler
 from bartpy.bartpy.sigma import Sigma
 
+# Training arrays bigger than this are handed to parallel chains as read only memory maps rather than pickled copies
+SHARED_MEMORY_MIN_BYTES = 1024
+
+# State set by fitting, none of which a chain needs to start sampling
+FITTED_ATTRIBUTES = ["data", "model", "sigma", "extract", "combined_chains",
+                     "_model_samples", "_model_samples_cgm", "_prediction_samples",
+                     "_prediction_samples_g", "_prediction_samples_h", "_acceptance_trace", "_compiled_forests", "cutpoints"]
+
+
 def get_gamma_seeds(s_hat, a, q):
     """
     Function to get initial guesses for root.
@@ -35,11 +47,28 @@ def get_gamma_seeds(s_hat, a, q):
         x = gamma.cdf(x=(1/s_hat)**2, a=a, loc=0, scale=1/b_top) - (1-q)  
     return b_bottom, b_top
 
-def run_chain(model: 'SklearnModel', X: np.ndarray, y: np.ndarray):
+def seed_chain(model: 'SklearnModel', seed: Optional[np.random.SeedSequence]) -> None:
+    """
+    Give a chain its own sampler and initializer, drawing from a random stream spawned from `seed`
+    Both are copied first, so neither the estimator's own nor the global `np.random` state is touched
+    If `seed` is None the copies draw from the global `np.random` state
+    """
+    model.sampler = deepcopy(model.sampler)
+    model.initializer = deepcopy(model.initializer)
+    if seed is not None:
+        generator = np.random.default_rng(seed)
+        model.sampler.set_generator(generator)
+        if model.initializer is not None:
+            model.initializer.set_generator(generator)
+
+
+def run_chain(model: 'SklearnModel', X: np.ndarray, y: np.ndarray, seed: Optional[np.random.SeedSequence]=None):
     """
     Run a single chain for a model
     Primarily used as a building block for constructing a parallel run of multiple chains
     """
+    model = copy(model)
+    seed_chain(model, seed)
     model.model = model._construct_model(X, y)
     output = model.sampler.samples(model.model,
                                  model.n_samples,
@@ -50,11 +79,14 @@ def run_chain(model: 'SklearnModel', X: np.ndarray, y: np.ndarray):
     return output
 
 
-def run_chain_cgm(model: 'SklearnModel', X: np.ndarray, y: np.ndarray, W: np.ndarray, p: np.ndarray):
+def run_chain_cgm(model: 'SklearnModel', X: np.ndarray, y: np.ndarray, W: np.ndarray, p: np.ndarray,
+                  seed: Optional[np.random.SeedSequence]=None):
     """
     Run a single chain for a model
     Primarily used as a building block for constructing a parallel run of multiple chains
     """
+    model = copy(model)
+    seed_chain(model, seed)
     model.model = model._construct_model_cgm(X, y, W, p)
     output = model.sampler.samples(model.model,
                                  model.n_samples,
@@ -119,11 +151,27 @@ class SklearnModel(BaseEstimator, RegressorMixin):
     tree_sampler: TreeMutationSampler
         Method of sampling used on trees
         defaults to `bartpy.samplers.unconstrainedtree`
+        `bartpy.samplers.growfromroot` regrows every tree from its root on each pass instead
     initializer: Initializer
         Class that handles the initialization of tree structure and leaf values
+        `GrowFromRootInitializer` warm starts the chains from a few grow from root sweeps, allowing a much shorter `n_burn`
     n_jobs: int
         how many cores to use when computing MCMC samples
         set to `-1` to use all cores
+    numcut: int
+        if set, each covariate is binned onto at most this many quantile cutpoints before fitting
+        splits are then only made at the cutpoints, and the covariates are stored as small integer codes
+        new covariates passed to the predict methods are binned onto the same cutpoints
+    random_state: int
+        if set, each chain gets its own random stream spawned from this seed, so fits are reproducible run to run
+        independent of `n_jobs`
+        if None, the chains draw from the global `np.random` state
+    backend: str
+        how the Gibbs sweeps are run, one of "python" or "numba"
+        "numba" runs whole sweeps of the causal gaussian mixture model in compiled code over array backed trees,
+        targeting the same posterior with the grow and prune probabilities of `tree_sampler`
+        raises a ValueError if `tree_sampler` proposes anything other than grow and prune moves
+        falls back to "python" with a warning if numba isn't installed
     """
 
     def __init__(self,
@@ -146,14 +194,19 @@ class SklearnModel(BaseEstimator, RegressorMixin):
                  store_in_sample_predictions: bool=False,
                  store_acceptance_trace: bool=False,
                  nomalize_response_bool: bool=False,
-                 tree_sampler: TreeMutationSampler=get_tree_sampler(0.5, 0.5),
+                 tree_sampler: TreeMutationSampler=None,
                  initializer: Optional[Initializer]=None,
                  n_jobs=-1,
                  fix_g=None,
                  fix_h=None,
                  fix_sigma=None,
+                 numcut: Optional[int]=None,
+                 random_state: Optional[int]=None,
+                 backend: str="python",
                  **kwargs
                 ):
+        if tree_sampler is None:
+            tree_sampler = get_tree_sampler(0.5, 0.5)
         
         if "model" in kwargs:
             if kwargs["model"] == 'causal_gaussian_mixture':
@@ -180,12 +233,18 @@ class SklearnModel(BaseEstimator, RegressorMixin):
                 self.initializer = initializer
                 self.schedule = SampleScheduleCGM(self.tree_sampler, LeafNodeSampler(), SigmaSampler())
                 self.sampler = ModelSamplerCGM(self.schedule)
+                self.backend = backend
+                if resolve_backend(backend) == "numba":
+                    self.sampler = CompiledModelSamplerCGM.from_tree_sampler(self.tree_sampler)
                 self.sigma, self.data, self.model, self._prediction_samples, self._model_samples_cgm, self.extract = [None] * 6
                 self.kwargs = kwargs
                 self.nomalize_response_bool = nomalize_response_bool
                 self.fix_g=fix_g
                 self.fix_h=fix_h
                 self.fix_sigma=fix_sigma
+                self.numcut = numcut
+                self.cutpoints = None
+                self.random_state = random_state
                 
                 if alpha_g == None:
                     self.alpha_g = alpha
@@ -228,8 +287,14 @@ class SklearnModel(BaseEstimator, RegressorMixin):
             self.initializer = initializer
             self.schedule = SampleSchedule(self.tree_sampler, LeafNodeSampler(), SigmaSampler())
             self.sampler = ModelSampler(self.schedule)
+            if backend != "python":
+                raise ValueError("Only the python backend is available for regression, got {}".format(backend))
+            self.backend = backend
             self.sigma, self.data, self.model, self._prediction_samples, self._model_samples, self.extract = [None] * 6
             self.nomalize_response_bool = True
+            self.numcut = numcut
+            self.cutpoints = None
+            self.random_state = random_state
         
         
     def fit(self, X: Union[np.ndarray, pd.DataFrame], y: np.ndarray) -> 'SklearnModel':
@@ -249,8 +314,10 @@ class SklearnModel(BaseEstimator, RegressorMixin):
             self with trained parameter values
         """
 
+        X, y = self._shared_arrays(self._fit_cutpoints(X), y)
         self.model = self._construct_model(X, y)
-        self.extract = Parallel(n_jobs=self.n_jobs)(self.f_delayed_chains(X, y))
+        self._compiled_forests = {}
+        self.extract = self._parallel()(self.f_delayed_chains(X, y))
         self.combined_chains = self._combine_chains(self.extract)
         self._model_samples, self._prediction_samples = self.combined_chains["model"], self.combined_chains["in_sample_predictions"]
         self._acceptance_trace = self.combined_chains["acceptance"]
@@ -277,8 +344,10 @@ class SklearnModel(BaseEstimator, RegressorMixin):
             self with trained parameter values
         """
         y_i_star = y *(W-p)/(p*(1-p))
+        X, y_i_star, W, p = self._shared_arrays(self._fit_cutpoints(X), y_i_star, W, p)
         self.model = self._construct_model_cgm(X, y_i_star, W, p)
-        self.extract = Parallel(n_jobs=self.n_jobs)(self.f_delayed_chains_cgm(X, y_i_star, W, p))
+        self._compiled_forests = {}
+        self.extract = self._parallel()(self.f_delayed_chains_cgm(X, y_i_star, W, p))
         self.combined_chains = self._combine_chains(self.extract)
         self._model_samples_cgm, self._prediction_samples_g, self._prediction_samples_h = (
             self.combined_chains["model"], 
@@ -288,34 +357,71 @@ class SklearnModel(BaseEstimator, RegressorMixin):
         self._acceptance_trace = self.combined_chains["acceptance"]
         return self
 
+    def _fit_cutpoints(self, X: Union[np.ndarray, pd.DataFrame]) -> Union[np.ndarray, pd.DataFrame]:
+        """
+        Choose the cutpoints of each covariate when `numcut` is set, and return the binned training covariates
+        """
+        if self.numcut is None:
+            self.cutpoints = None
+            return X
+        self.cutpoints = quantile_cutpoints(ensure_numpy_array(X), self.numcut)
+        output = bin_covariate_matrix(X, self.cutpoints)
+        return output
+
+    @staticmethod
+    def _shared_arrays(*arrays) -> List[np.ndarray]:
+        """
+        Contiguous numpy versions of the training arrays
+        Done once before dispatching chains, so every chain attaches to the same memory instead of converting its own copy
+        """
+        output = [np.ascontiguousarray(ensure_numpy_array(x)) for x in arrays]
+        return output
+
+    def _parallel(self) -> Parallel:
+        """
+        Runner for the chains
+        Large arrays are dumped once and attached by each worker as read only memory maps
+        """
+        output = Parallel(n_jobs=self.n_jobs, max_nbytes=SHARED_MEMORY_MIN_BYTES, mmap_mode="r")
+        return output
+
+    def _chain_payload(self) -> 'SklearnModel':
+        """
+        Shallow copy of the model holding only its hyperparameters
+        This is what gets sent to each chain, so none of the fitted data, models or samples are pickled along with it
+        """
+        output = copy(self)
+        for attribute in FITTED_ATTRIBUTES:
+            if hasattr(output, attribute):
+                setattr(output, attribute, None)
+        return output
+
     @staticmethod
     def _combine_chains(extract: List[Chain]) -> Chain:
-        keys = list(extract[0].keys())
-        combined = {}
-        for key in keys:
-            combined[key] = np.concatenate([chain[key] for chain in extract], axis=0)
+        # Each chain's numeric output is a single buffer, so this is one concatenate rather than one per key
+        combined = Chain.concatenate(extract)
         return combined
 
     @staticmethod
     def _convert_covariates_to_data(X: np.ndarray, y: np.ndarray) -> Data:
-        from copy import deepcopy
+        # Data never writes into the arrays it's given, so they can be used as is (including read only memory maps)
         if type(X) == pd.DataFrame:
             X: pd.DataFrame = X
             X = X.values
-        output = Data(deepcopy(X), deepcopy(y), normalize=True)
+        output = Data(X, y, normalize=True)
         return output
     
     @staticmethod
     def _convert_covariates_to_data_cgm(X: np.ndarray, y: np.ndarray, W:np.ndarray, p: np.ndarray, nomalize_response_bool=True) -> Data:
-        from copy import deepcopy
+        # Data never writes into the arrays it's given, so they can be used as is (including read only memory maps)
         if type(X) == pd.DataFrame:
             X: pd.DataFrame = X
             X = X.values
         output = Data(
-            deepcopy(X), 
-            deepcopy(y), 
-            W=deepcopy(W), 
-            p=deepcopy(p) , 
+            X, 
+            y, 
+            W=W, 
+            p=p, 
             normalize=nomalize_response_bool
         )
         return output
@@ -425,7 +531,8 @@ class SklearnModel(BaseEstimator, RegressorMixin):
         -------
         List[Callable[[], ChainExtract]]
         """
-        output = [delayed(x)(self, X, y) for x in self.f_chains()]
+        payload = self._chain_payload()
+        output = [delayed(x)(payload, X, y, seed) for x, seed in zip(self.f_chains(), self._chain_seeds())]
         return output
     
     def f_delayed_chains_cgm(self, X: np.ndarray, y: np.ndarray, W:np.ndarray, p:np.ndarray):
@@ -448,7 +555,17 @@ class SklearnModel(BaseEstimator, RegressorMixin):
         -------
         List[Callable[[], ChainExtract]]
         """
-        output = [delayed(x)(self, X, y, W, p) for x in self.f_chains_cgm()] 
+        payload = self._chain_payload()
+        output = [delayed(x)(payload, X, y, W, p, seed) for x, seed in zip(self.f_chains_cgm(), self._chain_seeds())]
+        return output
+
+    def _chain_seeds(self) -> List[Optional[np.random.SeedSequence]]:
+        """
+        One independent seed per chain, spawned from `random_state`
+        """
+        if self.random_state is None:
+            return [None] * self.n_chains
+        output = np.random.SeedSequence(self.random_state).spawn(self.n_chains)
         return output
 
     def f_chains(self) -> List[Callable[[], Chain]]:
@@ -665,28 +782,68 @@ class SklearnModel(BaseEstimator, RegressorMixin):
         #print("-exit bartpy/bartpy/sklearnmodel.py SklearnModel rmse")
         return output
 
+    def compiled_forest(self, trees: str="trees") -> CompiledForest:
+        """
+        Flat array version of the posterior samples of one set of trees, compiled on first use
+
+        Parameters
+        ----------
+        trees: str
+            "trees" for regression, "trees_g" or "trees_h" for the causal gaussian mixture
+
+        Returns
+        -------
+        CompiledForest
+        """
+        if getattr(self, "_compiled_forests", None) is None:
+            self._compiled_forests = {}
+        if trees not in self._compiled_forests:
+            if trees == "trees":
+                samples = self._model_samples
+            else:
+                samples = self._model_samples_cgm
+            self._compiled_forests[trees] = compile_forest(samples, trees)
+        return self._compiled_forests[trees]
+
+    def _format_covariates(self, X) -> np.ndarray:
+        if type(X) == pd.DataFrame:
+            X: pd.DataFrame = X
+            X = X.values
+        if self.cutpoints is not None:
+            X = bin_covariate_matrix(X, self.cutpoints)
+        return X
+
     def _out_of_sample_predict(self, X):
+        X = self._format_covariates(X)
+        prediction = self.compiled_forest("trees").predict_mean(X)
         if self.nomalize_response_bool:
-            output = self.data.y.unnormalize_y(
-                np.mean([x.predict(X) for x in self._model_samples], axis=0))
+            output = self.data.y.unnormalize_y(prediction)
         else:
-            output = np.mean([x.predict(X) for x in self._model_samples], axis=0)
+            output = prediction
         return output
     
     def _out_of_sample_predict_cate(self, X):
+        X = self._format_covariates(X)
+        if self.fix_g is not None:
+            prediction = np.mean([x.predict_g(X) for x in self._model_samples_cgm], axis=0)
+        else:
+            prediction = self.compiled_forest("trees_g").predict_mean(X)
         if self.nomalize_response_bool:
-            output = self.data.y.unnormalize_y(
-                np.mean([x.predict_g(X) for x in self._model_samples_cgm], axis=0))
+            output = self.data.y.unnormalize_y(prediction)
         else:
-            output = np.mean([x.predict_g(X) for x in self._model_samples_cgm], axis=0)
+            output = prediction
         return output
     
     def _out_of_sample_predict_response(self, X):
+        X = self._format_covariates(X)
+        if self.fix_h is not None:
+            prediction = np.mean([x.predict_h(X) for x in self._model_samples_cgm], axis=0)
+        else:
+            prediction = self.compiled_forest("trees_h").predict_mean(X)
         if self.nomalize_response_bool:
-            output = self.data.y.unnormalize_y(
-                np.mean([x.predict_h(X) for x in self._model_samples_cgm], axis=0))
+            output = self.data.y.unnormalize_y(prediction)
         else:
-            output = np.mean([x.predict_h(X) for x in self._model_samples_cgm], axis=0)
+            output = prediction
         return output
 
     def fit_predict(self, X, y):
@@ -790,9 +947,11 @@ class SklearnModel(BaseEstimator, RegressorMixin):
         """
         new_model = deepcopy(self)
         combined_chain = self._combine_chains(extract)
-        self._model_samples, self._prediction_samples = combined_chain["model"], combined_chain["in_sample_predictions"]
-        self._acceptance_trace = combined_chain["acceptance"]
-        new_model.data = self._convert_covariates_to_data(X, y)
+        new_model._model_samples, new_model._prediction_samples = combined_chain["model"], combined_chain["in_sample_predictions"]
+        new_model._acceptance_trace = combined_chain["acceptance"]
+        # Forests compiled from the old samples would otherwise be used for out of sample predictions
+        new_model._compiled_forests = {}
+        new_model.data = self._convert_covariates_to_data(self._format_covariates(X), y)
         return new_model
 
     def get_posterior_CATE(self) -> np.ndarray:
@@ -0,0 +1,324 @@
+from copy import deepcopy
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from bartpy.bartpy.compiledforest import CompiledForest, flatten_tree
+from bartpy.bartpy.model import Model, ModelCGM
+from bartpy.bartpy.sigma import Sigma
+from bartpy.bartpy.tree import Tree
+
+
+class TreeStructure:
+    """
+    The shape of a single tree as flat arrays, with no reference to the training data
+
+    Internal nodes send rows with `X[:, feature] <= threshold` to `left` and all other rows to `right`
+    Leaf nodes have a feature of -1 and point to themselves
+
+    Parameters
+    ----------
+    feature, threshold, left, right: np.ndarray
+        Per node arrays, with the root at position 0
+    """
+
+    __slots__ = ["feature", "threshold", "left", "right", "depth", "leaf_positions"]
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.depth = np.zeros(len(feature), dtype=np.int32)
+        for position in range(len(feature)):
+            if feature[position] >= 0:
+                self.depth[left[position]] = self.depth[position] + 1
+                self.depth[right[position]] = self.depth[position] + 1
+        self.leaf_positions = np.flatnonzero(feature < 0).astype(np.int32)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def n_leaves(self) -> int:
+        return len(self.leaf_positions)
+
+
+class SnapshotSplit:
+    """
+    The most recent split condition leading to a node
+    Mirrors the attributes of a `SplitCondition` used by the diagnostics
+    """
+
+    __slots__ = ["splitting_variable", "splitting_value"]
+
+    def __init__(self, splitting_variable: Optional[int], splitting_value: Optional[float]):
+        self.splitting_variable = splitting_variable
+        self.splitting_value = splitting_value
+
+
+class SnapshotNode:
+    """
+    Read only view of a single node of a `TreeSnapshot`
+    """
+
+    __slots__ = ["depth", "split", "current_value", "is_leaf"]
+
+    def __init__(self, depth: int, split: SnapshotSplit, current_value: float, is_leaf: bool):
+        self.depth = depth
+        self.split = split
+        self.current_value = current_value
+        self.is_leaf = is_leaf
+
+    def predict(self) -> float:
+        return self.current_value
+
+
+class TreeSnapshot:
+    """
+    A sampled tree, stored as a `TreeStructure` plus the value of each of its leaves
+
+    Parameters
+    ----------
+    structure: TreeStructure
+    leaf_values: np.ndarray
+        Value of each leaf, in the order of `structure.leaf_positions`
+    """
+
+    __slots__ = ["structure", "leaf_values"]
+
+    def __init__(self, structure: TreeStructure, leaf_values: np.ndarray):
+        self.structure = structure
+        self.leaf_values = leaf_values
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        feature, threshold, left, right, value arrays, in the format of `flatten_tree`
+        """
+        value = np.zeros(self.structure.n_nodes)
+        value[self.structure.leaf_positions] = self.leaf_values
+        return self.structure.feature, self.structure.threshold, self.structure.left, self.structure.right, value
+
+    @property
+    def nodes(self) -> List[SnapshotNode]:
+        structure = self.structure
+        _, _, _, _, value = self.arrays()
+        parent = np.full(structure.n_nodes, -1)
+        internal = np.flatnonzero(structure.feature >= 0)
+        parent[structure.left[internal]] = internal
+        parent[structure.right[internal]] = internal
+        nodes = []
+        for position in range(structure.n_nodes):
+            if parent[position] >= 0:
+                split = SnapshotSplit(int(structure.feature[parent[position]]), float(structure.threshold[parent[position]]))
+            else:
+                split = SnapshotSplit(None, None)
+            nodes.append(SnapshotNode(int(structure.depth[position]), split, float(value[position]), structure.feature[position] < 0))
+        return nodes
+
+    @property
+    def leaf_nodes(self) -> List[SnapshotNode]:
+        return [x for x in self.nodes if x.is_leaf]
+
+    @property
+    def decision_nodes(self) -> List[SnapshotNode]:
+        return [x for x in self.nodes if not x.is_leaf]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        output = CompiledForest([[self]]).predict(X)[0]
+        return output
+
+
+class TreeStructureCache:
+    """
+    Shares `TreeStructure`s between consecutive snapshots of the same live trees
+
+    Most trees don't change structure between two stored samples, so a structure is only flattened again
+    when the tree's `structure_version` moves on. Older snapshots keep the structure they were taken with,
+    and only a fresh vector of leaf values is stored per sample
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def structure(self, tree: Tree) -> Tuple[TreeStructure, List]:
+        """
+        The current structure of the tree, and the live leaf nodes in the order of `structure.leaf_positions`
+        """
+        entry = self._entries.get(id(tree))
+        if entry is None or entry[0] is not tree or entry[1] != tree.structure_version:
+            nodes = []
+            feature, threshold, left, right, _ = flatten_tree(tree, nodes)
+            structure = TreeStructure(feature, threshold, left, right)
+            leaves = [nodes[position] for position in structure.leaf_positions]
+            entry = (tree, tree.structure_version, structure, leaves)
+            self._entries[id(tree)] = entry
+        return entry[2], entry[3]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def snapshot_tree(tree: Tree, cache: Optional[TreeStructureCache]=None) -> TreeSnapshot:
+    """
+    Store the current state of a tree as flat arrays
+    The snapshot holds no reference to the tree's nodes or data
+
+    Parameters
+    ----------
+    tree: Tree
+    cache: TreeStructureCache
+        If passed, the structure is shared with earlier snapshots of the tree when it hasn't changed
+    """
+    if cache is None:
+        cache = TreeStructureCache()
+    structure, leaves = cache.structure(tree)
+    output = TreeSnapshot(structure, np.array([leaf.current_value for leaf in leaves], dtype=float))
+    return output
+
+
+def _predict_trees(trees: List[TreeSnapshot], X: np.ndarray) -> np.ndarray:
+    if len(trees) == 0:
+        return np.zeros(len(X))
+    output = CompiledForest([trees]).predict(X)[0]
+    return output
+
+
+class ModelSnapshot:
+    """
+    Compact record of a posterior sample of a `Model`
+    Holds the sampled trees and sigma, but none of the training data
+
+    Parameters
+    ----------
+    trees: List[TreeSnapshot]
+    sigma: Sigma
+    """
+
+    def __init__(self, trees: List[TreeSnapshot], sigma: Sigma):
+        self._trees = trees
+        self._sigma = sigma
+
+    @property
+    def trees(self) -> List[TreeSnapshot]:
+        return self._trees
+
+    @property
+    def n_trees(self) -> int:
+        return len(self._trees)
+
+    @property
+    def sigma(self) -> Sigma:
+        return self._sigma
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        if X is None:
+            raise ValueError("Snapshots don't keep the training data, X must be provided")
+        return _predict_trees(self._trees, np.asarray(X, dtype=float))
+
+
+class ModelSnapshotCGM:
+    """
+    Compact record of a posterior sample of a `ModelCGM`
+    Holds the sampled g and h trees, sigma and the fixed components, but none of the training data
+    """
+
+    def __init__(self,
+                 trees_g: List[TreeSnapshot],
+                 trees_h: List[TreeSnapshot],
+                 sigma: Sigma,
+                 mu_g=None,
+                 mu_h=None,
+                 fix_g=None,
+                 fix_h=None,
+                 fix_sigma=None,
+                 alpha_g=None,
+                 beta_g=None,
+                 alpha_h=None,
+                 beta_h=None):
+        self._trees_g = trees_g
+        self._trees_h = trees_h
+        self._sigma = sigma
+        self._mu_g = mu_g
+        self._mu_h = mu_h
+        self.fix_g = fix_g
+        self.fix_h = fix_h
+        self.fix_sigma = fix_sigma
+        self.alpha_g = alpha_g
+        self.beta_g = beta_g
+        self.alpha_h = alpha_h
+        self.beta_h = beta_h
+
+    @property
+    def trees_g(self) -> List[TreeSnapshot]:
+        return self._trees_g
+
+    @property
+    def trees_h(self) -> List[TreeSnapshot]:
+        return self._trees_h
+
+    @property
+    def trees(self) -> List[TreeSnapshot]:
+        return self._trees_g + self._trees_h
+
+    @property
+    def n_trees_g(self) -> int:
+        return len(self._trees_g)
+
+    @property
+    def n_trees_h(self) -> int:
+        return len(self._trees_h)
+
+    @property
+    def mu_g(self):
+        return self._mu_g
+
+    @property
+    def mu_h(self):
+        return self._mu_h
+
+    @property
+    def sigma(self) -> Sigma:
+        return self._sigma
+
+    def predict_g(self, X: np.ndarray) -> np.ndarray:
+        if self.fix_g is not None:
+            return self.fix_g
+        if X is None:
+            raise ValueError("Snapshots don't keep the training data, X must be provided")
+        return _predict_trees(self._trees_g, np.asarray(X, dtype=float))
+
+    def predict_h(self, X: np.ndarray) -> np.ndarray:
+        if self.fix_h is not None:
+            return self.fix_h
+        if X is None:
+            raise ValueError("Snapshots don't keep the training data, X must be provided")
+        return _predict_trees(self._trees_h, np.asarray(X, dtype=float))
+
+
+def snapshot_model(model: Model, cache: Optional[TreeStructureCache]=None) -> ModelSnapshot:
+    if cache is None:
+        cache = TreeStructureCache()
+    output = ModelSnapshot([snapshot_tree(tree, cache) for tree in model.trees], deepcopy(model.sigma))
+    return output
+
+
+def snapshot_model_cgm(model: ModelCGM, cache: Optional[TreeStructureCache]=None) -> ModelSnapshotCGM:
+    if cache is None:
+        cache = TreeStructureCache()
+    output = ModelSnapshotCGM(
+        trees_g=[snapshot_tree(tree, cache) for tree in model.trees_g],
+        trees_h=[snapshot_tree(tree, cache) for tree in model.trees_h],
+        sigma=deepcopy(model.sigma),
+        mu_g=model.mu_g,
+        mu_h=model.mu_h,
+        fix_g=model.fix_g,
+        fix_h=model.fix_h,
+        fix_sigma=model.fix_sigma,
+        alpha_g=model.alpha_g,
+        beta_g=model.beta_g,
+        alpha_h=model.alpha_h,
+        beta_h=model.beta_h,
+    )
+    return output
@@ -21,7 +21,7 @@ class Split:
         #print("enter bartpy/bartpy/split.py Split __init__")
         self._data = data
         if combined_condition is None:
-            combined_condition = CombinedCondition(self._data.X.variables, [])
+            combined_condition = CombinedCondition([])
         self._combined_condition = combined_condition
         #print("-exit bartpy/bartpy/split.py Split __init__")
         
@@ -40,7 +40,7 @@ class Split:
         #print("enter bartpy/bartpy/split.py Split condition")
         
         if X is None:
-            output = ~self._data.mask
+            output = self._data.idx
             #print("output=",np.unique(output))
             #print("-exit bartpy/bartpy/split.py Split condition")
             return output
@@ -25,7 +25,9 @@ class SplitCondition(object):
                  carry_W_sum=None,
                  carry_p_sum=None,
                  carry_y_tilde_g_sum=None,
-                 carry_y_tilde_h_sum=None,):
+                 carry_y_tilde_h_sum=None,
+                 carry_weights_g_sum=None,
+                 carry_weights_h_sum=None,):
         #print("enter bartpy/bartpy/splitcondition.py SplitCondition __init__")
         self.splitting_variable = splitting_variable
         self.splitting_value = splitting_value
@@ -38,6 +40,8 @@ class SplitCondition(object):
         self.carry_W_sum = carry_W_sum
         self.carry_p_sum = carry_p_sum
         self.carry_n_obsv = carry_n_obsv
+        self.carry_weights_g_sum = carry_weights_g_sum
+        self.carry_weights_h_sum = carry_weights_h_sum
         #print("-exit bartpy/bartpy/splitcondition.py SplitCondition __init__")
 
     def __str__(self):
@@ -82,32 +86,62 @@ class CombinedVariableCondition(object):
 
 
 class CombinedCondition(object):
+    """
+    The conjunction of the split conditions on the path to a node, as a range per variable
+
+    Only the variables constrained by one of the conditions are held, all others let every row through,
+    so both building a child's condition and routing rows with it scale with the depth of the node
+    rather than with the number of covariates
 
-    def __init__(self, variables: List[int], conditions: List[SplitCondition]):
+    Parameters
+    ----------
+    conditions: List[SplitCondition]
+        Conditions on the path to the node, from the root down
+    """
+
+    def __init__(self, conditions: List[SplitCondition]):
         #print("enter bartpy/bartpy/splitcondition.py CombinedCondition __init__")
              
-        self.variables = {v: CombinedVariableCondition(v, -np.inf, np.inf) for v in variables}
+        self.variables = {}
         self.conditions = conditions
         for condition in conditions:
-            self.variables[condition.splitting_variable] = self.variables[condition.splitting_variable].add_condition(condition)
+            self._constrain(condition)
         if len(conditions) > 0:
             self.splitting_variable = conditions[-1].splitting_variable
         else:
             self.splitting_variable = None
         #print("-exit bartpy/bartpy/splitcondition.py CombinedCondition __init__")
 
+    def _constrain(self, condition: SplitCondition) -> None:
+        variable = condition.splitting_variable
+        current = self.variables.get(variable)
+        if current is None:
+            current = CombinedVariableCondition(variable, -np.inf, np.inf)
+        self.variables[variable] = current.add_condition(condition)
+
     def condition(self, X: np.ndarray) -> np.ndarray:
         #print("enter bartpy/bartpy/splitcondition.py CombinedCondition condition")
         
-        c = np.array([True] * len(X))
-        for variable in self.variables.keys():
-            c = c & (X[:, variable] > self.variables[variable].min_value) & (X[:, variable] <= self.variables[variable].max_value)
+        c = np.ones(len(X), dtype=bool)
+        for variable, bounds in self.variables.items():
+            if bounds.min_value > -np.inf:
+                c &= X[:, variable] > bounds.min_value
+            if bounds.max_value < np.inf:
+                c &= X[:, variable] <= bounds.max_value
         #print("-exit bartpy/bartpy/splitcondition.py CombinedCondition condition")     
         return c
 
     def __add__(self, other: SplitCondition):
+        """
+        The combined condition of a child node, the parent's ranges with only the split variable's range narrowed
+        """
         #print("enter bartpy/bartpy/splitcondition.py CombinedCondition __add__")
-        output = CombinedCondition(list(self.variables.keys()), self.conditions + [other])
+        output = CombinedCondition([])
+        # Variable ranges are never changed in place, so they can be shared with the parent
+        output.variables = dict(self.variables)
+        output.conditions = self.conditions + [other]
+        output._constrain(other)
+        output.splitting_variable = other.splitting_variable
         #print("-exit bartpy/bartpy/splitcondition.py CombinedCondition __add__")     
         return output
 
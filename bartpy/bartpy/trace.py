@@ -1,19 +1,24 @@
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 
 import numpy as np
 
-from bartpy.bartpy.model import Model, ModelCGM, deep_copy_model, deep_copy_model_cgm
+from bartpy.bartpy.model import Model, ModelCGM
 from bartpy.bartpy.mutation import TreeMutation
+from bartpy.bartpy.snapshot import TreeStructureCache, snapshot_model, snapshot_model_cgm
 
 
 class TraceLogger():
 
     def __init__(self,
                  f_tree_mutation_log: Callable[[TreeMutation], Any]=lambda x: x is not None,
-                 f_model_log: Callable[[Model], Any]=lambda x: deep_copy_model(x),
+                 f_model_log: Optional[Callable[[Model], Any]]=None,
                  f_in_sample_prediction_log: Callable[[np.ndarray], Any]=lambda x: x):
         #print("enter bartpy/bartpy/trace.py TraceLogger __init__")
         self.f_tree_mutation_log = f_tree_mutation_log
+        # By default samples are stored as snapshots, sharing tree structures between consecutive samples
+        self.structure_cache = TreeStructureCache()
+        if f_model_log is None:
+            f_model_log = lambda x: snapshot_model(x, self.structure_cache)
         self.f_model_log = f_model_log
         self.f_in_sample_prediction_log = f_in_sample_prediction_log
         #print("-exit bartpy/bartpy/trace.py TraceLogger __init__")
@@ -40,10 +45,14 @@ class TraceLoggerCGM():
 
     def __init__(self,
                  f_tree_mutation_log: Callable[[TreeMutation], Any]=lambda x: x is not None,
-                 f_model_log: Callable[[ModelCGM], Any]=lambda x: deep_copy_model_cgm(x),
+                 f_model_log: Optional[Callable[[ModelCGM], Any]]=None,
                  f_in_sample_prediction_log: Callable[[np.ndarray], Any]=lambda x: x):
         #print("enter bartpy/bartpy/trace.py TraceLoggerCGM __init__")
         self.f_tree_mutation_log = f_tree_mutation_log
+        # By default samples are stored as snapshots, sharing tree structures between consecutive samples
+        self.structure_cache = TreeStructureCache()
+        if f_model_log is None:
+            f_model_log = lambda x: snapshot_model_cgm(x, self.structure_cache)
         self.f_model_log = f_model_log
         self.f_in_sample_prediction_log = f_in_sample_prediction_log
         #print("-exit bartpy/bartpy/trace.py TraceLoggerCGM __init__")
@@ -1,9 +1,9 @@
-from typing import List
+from typing import List, Optional
 
 import numpy as np
 
 from bartpy.bartpy.mutation import TreeMutation
-from bartpy.bartpy.node import TreeNode, LeafNode, DecisionNode, deep_copy_node
+from bartpy.bartpy.node import TreeNode, LeafNode, DecisionNode, deep_copy_node, subtree_nodes
 
 
 class Tree:
@@ -15,6 +15,9 @@ class Tree:
       - splittable leaf nodes
       - prunable decision nodes
 
+    Each kind is kept in its own index, along with the parent of every node, and the indexes are
+    updated as nodes are added and removed, so none of the queries need to scan the whole tree
+
     Parameters
     ----------
     nodes: List[Node]
@@ -24,9 +27,31 @@ class Tree:
     def __init__(self, nodes: List[TreeNode]):
         #print("enter bartpy/bartpy/tree.py Tree __init__")
         
-        self._nodes = nodes
+        # Insertion ordered dicts used as ordered sets, so removal is O(1) and the order matches the node list
+        self._nodes = {}
+        self._leaf_nodes = {}
+        # Built the first time it is needed, stored trees don't keep the data to check splittability against
+        self._splittable_leaf_nodes = None
+        self._decision_nodes = {}
+        self._prunable_decision_nodes = {}
+        self._parents = {}
         self.cache_up_to_date = False
         self._prediction = None
+        # Bumped on every change to the structure of the tree, leaf values aren't part of the structure
+        self.structure_version = 0
+        # Row -> leaf slot assignment of the training data, built lazily and then kept up to date by `mutate`
+        self._leaf_ids = None
+        self._leaf_slots = {}
+        self._slot_leaves = []
+        self._free_slots = []
+        for node in nodes:
+            self.add_node(node)
+        self.structure_version = 0
+        for node in nodes:
+            if type(node) == DecisionNode:
+                self._parents[node.left_child] = node
+                self._parents[node.right_child] = node
+        self._root = next((x for x in self._nodes if x not in self._parents), None)
         #print("-exit bartpy/bartpy/tree.py Tree __init__")
 
     @property
@@ -35,8 +60,27 @@ class Tree:
         List of all nodes contained in the tree
         """
         #print("enter bartpy/bartpy/tree.py Tree nodes")
+        output = list(self._nodes)
         #print("-exit bartpy/bartpy/tree.py Tree nodes")
-        return self._nodes
+        return output
+
+    @property
+    def root(self) -> TreeNode:
+        """
+        The node of the tree that isn't the child of any other node
+        """
+        #print("enter bartpy/bartpy/tree.py Tree root")
+        #print("-exit bartpy/bartpy/tree.py Tree root")
+        return self._root
+
+    def parent(self, node: TreeNode) -> Optional[DecisionNode]:
+        """
+        The decision node the node is a child of, None for the root
+        """
+        #print("enter bartpy/bartpy/tree.py Tree parent")
+        output = self._parents.get(node)
+        #print("-exit bartpy/bartpy/tree.py Tree parent")
+        return output
 
     @property
     def leaf_nodes(self) -> List[LeafNode]:
@@ -44,7 +88,7 @@ class Tree:
         List of all of the leaf nodes in the tree
         """
         #print("enter bartpy/bartpy/tree.py Tree leaf_nodes")
-        output = [x for x in self._nodes if type(x) == LeafNode]
+        output = list(self._leaf_nodes)
         #print("-exit bartpy/bartpy/tree.py Tree leaf_nodes")
         return output
 
@@ -55,7 +99,7 @@ class Tree:
         i.e. not all rows of the covariate matrix are duplicates
         """
         #print("enter bartpy/bartpy/tree.py Tree splittable_leaf_nodes")
-        output = [x for x in self.leaf_nodes if x.is_splittable()]
+        output = list(self._splittable_index())
         #print("-exit bartpy/bartpy/tree.py Tree splittable_leaf_nodes")
         return output
 
@@ -66,7 +110,7 @@ class Tree:
         Decision nodes are internal split nodes, i.e. not leaf nodes
         """
         #print("enter bartpy/bartpy/tree.py Tree decision_nodes")
-        output = [x for x in self._nodes if type(x) == DecisionNode]
+        output = list(self._decision_nodes)
         #print("-exit bartpy/bartpy/tree.py Tree decision_nodes")
         return output
 
@@ -77,10 +121,47 @@ class Tree:
         In particular, decision nodes that have two leaf node children
         """
         #print("enter bartpy/bartpy/tree.py Tree prunable_decision_nodes")
-        output = [x for x in self.decision_nodes if x.is_prunable()]
+        output = list(self._prunable_decision_nodes)
         #print("-exit bartpy/bartpy/tree.py Tree prunable_decision_nodes")
         return output
 
+    @property
+    def n_leaf_nodes(self) -> int:
+        #print("enter bartpy/bartpy/tree.py Tree n_leaf_nodes")
+        #print("-exit bartpy/bartpy/tree.py Tree n_leaf_nodes")
+        return len(self._leaf_nodes)
+
+    @property
+    def n_splittable_leaf_nodes(self) -> int:
+        #print("enter bartpy/bartpy/tree.py Tree n_splittable_leaf_nodes")
+        output = len(self._splittable_index())
+        #print("-exit bartpy/bartpy/tree.py Tree n_splittable_leaf_nodes")
+        return output
+
+    @property
+    def n_prunable_decision_nodes(self) -> int:
+        #print("enter bartpy/bartpy/tree.py Tree n_prunable_decision_nodes")
+        #print("-exit bartpy/bartpy/tree.py Tree n_prunable_decision_nodes")
+        return len(self._prunable_decision_nodes)
+
+    def _splittable_index(self) -> dict:
+        #print("enter bartpy/bartpy/tree.py Tree _splittable_index")
+        if self._splittable_leaf_nodes is None:
+            self._splittable_leaf_nodes = {x: None for x in self._leaf_nodes if x.is_splittable()}
+        #print("-exit bartpy/bartpy/tree.py Tree _splittable_index")
+        return self._splittable_leaf_nodes
+
+    def _refresh_prunable(self, node: TreeNode) -> None:
+        """
+        Keep the prunable index in line with the current children of a decision node
+        """
+        #print("enter bartpy/bartpy/tree.py Tree _refresh_prunable")
+        if node in self._decision_nodes and node.is_prunable():
+            self._prunable_decision_nodes[node] = None
+        else:
+            self._prunable_decision_nodes.pop(node, None)
+        #print("-exit bartpy/bartpy/tree.py Tree _refresh_prunable")
+
     def update_y(self, y: np.ndarray) -> None: ############################### PASS IN SUM OF ALL OTHER TREES...
         """
         Update the cached value of the target array in all nodes
@@ -88,8 +169,8 @@ class Tree:
         """
         #print("enter bartpy/bartpy/tree.py Tree update_y")
         self.cache_up_to_date = False
-        for node in self.nodes:
-            node.update_y(y)
+        # All of the nodes share the same target, so updating one updates the whole tree
+        self.root.update_y(y)
         #print("-exit bartpy/bartpy/tree.py Tree update_y")
         
     def update_y_tilde_g(self, y_tilde_g: np.ndarray) -> None: ############################### PASS IN SUM OF ALL OTHER TREES...
@@ -148,16 +229,9 @@ class Tree:
             #print("-exit bartpy/bartpy/tree.py Tree predict")
             return output
 
-        if self.cache_up_to_date:
-            #print("-exit bartpy/bartpy/tree.py Tree predict")
-            return self._prediction
-        for leaf in self.leaf_nodes:
-            if self._prediction is None:
-                self._prediction = np.zeros(self.nodes[0].data.X.n_obsv)
-            self._prediction[leaf.split.condition()] = leaf.predict()
-        self.cache_up_to_date = True
+        output = self._in_sample_predict()
         #print("-exit bartpy/bartpy/tree.py Tree predict")
-        return self._prediction
+        return output
 
     def predict_g(self, X: np.ndarray=None) -> np.ndarray:
         """
@@ -171,16 +245,9 @@ class Tree:
             #print("-exit bartpy/bartpy/tree.py Tree predict_g")
             return output
 
-        if self.cache_up_to_date:
-            #print("-exit bartpy/bartpy/tree.py Tree predict_g")
-            return self._prediction
-        for leaf in self.leaf_nodes:
-            if self._prediction is None:
-                self._prediction = np.zeros(self.nodes[0].data.X.n_obsv)
-            self._prediction[leaf.split.condition()] = leaf.predict()
-        self.cache_up_to_date = True
+        output = self._in_sample_predict()
         #print("-exit bartpy/bartpy/tree.py Tree predict_g")
-        return self._prediction
+        return output
 
     def predict_h(self, X: np.ndarray=None) -> np.ndarray:
         """
@@ -194,17 +261,150 @@ class Tree:
             #print("-exit bartpy/bartpy/tree.py Tree predict_h")
             return output
 
-        if self.cache_up_to_date:
-            #print("-exit bartpy/bartpy/tree.py Tree predict_h")
-            return self._prediction
-        for leaf in self.leaf_nodes:
-            if self._prediction is None:
-                self._prediction = np.zeros(self.nodes[0].data.X.n_obsv)
-            self._prediction[leaf.split.condition()] = leaf.predict()
-        self.cache_up_to_date = True
+        output = self._in_sample_predict()
         #print("-exit bartpy/bartpy/tree.py Tree predict_h")
+        return output
+
+    def _in_sample_predict(self) -> np.ndarray:
+        """
+        Prediction for the training data, a single gather of the leaf values through the row -> leaf assignment
+        """
+        #print("enter bartpy/bartpy/tree.py Tree _in_sample_predict")
+        if not self.cache_up_to_date:
+            leaf_ids = self.leaf_ids
+            if self._prediction is None or len(self._prediction) != len(leaf_ids):
+                self._prediction = np.empty(len(leaf_ids))
+            # Gathered into the same buffer every time, callers use the prediction straight away rather than keeping it
+            np.take(self.leaf_values(), leaf_ids, out=self._prediction)
+            self.cache_up_to_date = True
+        #print("-exit bartpy/bartpy/tree.py Tree _in_sample_predict")
         return self._prediction
 
+    @property
+    def leaf_ids(self) -> np.ndarray:
+        """
+        For each row of the training data, the slot of the leaf node that the row falls into
+        Slots index into `leaf_values`
+        """
+        #print("enter bartpy/bartpy/tree.py Tree leaf_ids")
+        if self._leaf_ids is None:
+            self._build_leaf_ids()
+        #print("-exit bartpy/bartpy/tree.py Tree leaf_ids")
+        return self._leaf_ids
+
+    def leaf_values(self) -> np.ndarray:
+        """
+        Current value of the leaf node in each slot
+        """
+        #print("enter bartpy/bartpy/tree.py Tree leaf_values")
+        if self._leaf_ids is None:
+            self._build_leaf_ids()
+        output = np.array([0. if leaf is None else leaf.current_value for leaf in self._slot_leaves])
+        #print("-exit bartpy/bartpy/tree.py Tree leaf_values")
+        return output
+
+    def leaf_slot(self, leaf: LeafNode) -> int:
+        #print("enter bartpy/bartpy/tree.py Tree leaf_slot")
+        if self._leaf_ids is None:
+            self._build_leaf_ids()
+        #print("-exit bartpy/bartpy/tree.py Tree leaf_slot")
+        return self._leaf_slots[leaf]
+
+    def leaf_summed_y(self, weights: np.ndarray=None) -> np.ndarray:
+        """
+        Sum of the current target over each leaf slot, optionally weighting each row
+        Computed for all leaves at once with a single `np.bincount`
+        """
+        #print("enter bartpy/bartpy/tree.py Tree leaf_summed_y")
+        y = self.root.data.y.values
+        if weights is not None:
+            y = y * weights
+        output = np.bincount(self.leaf_ids, weights=y, minlength=len(self._slot_leaves))
+        #print("-exit bartpy/bartpy/tree.py Tree leaf_summed_y")
+        return output
+
+    def leaf_summed_weights(self, weights: np.ndarray=None) -> np.ndarray:
+        """
+        Number of rows in each leaf slot, or the sum of their weights if passed
+        """
+        #print("enter bartpy/bartpy/tree.py Tree leaf_summed_weights")
+        output = np.bincount(self.leaf_ids, weights=weights, minlength=len(self._slot_leaves))
+        #print("-exit bartpy/bartpy/tree.py Tree leaf_summed_weights")
+        return output
+
+    def _build_leaf_ids(self) -> None:
+        #print("enter bartpy/bartpy/tree.py Tree _build_leaf_ids")
+        leaves = self.leaf_nodes
+        self._leaf_ids = np.zeros(self.root.data.X.values.shape[0], dtype=np.int32)
+        self._slot_leaves = list(leaves)
+        self._leaf_slots = {leaf: slot for slot, leaf in enumerate(leaves)}
+        self._free_slots = []
+        for slot, leaf in enumerate(leaves):
+            self._leaf_ids[leaf.split.condition()] = slot
+        #print("-exit bartpy/bartpy/tree.py Tree _build_leaf_ids")
+
+    def _new_slot(self, leaf: LeafNode) -> int:
+        #print("enter bartpy/bartpy/tree.py Tree _new_slot")
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_leaves[slot] = leaf
+        else:
+            slot = len(self._slot_leaves)
+            self._slot_leaves.append(leaf)
+        self._leaf_slots[leaf] = slot
+        #print("-exit bartpy/bartpy/tree.py Tree _new_slot")
+        return slot
+
+    def _update_leaf_ids(self, mutation: TreeMutation) -> None:
+        """
+        Keep the row -> leaf assignment in line with a mutation
+        Only the rows of the grown (pruned) node's right child are reassigned,
+        or the rows of the rebuilt subtree for a change or swap
+        """
+        #print("enter bartpy/bartpy/tree.py Tree _update_leaf_ids")
+        if self._leaf_ids is None:
+            #print("-exit bartpy/bartpy/tree.py Tree _update_leaf_ids")
+            return
+        if mutation.kind == "grow":
+            # The left child takes over the slot of the leaf it replaces
+            leaf, left, right = mutation.existing_node, mutation.updated_node.left_child, mutation.updated_node.right_child
+            if leaf not in self._leaf_slots:
+                self._leaf_ids = None
+                #print("-exit bartpy/bartpy/tree.py Tree _update_leaf_ids")
+                return
+            slot = self._leaf_slots.pop(leaf)
+            self._slot_leaves[slot] = left
+            self._leaf_slots[left] = slot
+            self._leaf_ids[right.split.condition()] = self._new_slot(right)
+        elif mutation.kind == "prune":
+            # The new leaf takes over the slot of the left child, the right child's slot is freed
+            leaf, left, right = mutation.updated_node, mutation.existing_node.left_child, mutation.existing_node.right_child
+            if left not in self._leaf_slots or right not in self._leaf_slots:
+                self._leaf_ids = None
+                #print("-exit bartpy/bartpy/tree.py Tree _update_leaf_ids")
+                return
+            slot = self._leaf_slots.pop(left)
+            right_slot = self._leaf_slots.pop(right)
+            self._slot_leaves[slot] = leaf
+            self._leaf_slots[leaf] = slot
+            self._leaf_ids[right.split.condition()] = slot
+            self._slot_leaves[right_slot] = None
+            self._free_slots.append(right_slot)
+        else:
+            # The rebuilt subtree has as many leaves as the old one, each takes over the slot of an old leaf
+            old_leaves = [x for x in subtree_nodes(mutation.existing_node) if type(x) == LeafNode]
+            new_leaves = [x for x in subtree_nodes(mutation.updated_node) if type(x) == LeafNode]
+            if any(leaf not in self._leaf_slots for leaf in old_leaves):
+                self._leaf_ids = None
+                #print("-exit bartpy/bartpy/tree.py Tree _update_leaf_ids")
+                return
+            for old_leaf, new_leaf in zip(old_leaves, new_leaves):
+                slot = self._leaf_slots.pop(old_leaf)
+                self._slot_leaves[slot] = new_leaf
+                self._leaf_slots[new_leaf] = slot
+                self._leaf_ids[new_leaf.split.condition()] = slot
+        #print("-exit bartpy/bartpy/tree.py Tree _update_leaf_ids")
+
     def _out_of_sample_predict(self, X) -> np.ndarray:
         """
         Prediction for a covariate matrix not used for training
@@ -274,7 +474,13 @@ class Tree:
         Note that this is non-recursive, only drops the node and not any children
         """
         #print("enter bartpy/bartpy/tree.py Tree remove_node")
-        self._nodes.remove(node)
+        self.structure_version += 1
+        del self._nodes[node]
+        self._leaf_nodes.pop(node, None)
+        if self._splittable_leaf_nodes is not None:
+            self._splittable_leaf_nodes.pop(node, None)
+        self._decision_nodes.pop(node, None)
+        self._prunable_decision_nodes.pop(node, None)
         #print("-exit bartpy/bartpy/tree.py Tree remove_node")
 
     def add_node(self, node: TreeNode) -> None:
@@ -283,7 +489,16 @@ class Tree:
         Note that this is non-recursive, only adds the node and not any children
         """
         #print("enter bartpy/bartpy/tree.py Tree add_node")
-        self._nodes.append(node)
+        self.structure_version += 1
+        self._nodes[node] = None
+        if type(node) == LeafNode:
+            self._leaf_nodes[node] = None
+            # A leaf's covariates never change, so whether it can be split is fixed when it is added
+            if self._splittable_leaf_nodes is not None and node.is_splittable():
+                self._splittable_leaf_nodes[node] = None
+        elif type(node) == DecisionNode:
+            self._decision_nodes[node] = None
+            self._refresh_prunable(node)
         #print("-exit bartpy/bartpy/tree.py Tree add_node")
 
 
@@ -307,18 +522,41 @@ def mutate(tree: Tree, mutation: TreeMutation) -> None:
         tree.remove_node(mutation.existing_node.left_child)
         tree.remove_node(mutation.existing_node.right_child)
         tree.add_node(mutation.updated_node)
+        tree._parents.pop(mutation.existing_node.left_child, None)
+        tree._parents.pop(mutation.existing_node.right_child, None)
 
     if mutation.kind == "grow":
         tree.remove_node(mutation.existing_node)
         tree.add_node(mutation.updated_node.left_child)
         tree.add_node(mutation.updated_node.right_child)
         tree.add_node(mutation.updated_node)
-
-    for node in tree.nodes:
-        if node.right_child == mutation.existing_node:
-            node._right_child = mutation.updated_node
-        if node.left_child == mutation.existing_node:
-            node._left_child = mutation.updated_node
+        tree._parents[mutation.updated_node.left_child] = mutation.updated_node
+        tree._parents[mutation.updated_node.right_child] = mutation.updated_node
+
+    if mutation.kind in ("change", "swap"):
+        for node in subtree_nodes(mutation.existing_node):
+            tree.remove_node(node)
+            if node is not mutation.existing_node:
+                tree._parents.pop(node, None)
+        for node in subtree_nodes(mutation.updated_node):
+            tree.add_node(node)
+            if type(node) == DecisionNode:
+                tree._parents[node.left_child] = node
+                tree._parents[node.right_child] = node
+
+    # Only the parent of the changed node links to it
+    parent = tree._parents.pop(mutation.existing_node, None)
+    if parent is None:
+        tree._root = mutation.updated_node
+    else:
+        if parent.right_child == mutation.existing_node:
+            parent._right_child = mutation.updated_node
+        if parent.left_child == mutation.existing_node:
+            parent._left_child = mutation.updated_node
+        tree._parents[mutation.updated_node] = parent
+        tree._refresh_prunable(parent)
+
+    tree._update_leaf_ids(mutation)
     #print("-exit bartpy/bartpy/tree.py Tree mutate")
 
 def deep_copy_tree(tree: Tree):
@@ -336,6 +574,20 @@ def deep_copy_tree(tree: Tree):
         Version of the tree optimized to be low memory
     """
     #print("enter bartpy/bartpy/tree.py Tree deep_copy_tree")
-    output = Tree([deep_copy_node(x) for x in tree.nodes])
+    copies = {}
+
+    def copy_node(node: TreeNode) -> TreeNode:
+        # Decision nodes are relinked to the copies of their children, so the copy holds no reference to the live tree
+        if id(node) not in copies:
+            if type(node) == DecisionNode:
+                copies[id(node)] = DecisionNode(node.split.out_of_sample_conditioner(),
+                                                copy_node(node.left_child),
+                                                copy_node(node.right_child),
+                                                depth=node.depth)
+            else:
+                copies[id(node)] = deep_copy_node(node)
+        return copies[id(node)]
+
+    output = Tree([copy_node(x) for x in tree.nodes])
     #print("-exit bartpy/bartpy/tree.py Tree deep_copy_tree")
     return output
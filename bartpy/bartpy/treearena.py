@@ -0,0 +1,337 @@
+from typing import List, Optional
+
+import numpy as np
+
+from bartpy.bartpy.compiledforest import flatten_tree
+from bartpy.bartpy.snapshot import SnapshotSplit, TreeSnapshot, TreeStructure
+from bartpy.bartpy.tree import Tree
+
+# Columns of the per node integer array
+FEATURE, LEFT, RIGHT, PARENT, DEPTH, START, END, SPLITTABLE = 0, 1, 2, 3, 4, 5, 6, 7
+N_COLUMNS = 8
+
+# Columns of the per node statistics array, sums over the rows of the node of the weights and of the weighted target
+SUMMED_WEIGHTS, SUMMED_Y = 0, 1
+N_STATISTICS = 2
+
+# Values of the FEATURE column for nodes that don't split
+LEAF = -1
+FREE = -2
+
+# Value of the SPLITTABLE column until the node has been checked
+UNKNOWN = -1
+
+
+class TreeArena:
+    """
+    An ensemble of trees, each held in preallocated per node arrays rather than as linked node objects
+
+    Tree t owns row t of every per node array, with its root in slot 0:
+     - nodes: (n_trees, capacity, N_COLUMNS) integers, indexed by the column constants above
+       split variable, children, parent, depth, row range and whether a leaf can be split
+     - threshold: splitting value of decision nodes
+     - value: current value of leaves
+     - statistics: (n_trees, capacity, N_STATISTICS) sums kept for the leaves
+     - order: (n_trees, n_obsv) permutation of the training rows, in which the rows of every node are the range START:END
+
+    Slots freed by a prune go on the tree's free list and are handed out again by the next grow,
+    so growing or pruning a node is a handful of index writes, plus partitioning the rows of the grown node
+    Every slot below `n_slots[t]` is either in use or on the free list, and free slots have a FEATURE of FREE
+
+    `versions[t]` is bumped whenever tree t changes shape, and is used to share structures between snapshots
+
+    Parameters
+    ----------
+    n_trees: int
+    n_obsv: int
+        number of rows of the training data
+    capacity: int
+        number of slots allocated per tree, grown with `ensure_capacity`
+    """
+
+    def __init__(self, n_trees: int, n_obsv: int, capacity: int=16):
+        #print("enter bartpy/bartpy/treearena.py TreeArena __init__")
+        self.nodes = np.full((n_trees, capacity, N_COLUMNS), -1, dtype=np.int64)
+        self.nodes[:, :, FEATURE] = FREE
+        self.threshold = np.zeros((n_trees, capacity))
+        self.value = np.zeros((n_trees, capacity))
+        self.statistics = np.zeros((n_trees, capacity, N_STATISTICS))
+        self.free = np.zeros((n_trees, capacity), dtype=np.int64)
+        self.n_free = np.zeros(n_trees, dtype=np.int64)
+        self.n_slots = np.ones(n_trees, dtype=np.int64)
+        self.order = np.tile(np.arange(n_obsv, dtype=np.int64), (n_trees, 1))
+        self.versions = np.zeros(n_trees, dtype=np.int64)
+        root = self.nodes[:, 0]
+        root[:, FEATURE] = LEAF
+        root[:, DEPTH] = 0
+        root[:, START] = 0
+        root[:, END] = n_obsv
+        root[:, SPLITTABLE] = UNKNOWN
+        self._structures = {}
+        #print("-exit bartpy/bartpy/treearena.py TreeArena __init__")
+
+    @property
+    def n_trees(self) -> int:
+        return self.nodes.shape[0]
+
+    @property
+    def n_obsv(self) -> int:
+        return self.order.shape[1]
+
+    @property
+    def capacity(self) -> int:
+        return self.nodes.shape[1]
+
+    def n_nodes(self, t: int) -> int:
+        """
+        Number of nodes in use in tree t
+        """
+        return int(self.n_slots[t] - self.n_free[t])
+
+    @staticmethod
+    def from_trees(trees: List[Tree], X: np.ndarray) -> 'TreeArena':
+        """
+        Copy the current structure and leaf values of live trees
+        """
+        #print("enter bartpy/bartpy/treearena.py TreeArena from_trees")
+        flat = [flatten_tree(tree) for tree in trees]
+        capacity = max([16] + [2 * len(arrays[0]) for arrays in flat])
+        output = TreeArena(len(trees), X.shape[0], capacity)
+        for t, (feature, threshold, left, right, value) in enumerate(flat):
+            output.n_slots[t] = len(feature)
+            output.threshold[t, :len(feature)] = threshold
+            output.value[t, :len(feature)] = value
+            nodes, order = output.nodes[t], output.order[t]
+            # Flattened trees list every parent before its children, so each node's row range is known when it is reached
+            for position in range(len(feature)):
+                if feature[position] < 0:
+                    nodes[position, FEATURE] = LEAF
+                    nodes[position, SPLITTABLE] = UNKNOWN
+                    continue
+                start, end = nodes[position, START], nodes[position, END]
+                rows = order[start:end]
+                goes_left = X[rows, feature[position]] <= threshold[position]
+                n_left = int(np.sum(goes_left))
+                order[start:end] = np.concatenate([rows[goes_left], rows[~goes_left]])
+                for child, child_start, child_end in ((left[position], start, start + n_left), (right[position], start + n_left, end)):
+                    nodes[child, PARENT] = position
+                    nodes[child, DEPTH] = nodes[position, DEPTH] + 1
+                    nodes[child, START] = child_start
+                    nodes[child, END] = child_end
+                nodes[position, FEATURE] = feature[position]
+                nodes[position, LEFT] = left[position]
+                nodes[position, RIGHT] = right[position]
+        #print("-exit bartpy/bartpy/treearena.py TreeArena from_trees")
+        return output
+
+    def ensure_capacity(self, n_new: int=2) -> None:
+        """
+        Make sure every tree can take another `n_new` nodes without reusing a free slot, doubling the arrays if not
+        """
+        if np.max(self.n_slots) + n_new <= self.capacity:
+            return
+        n_extra = self.capacity
+
+        def extended(array: np.ndarray, fill) -> np.ndarray:
+            extra = np.full((self.n_trees, n_extra) + array.shape[2:], fill, dtype=array.dtype)
+            return np.concatenate([array, extra], axis=1)
+
+        nodes = extended(self.nodes, -1)
+        nodes[:, self.capacity:, FEATURE] = FREE
+        self.nodes = nodes
+        self.threshold = extended(self.threshold, 0.)
+        self.value = extended(self.value, 0.)
+        self.statistics = extended(self.statistics, 0.)
+        self.free = extended(self.free, 0)
+
+    def slots(self, t: int) -> np.ndarray:
+        """
+        Slots of the nodes of tree t, parents before children and left subtrees before right ones
+        """
+        nodes = self.nodes[t]
+        output = []
+        stack = [0]
+        while stack:
+            slot = stack.pop()
+            output.append(slot)
+            if nodes[slot, FEATURE] >= 0:
+                stack.append(nodes[slot, RIGHT])
+                stack.append(nodes[slot, LEFT])
+        return np.array(output, dtype=np.int64)
+
+    def leaf_slots(self, t: int) -> np.ndarray:
+        return np.flatnonzero(self.nodes[t, :self.n_slots[t], FEATURE] == LEAF)
+
+    def predict_tree(self, t: int) -> np.ndarray:
+        """
+        In sample predictions of tree t
+        """
+        output = np.zeros(self.n_obsv)
+        for slot in self.leaf_slots(t):
+            output[self.order[t, self.nodes[t, slot, START]:self.nodes[t, slot, END]]] = self.value[t, slot]
+        return output
+
+    def predict(self) -> np.ndarray:
+        """
+        Summed in sample predictions of the trees
+        """
+        output = np.zeros(self.n_obsv)
+        for t in range(self.n_trees):
+            output += self.predict_tree(t)
+        return output
+
+    def _structure(self, t: int):
+        entry = self._structures.get(t)
+        if entry is None or entry[0] != self.versions[t]:
+            nodes = self.nodes[t]
+            slots = self.slots(t)
+            positions = np.zeros(self.capacity, dtype=np.int32)
+            positions[slots] = np.arange(len(slots), dtype=np.int32)
+            feature = nodes[slots, FEATURE].astype(np.int32)
+            is_leaf = feature < 0
+            own_position = np.arange(len(slots), dtype=np.int32)
+            left = np.where(is_leaf, own_position, positions[np.maximum(nodes[slots, LEFT], 0)]).astype(np.int32)
+            right = np.where(is_leaf, own_position, positions[np.maximum(nodes[slots, RIGHT], 0)]).astype(np.int32)
+            threshold = np.where(is_leaf, 0., self.threshold[t, slots])
+            structure = TreeStructure(feature, threshold, left, right)
+            entry = (self.versions[t], structure, slots[structure.leaf_positions])
+            self._structures[t] = entry
+        return entry[1], entry[2]
+
+    def snapshot(self, t: int) -> TreeSnapshot:
+        """
+        The current state of tree t, in the same form as snapshots of live `Tree`s
+        """
+        structure, leaf_slots = self._structure(t)
+        output = TreeSnapshot(structure, self.value[t, leaf_slots].copy())
+        return output
+
+    def snapshots(self) -> List[TreeSnapshot]:
+        return [self.snapshot(t) for t in range(self.n_trees)]
+
+    def view(self, t: int) -> 'TreeView':
+        return TreeView(self, t)
+
+
+class ArenaNode:
+    """
+    A single slot of a tree in a `TreeArena`, with the read only attributes of a `TreeNode` used by diagnostics
+    """
+
+    __slots__ = ["_arena", "_t", "slot"]
+
+    def __init__(self, arena: TreeArena, t: int, slot: int):
+        self._arena = arena
+        self._t = t
+        self.slot = slot
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ArenaNode) and other._arena is self._arena and (other._t, other.slot) == (self._t, self.slot)
+
+    def __hash__(self) -> int:
+        return hash((id(self._arena), self._t, self.slot))
+
+    @property
+    def _row(self) -> np.ndarray:
+        return self._arena.nodes[self._t, self.slot]
+
+    @property
+    def depth(self) -> int:
+        return int(self._row[DEPTH])
+
+    @property
+    def is_leaf(self) -> bool:
+        return self._row[FEATURE] == LEAF
+
+    @property
+    def current_value(self) -> float:
+        return float(self._arena.value[self._t, self.slot])
+
+    @property
+    def n_obsv(self) -> int:
+        return int(self._row[END] - self._row[START])
+
+    @property
+    def split(self) -> SnapshotSplit:
+        """
+        The most recent split condition leading to the node
+        """
+        parent = self._row[PARENT]
+        if self.slot == 0 or parent < 0:
+            return SnapshotSplit(None, None)
+        return SnapshotSplit(int(self._arena.nodes[self._t, parent, FEATURE]), float(self._arena.threshold[self._t, parent]))
+
+    @property
+    def left_child(self) -> Optional['ArenaNode']:
+        return None if self.is_leaf else ArenaNode(self._arena, self._t, int(self._row[LEFT]))
+
+    @property
+    def right_child(self) -> Optional['ArenaNode']:
+        return None if self.is_leaf else ArenaNode(self._arena, self._t, int(self._row[RIGHT]))
+
+    def is_prunable(self) -> bool:
+        return not self.is_leaf and self.left_child.is_leaf and self.right_child.is_leaf
+
+    def predict(self) -> float:
+        return self.current_value
+
+
+class TreeView:
+    """
+    Read only `Tree` interface onto a single tree of a `TreeArena`
+
+    Nothing is copied, every query reads the arena's current arrays, so the view follows the tree as it is sampled
+
+    Parameters
+    ----------
+    arena: TreeArena
+    t: int
+        index of the tree in the arena
+    """
+
+    def __init__(self, arena: TreeArena, t: int):
+        self._arena = arena
+        self._t = t
+
+    def _node(self, slot: int) -> ArenaNode:
+        return ArenaNode(self._arena, self._t, int(slot))
+
+    @property
+    def root(self) -> ArenaNode:
+        return self._node(0)
+
+    @property
+    def nodes(self) -> List[ArenaNode]:
+        return [self._node(x) for x in self._arena.slots(self._t)]
+
+    @property
+    def leaf_nodes(self) -> List[ArenaNode]:
+        return [x for x in self.nodes if x.is_leaf]
+
+    @property
+    def decision_nodes(self) -> List[ArenaNode]:
+        return [x for x in self.nodes if not x.is_leaf]
+
+    @property
+    def prunable_decision_nodes(self) -> List[ArenaNode]:
+        return [x for x in self.decision_nodes if x.is_prunable()]
+
+    @property
+    def n_leaf_nodes(self) -> int:
+        return len(self._arena.leaf_slots(self._t))
+
+    @property
+    def n_prunable_decision_nodes(self) -> int:
+        return len(self.prunable_decision_nodes)
+
+    def parent(self, node: ArenaNode) -> Optional[ArenaNode]:
+        parent = self._arena.nodes[self._t, node.slot, PARENT]
+        return None if node.slot == 0 or parent < 0 else self._node(parent)
+
+    def leaf_values(self) -> np.ndarray:
+        return self._arena.value[self._t, self._arena.leaf_slots(self._t)]
+
+    def predict(self, X: np.ndarray=None) -> np.ndarray:
+        if X is not None:
+            return self._arena.snapshot(self._t).predict(X)
+        return self._arena.predict_tree(self._t)
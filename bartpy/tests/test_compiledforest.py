@@ -0,0 +1,84 @@
+from operator import le, gt
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bartpy.compiledforest import CompiledForest, flatten_tree
+from bartpy.data import Data, format_covariate_matrix
+from bartpy.mutation import TreeMutation
+from bartpy.node import split_node, LeafNode
+from bartpy.samplers.modelsampler import Chain
+from bartpy.sklearnmodel import SklearnModel
+from bartpy.split import Split, SplitCondition
+from bartpy.tree import Tree, mutate, deep_copy_tree
+
+
+class TestCompiledForest(unittest.TestCase):
+
+    def setUp(self):
+        X = format_covariate_matrix(pd.DataFrame({"a": [1, 2, 3, 4], "b": [4, 3, 2, 1]}))
+        self.X = X
+        data = Data(X, np.array([1, 2, 3, 4]).astype(float))
+        a = split_node(LeafNode(Split(data)), (SplitCondition(0, 2, le), SplitCondition(0, 2, gt)))
+        self.tree = Tree([a, a.left_child, a.right_child])
+        c = split_node(a.right_child, (SplitCondition(1, 1, le), SplitCondition(1, 1, gt)))
+        mutate(self.tree, TreeMutation("grow", a.right_child, c))
+        a.left_child.set_value(1.)
+        c.left_child.set_value(2.)
+        c.right_child.set_value(3.)
+
+        self.stump = Tree([LeafNode(Split(data), value=0.5)])
+
+    def test_flatten_tree(self):
+        feature, threshold, left, right, value = flatten_tree(self.tree)
+        self.assertEqual(len(feature), 5)
+        self.assertEqual(feature[0], 0)
+        self.assertEqual(threshold[0], 2)
+        self.assertListEqual(sorted(value[feature < 0]), [1., 2., 3.])
+
+    def test_matches_tree_prediction(self):
+        forest = CompiledForest([[self.tree, self.stump], [self.stump]])
+        prediction = forest.predict(self.X)
+        self.assertListEqual(list(prediction[0]), list(self.tree.predict(self.X) + 0.5))
+        self.assertListEqual(list(prediction[1]), [0.5] * 4)
+        self.assertListEqual(list(forest.predict_mean(self.X)), list(prediction.mean(axis=0)))
+
+    def test_small_blocks(self):
+        forest = CompiledForest([[self.tree, self.stump], [self.tree]])
+        self.assertListEqual(list(forest.predict(self.X, max_block_size=1).ravel()),
+                             list(forest.predict(self.X).ravel()))
+
+    def test_copied_tree(self):
+        copied = deep_copy_tree(self.tree)
+        forest = CompiledForest([[copied]])
+        for leaf in self.tree.leaf_nodes:
+            leaf.set_value(0.)
+        self.assertListEqual(list(forest.predict(self.X)[0]), [1., 1., 3., 2.])
+
+
+
+class TestFromExtract(unittest.TestCase):
+
+    def test_samples_and_compiled_forests_replaced(self):
+        np.random.seed(0)
+        X, W = np.random.uniform(size=(30, 2)), (np.arange(30) % 2).astype(float)
+        y = X[:, 0] + W * X[:, 1]
+        model = SklearnModel(model="causal_gaussian_mixture", n_trees_g=2, n_trees_h=2, n_chains=1, n_jobs=1,
+                             n_samples=4, n_burn=2, thin=1., random_state=1)
+        model.fit_CGM(X, y, W, np.full(30, 0.5))
+        model._model_samples = model.model_samples_cgm[:2]
+        stale = model.compiled_forest()
+
+        extract = Chain(4, 0, ["in_sample_predictions"], store_acceptance=False)
+        extract.models = list(model.model_samples_cgm)
+        new_model = model.from_extract([extract], X, y)
+        self.assertEqual(4, len(new_model._model_samples))
+        self.assertEqual(2, len(model._model_samples))
+        self.assertIs(stale, model.compiled_forest())
+        self.assertEqual(2, stale.n_samples)
+        self.assertEqual(4, new_model.compiled_forest().n_samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+from operator import le, gt
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bartpy.data import Data, format_covariate_matrix
+from bartpy.model import ModelCGM
+from bartpy.mutation import GrowMutation, PruneMutation
+from bartpy.node import split_node, LeafNode
+from bartpy.samplers.compiled import kernels
+from bartpy.samplers.growfromroot.treemutation import GrowFromRootSampler
+from bartpy.samplers.unconstrainedtree.likihoodratio import UniformTreeMutationLikihoodRatio
+from bartpy.samplers.unconstrainedtree.treemutation import get_tree_sampler
+from bartpy.sigma import Sigma
+from bartpy.sklearnmodel import SklearnModel
+from bartpy.split import Split, SplitCondition
+from bartpy.tree import Tree, mutate
+from bartpy.treearena import TreeArena, LEFT, RIGHT, START, END
+
+
+class TestCompiledKernels(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        X = pd.DataFrame({"a": np.random.randint(0, 10, size=100), "b": np.random.randint(0, 10, size=100)})
+        self.X = X.values.astype(float)
+        W = (np.arange(100) % 2).astype(float)
+        p = np.random.uniform(0.2, 0.8, size=100)
+        self.data = Data(format_covariate_matrix(X), self.X[:, 0] + np.random.normal(size=100), W=W, p=p)
+        self.model = ModelCGM(self.data, Sigma(1., 1., 1.), sigma_g=0.5, sigma_h=0.5, mu_g=0.1, mu_h=0.,
+                              n_trees_g=1, n_trees_h=1, alpha_g=0.95, beta_g=2., alpha_h=0.95, beta_h=2., initializer=None)
+        root = split_node(LeafNode(Split(self.data)), (SplitCondition(0, 4, le), SplitCondition(0, 4, gt)))
+        left = split_node(root.left_child, (SplitCondition(1, 5, le), SplitCondition(1, 5, gt)))
+        self.tree = Tree([root, root.left_child, root.right_child])
+        mutate(self.tree, GrowMutation(root.left_child, left))
+        self.arena = TreeArena.from_trees([self.tree], self.X)
+        self.ratio = UniformTreeMutationLikihoodRatio([0.5, 0.5])
+
+    def statistics(self):
+        nodes, order = self.arena.nodes[0], self.arena.order[0]
+        kernels.leaf_statistics(nodes, self.arena.statistics[0], self.arena.n_slots[0], order, self.data.weights_g.values, self.data.y.values)
+        n_splittable, n_prunable = kernels.tree_counts(nodes, self.arena.n_slots[0], self.X, order)
+        return n_splittable, n_prunable
+
+    def n_variables(self, slot: int) -> int:
+        nodes, order = self.arena.nodes[0], self.arena.order[0]
+        return kernels.splittable_variables(self.X, order, nodes[slot, START], nodes[slot, END], np.zeros(2, dtype=np.int64))
+
+    def test_grow_ratio_matches_python(self):
+        right = self.tree.root.right_child
+        mutation = GrowMutation(right, split_node(right, (SplitCondition(1, 3, le), SplitCondition(1, 3, gt))))
+        expected = self.ratio.log_probability_ratio_cgm_g(self.model, self.tree, mutation)
+
+        n_splittable, n_prunable = self.statistics()
+        slot = self.arena.nodes[0, 0, RIGHT]
+        ratio, left_weights, _ = kernels.log_grow_probability_ratio(self.arena.nodes[0], self.arena.statistics[0], self.X, self.arena.order[0],
+                                                                    slot, 1, 3., self.n_variables(slot), self.data.weights_g.values, self.data.y.values,
+                                                                    1., 0.25, 0.1, 0.95, 2., 0.5, 0.5, n_splittable, n_prunable)
+        self.assertAlmostEqual(expected, ratio)
+        self.assertAlmostEqual(mutation.updated_node.left_child.data.summed_weights_g(), left_weights)
+
+    def test_prune_ratio_matches_python(self):
+        left = self.tree.root.left_child
+        mutation = PruneMutation(left, LeafNode(left.split, depth=left.depth))
+        expected = self.ratio.log_probability_ratio_cgm_g(self.model, self.tree, mutation)
+
+        n_splittable, n_prunable = self.statistics()
+        slot = self.arena.nodes[0, 0, LEFT]
+        ratio = kernels.log_prune_probability_ratio(self.arena.nodes[0], self.arena.threshold[0], self.arena.statistics[0], self.X, self.arena.order[0],
+                                                    slot, self.n_variables(slot), 1., 0.25, 0.1, 0.95, 2., 0.5, 0.5, n_splittable, n_prunable)
+        self.assertAlmostEqual(expected, ratio)
+
+    def test_prune_then_grow_reuses_slots(self):
+        arena = self.arena
+        self.statistics()
+        arena.ensure_capacity()
+        kernels.apply_prune(arena.nodes[0], arena.statistics[0], arena.free[0], arena.n_free, 0, arena.nodes[0, 0, LEFT])
+        self.assertEqual(3, arena.n_nodes(0))
+        self.assertEqual(2, arena.n_free[0])
+
+        slot = arena.nodes[0, 0, RIGHT]
+        kernels.apply_grow(arena.nodes[0], arena.threshold[0], arena.statistics[0], arena.free[0], arena.n_free, arena.n_slots, 0,
+                           self.X, arena.order[0], slot, 1, 3., 0., 0.)
+        arena.versions[0] += 1
+        self.assertEqual(5, arena.n_slots[0])
+        self.assertEqual(5, arena.n_nodes(0))
+        view = arena.view(0)
+        for node in view.decision_nodes:
+            rows = arena.order[0, arena.nodes[0, node.slot, START]:arena.nodes[0, node.slot, END]]
+            left, right = node.left_child, node.right_child
+            self.assertEqual(node, view.parent(left))
+            self.assertEqual(node, view.parent(right))
+            self.assertTrue(np.all(self.X[rows[:left.n_obsv], node.left_child.split.splitting_variable] <= left.split.splitting_value))
+            self.assertTrue(np.all(self.X[rows[left.n_obsv:], node.right_child.split.splitting_variable] > right.split.splitting_value))
+        self.assertEqual(3, arena.snapshot(0).structure.n_leaves)
+
+
+class TestNumbaBackend(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.X = np.random.uniform(size=(50, 2))
+        self.W = (np.arange(50) % 2).astype(float)
+        self.y = self.X[:, 0] + self.W * self.X[:, 1] + np.random.normal(scale=0.1, size=50)
+
+    def fit(self, **kwargs) -> SklearnModel:
+        model = SklearnModel(model="causal_gaussian_mixture", n_trees_g=3, n_trees_h=3, n_chains=1, n_jobs=1,
+                             n_samples=10, n_burn=5, thin=1., store_in_sample_predictions=True, backend="numba", **kwargs)
+        model.fit_CGM(self.X, self.y, self.W, np.full(50, 0.5))
+        return model
+
+    def test_fit(self):
+        model = self.fit(random_state=1)
+        self.assertEqual(10, len(model.model_samples_cgm))
+        np.testing.assert_array_almost_equal(model.predict_CATE(self.X), model.predict_CATE())
+
+    def test_reproducible(self):
+        first, second = self.fit(random_state=1), self.fit(random_state=1)
+        np.testing.assert_array_equal(first.predict_CATE(self.X), second.predict_CATE(self.X))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            SklearnModel(model="causal_gaussian_mixture", backend="fortran")
+
+    def test_tree_sampler_probabilities_kept(self):
+        model = SklearnModel(model="causal_gaussian_mixture", tree_sampler=get_tree_sampler(0.75, 0.25), backend="numba")
+        self.assertAlmostEqual(0.75, model.sampler.p_grow)
+        self.assertAlmostEqual(0.25, model.sampler.p_prune)
+
+    def test_other_tree_samplers_rejected(self):
+        for tree_sampler in [get_tree_sampler(0.25, 0.25, 0.25, 0.25), GrowFromRootSampler()]:
+            with self.assertRaises(ValueError):
+                SklearnModel(model="causal_gaussian_mixture", tree_sampler=tree_sampler, backend="numba")
+
+    def test_same_posterior_as_python(self):
+        posteriors = []
+        for backend in ["python", "numba"]:
+            model = SklearnModel(model="causal_gaussian_mixture", n_trees_g=3, n_trees_h=3, n_chains=2, n_jobs=1,
+                                 n_samples=1000, n_burn=50, thin=1., backend=backend, random_state=1)
+            model.fit_CGM(self.X, self.y, self.W, np.full(50, 0.5))
+            samples = model.model_samples_cgm
+            posteriors.append([np.mean([x.sigma.current_value() for x in samples]),
+                               np.mean([tree.structure.n_leaves for x in samples for tree in x.trees])])
+        np.testing.assert_allclose(posteriors[0], posteriors[1], rtol=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ import unittest
 import pandas as pd
 import numpy as np
 
-from bartpy.data import CovariateMatrix, Data, Target, is_not_constant, format_covariate_matrix
+from bartpy.data import CovariateMatrix, Data, Target, is_not_constant, format_covariate_matrix, quantile_cutpoints, bin_covariate_matrix
 from bartpy.errors import NoSplittableVariableException
 
 
@@ -57,6 +57,30 @@ class TestTargetCaching(unittest.TestCase):
         self.assertListEqual(list(self.y.values), list(updated_y))
 
 
+class TestSharedCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.data = Data(format_covariate_matrix(np.arange(10).reshape(5, 2)), np.array([1., 2., 3., 4., 5.]),
+                         W=np.array([1., 0., 1., 0., 1.]), p=np.full(5, 0.5))
+
+    def test_shares_all_but_target(self):
+        copied = self.data.shared_copy()
+        self.assertIs(copied.X, self.data.X)
+        self.assertIs(copied.W, self.data.W)
+        self.assertIs(copied.weights_g, self.data.weights_g)
+        self.assertIsNot(copied.y.shared, self.data.y.shared)
+        self.assertEqual(15., copied.summed_y())
+
+    def test_targets_independent(self):
+        copied = self.data.shared_copy()
+        self.data.summed_y_tilde_g()
+        copied.update_y(np.zeros(5))
+        self.assertEqual(0., copied.summed_y())
+        self.assertEqual(0., copied.summed_y_tilde_g())
+        self.assertEqual(15., self.data.summed_y())
+        self.assertListEqual([1., 2., 3., 4., 5.], list(self.data.y.values))
+
+
 class TestMasking(unittest.TestCase):
 
     def setUp(self):
@@ -89,6 +113,17 @@ class TestMasking(unittest.TestCase):
         self.assertEqual(updated_data.X._n_obsv, 2)
         self.assertEqual(updated_data.y.summed_y(), 7)
 
+    def test_updating_idx(self):
+        from bartpy.splitcondition import SplitCondition
+        from operator import gt
+        s = SplitCondition(0, 3, gt)
+        updated_data = self.data + s
+
+        self.assertListEqual(list(self.data.idx), [2, 3, 4])
+        self.assertListEqual(list(updated_data.idx), [3, 4])
+        self.assertListEqual(list(updated_data.X.get_column(0)), [4, 5])
+        self.assertEqual(updated_data.y.summed_y(), 9)
+
 
 class TestCovariateMatrix(unittest.TestCase):
 
@@ -134,6 +169,74 @@ class TestCovariateMatrix(unittest.TestCase):
     def test_variables(self):
         self.assertEqual(self.X.variables, [0, 1, 2])
 
+    def test_random_splittable_value_skewed_column(self):
+        X = CovariateMatrix(np.array([[1.]] + [[2.]] * 999), mask=None, n_obsv=1000, unique_columns=None, splittable_variables=None)
+        for _ in range(100):
+            self.assertEqual(X.random_splittable_value(0), 1.)
+        self.assertEqual(X.proportion_of_value_in_variable(0, 2.), 0.999)
+        self.assertFalse(X.is_column_unique(0))
+
+    def test_splittable_inherited_by_split(self):
+        from bartpy.splitcondition import SplitCondition
+        from operator import gt
+        data = Data(self.X.values, np.array([1., 2., 3., 4., 5.]))
+        self.assertListEqual(list(data.X.splittable_mask), [True, False, True])
+        right = data + SplitCondition(0, 3, gt)
+        self.assertListEqual(list(right.X.splittable_mask), [True, False, True])
+        self.assertEqual(right.X.max_value_of_column(2), 4)
+        last = right + SplitCondition(0, 4, gt)
+        self.assertListEqual(list(last.X.splittable_mask), [False, False, False])
+
+
+class TestPresortedPartitions(unittest.TestCase):
+
+    def setUp(self):
+        from bartpy.splitcondition import SplitCondition
+        from operator import le
+        rng = np.random.RandomState(0)
+        X = np.column_stack([rng.randint(0, 5, size=50), rng.normal(size=50)])
+        self.data = Data(X, rng.normal(size=50))
+        self.child = self.data + SplitCondition(1, 0., le)
+
+    def test_child_rows_stay_sorted(self):
+        idx = self.child.idx
+        for i in range(2):
+            expected = idx[np.argsort(self.child.X.values[idx, i], kind="stable")]
+            self.assertListEqual(list(self.child.X.sorted_idx(i)), list(expected))
+
+    def test_sorted_column_read_from_sorted_rows(self):
+        for i in range(2):
+            np.testing.assert_array_equal(self.child.X.sorted_column(i), np.sort(self.child.X.get_column(i)))
+
+    def test_cumulative_statistics(self):
+        x, y = self.child.X.get_column(0), self.child.y.values[self.child.idx]
+        splitting_values, n_left, summed_y_left = self.child.cumulative_statistics(0)
+        self.assertListEqual(list(splitting_values), list(np.unique(x)[:-1]))
+        for value, n, summed_y in zip(splitting_values, n_left, summed_y_left):
+            self.assertEqual(n, np.sum(x <= value))
+            self.assertAlmostEqual(summed_y, np.sum(y[x <= value]))
+
+
+class TestQuantileCutpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.X = np.column_stack([np.arange(1000.), np.repeat([0., 1., 2.], [500, 250, 250])])
+
+    def test_at_most_numcut(self):
+        cutpoints = quantile_cutpoints(self.X, 10)
+        self.assertEqual(len(cutpoints[0]), 10)
+        self.assertListEqual(list(cutpoints[1]), [0., 1.])
+
+    def test_codes_split_like_cutpoints(self):
+        cutpoints = quantile_cutpoints(self.X, 10)
+        codes = bin_covariate_matrix(self.X, cutpoints)
+        self.assertEqual(codes.dtype, np.uint8)
+        for k, cutpoint in enumerate(cutpoints[0]):
+            np.testing.assert_array_equal(codes[:, 0] <= k, self.X[:, 0] <= cutpoint)
+
+    def test_wide_grid_uses_uint16(self):
+        self.assertEqual(bin_covariate_matrix(self.X, quantile_cutpoints(self.X, 500)).dtype, np.uint16)
+
 
 if __name__ == '__main__':
     unittest.main()
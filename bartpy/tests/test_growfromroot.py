@@ -0,0 +1,70 @@
+from operator import le, gt
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bartpy.data import Data, format_covariate_matrix
+from bartpy.model import Model
+from bartpy.mutation import GrowMutation
+from bartpy.node import split_node, LeafNode
+from bartpy.samplers.growfromroot.likihood import split_candidates
+from bartpy.samplers.growfromroot.treemutation import GrowFromRootSampler, prune_to_root
+from bartpy.sigma import Sigma
+from bartpy.split import Split, SplitCondition
+from bartpy.tree import Tree, mutate
+
+
+class TestSplitCandidates(unittest.TestCase):
+
+    def test_matches_built_children(self):
+        X = format_covariate_matrix(pd.DataFrame({"a": [3, 1, 2, 2, 5], "b": [1, 1, 1, 1, 1], "c": [4, 3, 2, 1, 0]}))
+        data = Data(X, np.array([1., 2., 3., 4., 5.]))
+        variables, values, left, right = split_candidates(data)
+        self.assertListEqual(list(variables), [0, 0, 0, 2, 2, 2, 2])
+        self.assertListEqual(list(values), [1, 2, 3, 0, 1, 2, 3])
+        for i, (variable, value) in enumerate(zip(variables, values)):
+            node = split_node(LeafNode(Split(data)), (SplitCondition(variable, value, le), SplitCondition(variable, value, gt)))
+            self.assertEqual(left.n_obsv[i], node.left_child.data.n_obsv)
+            self.assertEqual(right.n_obsv[i], node.right_child.data.n_obsv)
+            self.assertAlmostEqual(left.summed_y()[i], node.left_child.data.summed_y())
+            self.assertAlmostEqual(right.summed_y()[i], node.right_child.data.summed_y())
+
+
+class TestGrowFromRootSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.X = format_covariate_matrix(pd.DataFrame({"a": np.arange(40) % 8, "b": np.arange(40)}))
+        data = Data(self.X, np.where(np.arange(40) % 8 < 4, -1., 1.))
+        self.model = Model(data, Sigma(1., 1., 1.), n_trees=1, initializer=None)
+        self.model.sigma.set_value(0.1)
+        self.tree = Tree([LeafNode(Split(data))])
+
+    def test_regrows_from_root(self):
+        np.random.seed(0)
+        tree = self.tree
+        node = tree.root
+        mutate(tree, GrowMutation(node, split_conditions=(SplitCondition(1, 20, le), SplitCondition(1, 20, gt))))
+        GrowFromRootSampler().step(self.model, tree)
+
+        condition = tree.root.left_child.split.most_recent_split_condition()
+        self.assertEqual((condition.splitting_variable, condition.splitting_value), (0, 3))
+        self.assertIsNone(tree.parent(tree.root))
+        self.assertEqual(len(tree.nodes), len(tree.leaf_nodes) + len(tree.decision_nodes))
+        for leaf in tree.leaf_nodes:
+            self.assertTrue(np.all(tree.leaf_ids[leaf.split.condition()] == tree.leaf_slot(leaf)))
+
+    def test_prune_to_root(self):
+        tree = self.tree
+        mutate(tree, GrowMutation(tree.root, split_conditions=(SplitCondition(1, 20, le), SplitCondition(1, 20, gt))))
+        left = tree.root.left_child
+        mutate(tree, GrowMutation(left, split_conditions=(SplitCondition(0, 3, le), SplitCondition(0, 3, gt))))
+        prune_to_root(tree)
+        self.assertEqual(1, len(tree.nodes))
+        self.assertIs(tree.root, tree.leaf_nodes[0])
+        self.assertEqual(0, tree.root.depth)
+        self.assertListEqual([0] * 40, list(tree.leaf_ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from operator import le, gt
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bartpy.data import Data, format_covariate_matrix
+from bartpy.model import Model
+from bartpy.node import split_node, LeafNode
+from bartpy.samplers.leafnode import LeafNodeSampler
+from bartpy.samplers.scalar import DiscreteSampler, NormalScalarSampler
+from bartpy.sigma import Sigma
+from bartpy.split import Split, SplitCondition
+from bartpy.tree import Tree
+
+
+class TestTreeLeafSampling(unittest.TestCase):
+
+    def setUp(self):
+        X = format_covariate_matrix(pd.DataFrame({"a": [1, 2, 3, 4, 5]}))
+        data = Data(X, np.array([1., 2., 3., 4., 5.]))
+        self.model = Model(data, Sigma(1., 1., 1.), n_trees=2, initializer=None)
+        a = split_node(LeafNode(Split(data)), (SplitCondition(0, 2, le), SplitCondition(0, 2, gt)))
+        self.tree = Tree([a, a.left_child, a.right_child])
+
+    def test_same_as_one_leaf_at_a_time(self):
+        np.random.seed(0)
+        sampler = LeafNodeSampler(NormalScalarSampler(3))
+        expected = [sampler.sample(self.model, leaf) for leaf in self.tree.leaf_nodes]
+
+        np.random.seed(0)
+        sampler = LeafNodeSampler(NormalScalarSampler(3))
+        sampled = sampler.step_tree(self.model, self.tree)
+        np.testing.assert_allclose(sampled, expected)
+        self.assertListEqual(list(sampled), [leaf.current_value for leaf in self.tree.leaf_nodes])
+
+
+class TestNormalScalarSampler(unittest.TestCase):
+
+    def test_batch_matches_single_draws(self):
+        np.random.seed(0)
+        sampler = NormalScalarSampler(4)
+        expected = [sampler.sample() for _ in range(10)]
+        np.random.seed(0)
+        sampler = NormalScalarSampler(4)
+        self.assertListEqual(expected, list(sampler.sample_batch(3)) + list(sampler.sample_batch(7)))
+
+    def test_generator(self):
+        sampler = NormalScalarSampler(4, np.random.default_rng(0))
+        expected = list(np.random.default_rng(0).standard_normal(size=8))
+        self.assertListEqual(expected, [sampler.sample() for _ in range(8)])
+
+        sampler.set_generator(np.random.default_rng(0))
+        self.assertListEqual(expected[:6], list(sampler.sample_batch(6)))
+
+
+class TestDiscreteSampler(unittest.TestCase):
+
+    def test_values(self):
+        values = [len, sum]
+        sampler = DiscreteSampler(values, [0.25, 0.75], cache_size=10, generator=np.random.default_rng(0))
+        draws = [sampler.sample() for _ in range(1000)]
+        self.assertTrue(all(x in values for x in draws))
+        self.assertAlmostEqual(0.75, draws.count(sum) / 1000., delta=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
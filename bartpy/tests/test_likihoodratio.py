@@ -0,0 +1,41 @@
+from operator import le, gt
+import unittest
+
+import numpy as np
+import pandas as pd
+from scipy.stats import multivariate_normal
+
+from bartpy.data import Data, format_covariate_matrix
+from bartpy.node import split_node, LeafNode
+from bartpy.samplers.unconstrainedtree.likihoodratio import log_grow_ratio
+from bartpy.sigma import Sigma
+from bartpy.split import Split
+from bartpy.splitcondition import SplitCondition
+
+
+def log_marginal_likihood(y: np.ndarray, var: float, var_mu: float) -> float:
+    # y = mu + e, with mu ~ N(0, var_mu) shared by the leaf and e ~ N(0, var) per row
+    covariance = var * np.eye(len(y)) + var_mu * np.ones((len(y), len(y)))
+    return multivariate_normal(np.zeros(len(y)), covariance).logpdf(y)
+
+
+class TestLogGrowRatio(unittest.TestCase):
+
+    def setUp(self):
+        X = format_covariate_matrix(pd.DataFrame({"a": [1, 2, 3, 4, 5, 6, 7]}))
+        self.y = np.array([0.3, -0.2, 0.5, 1.4, 1.1, 0.9, 1.6])
+        self.root = split_node(LeafNode(Split(Data(X, self.y))), (SplitCondition(0, 3, le), SplitCondition(0, 3, gt)))
+        self.sigma = Sigma(1., 1., 1.)
+        self.sigma.set_value(0.7)
+
+    def test_matches_explicit_marginal_likihoods(self):
+        var, sigma_mu = 0.7 ** 2, 0.4
+        expected = (log_marginal_likihood(self.y[:3], var, sigma_mu ** 2)
+                     + log_marginal_likihood(self.y[3:], var, sigma_mu ** 2)
+                     - log_marginal_likihood(self.y, var, sigma_mu ** 2))
+        ratio = log_grow_ratio(self.root.data, self.root.left_child.data, self.root.right_child.data, self.sigma, sigma_mu)
+        self.assertAlmostEqual(expected, ratio)
+
+
+if __name__ == '__main__':
+    unittest.main()
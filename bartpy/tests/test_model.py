@@ -5,10 +5,13 @@ import pandas as pd
 import numpy as np
 
 from bartpy.data import Data, format_covariate_matrix
+from bartpy.initializers.growfromrootinitializer import GrowFromRootInitializer
+from bartpy.initializers.sklearntreeinitializer import SklearnTreeInitializer
 from bartpy.model import Model
 from bartpy.mutation import GrowMutation, PruneMutation
 from bartpy.node import DecisionNode, LeafNode, split_node
 from bartpy.sigma import Sigma
+from bartpy.sklearnmodel import SklearnModel
 from bartpy.split import Split
 from bartpy.splitcondition import SplitCondition
 
@@ -33,6 +36,87 @@ class TestSplitModel(unittest.TestCase):
         for tree in self.model.trees:
             self.assertEqual(len(tree.nodes), 1)
 
+    def test_running_prediction(self):
+        for tree in self.model.refreshed_trees():
+            tree.leaf_nodes[0].set_value(1.)
+            tree.cache_up_to_date = False
+            self.assertListEqual(list(self.model.predict()), list(self.model._exact_predict()))
+        self.assertListEqual(list(self.model.predict()), [2.] * 5)
+
+
+class TestInitializers(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.X = np.random.uniform(size=(50, 2))
+        self.W = (np.arange(50) % 2).astype(float)
+        self.y = np.where(self.X[:, 0] > 0.5, 1., 0.) + np.random.normal(scale=0.05, size=50)
+
+    def test_sklearn_tree_initializer(self):
+        data = Data(format_covariate_matrix(self.X), self.y)
+        model = Model(data, Sigma(1., 1., 1.), n_trees=2, initializer=SklearnTreeInitializer(max_depth=1))
+        tree = model.trees[0]
+        self.assertEqual(3, len(tree.nodes))
+        condition = tree.root.left_child.split.most_recent_split_condition()
+        self.assertEqual(0, condition.splitting_variable)
+        self.assertIn(condition.splitting_value, self.X[:, 0])
+        np.testing.assert_allclose(model.predict(), model._exact_predict())
+        self.assertLess(np.mean(np.square(model.predict() - self.y)), 0.01)
+
+    def test_grow_from_root_initializer_cgm(self):
+        model = SklearnModel(model="causal_gaussian_mixture", n_trees_g=3, n_trees_h=3, n_chains=1, n_jobs=1,
+                             n_samples=2, n_burn=0, initializer=GrowFromRootInitializer(n_sweeps=1))
+        model.fit_CGM(self.X, self.y, self.W, np.full(50, 0.5))
+        self.assertGreater(sum(len(tree.nodes) for tree in model.model.trees_g), 3)
+        self.assertEqual(50, len(model.predict_CATE(self.X)))
+
+
+class TestRandomState(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.X = np.random.uniform(size=(50, 2))
+        self.W = (np.arange(50) % 2).astype(float)
+        self.y = self.X[:, 0] + self.W * self.X[:, 1] + np.random.normal(scale=0.1, size=50)
+
+    def fit(self, **kwargs) -> np.ndarray:
+        model = SklearnModel(model="causal_gaussian_mixture", n_trees_g=3, n_trees_h=3, n_chains=2, n_jobs=1,
+                             n_samples=10, n_burn=5, thin=1., **kwargs)
+        np.random.seed(None)
+        model.fit_CGM(self.X, self.y, self.W, np.full(50, 0.5))
+        return np.array([x.sigma.current_value() for x in model.model_samples_cgm])
+
+    def test_reproducible(self):
+        np.testing.assert_array_equal(self.fit(random_state=1), self.fit(random_state=1))
+
+    def test_reproducible_with_initializer(self):
+        for initializer in [GrowFromRootInitializer(n_sweeps=2), SklearnTreeInitializer()]:
+            np.testing.assert_array_equal(self.fit(random_state=1, initializer=initializer),
+                                          self.fit(random_state=1, initializer=initializer))
+
+    def test_chains_independent(self):
+        sigmas = self.fit(random_state=1)
+        self.assertFalse(np.array_equal(sigmas[:10], sigmas[10:]))
+
+    def test_estimator_and_global_state_untouched(self):
+        model = SklearnModel(model="causal_gaussian_mixture", n_trees_g=3, n_trees_h=3, n_chains=2, n_jobs=1,
+                             n_samples=10, n_burn=5, thin=1., random_state=1)
+        np.random.seed(7)
+        expected = np.random.get_state()[1].copy()
+        np.random.seed(7)
+        model.fit_CGM(self.X, self.y, self.W, np.full(50, 0.5))
+        np.testing.assert_array_equal(expected, np.random.get_state()[1])
+        self.assertIsNone(model.sampler.schedule.sigma_sampler._generator)
+        self.assertIsNone(model.tree_sampler.proposer._generator)
+
+        model.random_state = None
+        cates = []
+        for _ in range(2):
+            np.random.seed(7)
+            model.fit_CGM(self.X, self.y, self.W, np.full(50, 0.5))
+            cates.append(model.predict_CATE(self.X))
+        np.testing.assert_array_equal(cates[0], cates[1])
+
 
 if __name__ == '__main__':
     unittest.main()
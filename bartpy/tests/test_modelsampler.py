@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+
+from bartpy.samplers.modelsampler import Chain, stored_iterations
+
+
+class TestChain(unittest.TestCase):
+
+    def setUp(self):
+        self.chain = Chain(2, 3, ["in_sample_predictions"])
+        self.chain.record(0, {"in_sample_predictions": np.array([1., 2., 3.])}, 0.5, (np.array([1., 0.]), np.array([2., 0.])))
+        self.chain.record(1, {"in_sample_predictions": np.array([4., 5., 6.])}, 0.25, (np.array([0., 0.]), np.array([2., 0.])))
+        self.chain.models.extend(["a", "b"])
+
+    def test_record(self):
+        self.assertListEqual([[1., 2., 3.], [4., 5., 6.]], self.chain["in_sample_predictions"].tolist())
+        self.assertListEqual([0.5, 0.25], list(self.chain["sigma"]))
+        self.assertListEqual([{"Tree": 0.5}, {"Tree": 0.}], self.chain["acceptance"])
+
+    def test_single_buffer(self):
+        self.assertIs(self.chain["in_sample_predictions"].base, self.chain.values)
+
+    def test_concatenate(self):
+        combined = Chain.concatenate([self.chain, self.chain])
+        self.assertEqual((4, 3), combined["in_sample_predictions"].shape)
+        self.assertListEqual(["a", "b", "a", "b"], combined["model"])
+        self.assertListEqual([0.5, 0.25, 0.5, 0.25], list(combined["sigma"]))
+
+    def test_acceptance_not_stored(self):
+        chain = Chain(2, 0, ["in_sample_predictions"], store_acceptance=False)
+        self.assertListEqual([], chain["acceptance"])
+        self.assertEqual((2, 0), chain["in_sample_predictions"].shape)
+
+
+class TestStoredIterations(unittest.TestCase):
+
+    def test_thinning(self):
+        self.assertListEqual([0, 4, 8], stored_iterations(10, 0.25))
+        self.assertListEqual(list(range(5)), stored_iterations(5, 1.))
+
+
+if __name__ == '__main__':
+    unittest.main()
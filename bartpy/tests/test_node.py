@@ -71,5 +71,38 @@ class TestSplitNode(unittest.TestCase):
         self.assertEqual(updated_node.left_child.data.y.summed_y(), 12)
 
 
+class TestSplitNodeCGM(unittest.TestCase):
+
+    def setUp(self):
+        self.X = format_covariate_matrix(pd.DataFrame({"a": [1, 2, 3, 4, 5]}))
+        self.y = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+        self.W = np.array([1, 0, 1, 0, 1])
+        self.p = np.array([0.5, 0.25, 0.5, 0.75, 0.5])
+        self.data = Data(self.X, self.y, W=self.W, p=self.p)
+        self.node = LeafNode(Split(self.data))
+
+    def test_weighted_sums(self):
+        w_g = 1. / (self.W / self.p ** 2 + (1 - self.W) / (1 - self.p) ** 2)
+        w_h = self.p ** 2 * (1 - self.p) ** 2
+        self.assertAlmostEqual(self.node.data.summed_weights_g(), np.sum(w_g))
+        self.assertAlmostEqual(self.node.data.summed_weights_h(), np.sum(w_h))
+        self.assertAlmostEqual(self.node.data.summed_y_tilde_g(), np.sum(w_g * self.y))
+        self.assertAlmostEqual(self.node.data.summed_y_tilde_h(), np.sum(w_h * self.y))
+
+    def test_split_carries_weighted_sums(self):
+        w_g = 1. / (self.W / self.p ** 2 + (1 - self.W) / (1 - self.p) ** 2)
+        self.node.data.summed_weights_g()
+        self.node.data.summed_y_tilde_g()
+
+        right_split_condition = SplitCondition(0, 3, gt)
+        updated_node = split_node(self.node, [SplitCondition(0, 3, le), right_split_condition])
+        self.assertAlmostEqual(right_split_condition.carry_weights_g_sum, np.sum(w_g[3:]))
+        self.assertAlmostEqual(right_split_condition.carry_y_tilde_g_sum, np.sum(w_g[3:] * self.y[3:]))
+        self.assertAlmostEqual(updated_node.right_child.data.summed_y_tilde_g(), np.sum(w_g[3:] * self.y[3:]))
+
+        updated_node.update_y(self.y * 2)
+        self.assertAlmostEqual(updated_node.right_child.data.summed_y_tilde_g(), np.sum(w_g[3:] * self.y[3:] * 2))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,15 @@
+from operator import le, gt
 import unittest
 
 from bartpy.data import make_bartpy_data
-from bartpy.samplers.unconstrainedtree.proposer import uniformly_sample_grow_mutation, uniformly_sample_prune_mutation
-from bartpy.split import Split
-from bartpy.tree import LeafNode, Tree, DecisionNode
+from bartpy.model import Model
+from bartpy.mutation import ChangeMutation, GrowMutation, SwapMutation
+from bartpy.node import rebuild_node, split_node
+from bartpy.samplers.unconstrainedtree.likihoodratio import UniformTreeMutationLikihoodRatio, log_grow_ratio, log_leaf_likihood
+from bartpy.samplers.unconstrainedtree.proposer import uniformly_sample_grow_mutation, uniformly_sample_prune_mutation, uniformly_sample_swap_mutation
+from bartpy.sigma import Sigma
+from bartpy.split import Split, SplitCondition
+from bartpy.tree import LeafNode, Tree, DecisionNode, mutate
 
 import pandas as pd
 import numpy as np
@@ -54,6 +60,80 @@ class TestGrowTreeMutationProposer(unittest.TestCase):
         self.assertIsInstance(proposal.updated_node.right_child, LeafNode)
         self.assertIsInstance(proposal.existing_node, LeafNode)
 
+    def test_children_only_built_when_accessed(self):
+        proposal = uniformly_sample_grow_mutation(self.tree)
+        self.assertFalse(proposal.is_materialized)
+        left, right = proposal.child_statistics()
+        n_obsv, summed_y = (left.n_obsv, right.n_obsv), (left.summed_y(), right.summed_y())
+        self.assertFalse(proposal.is_materialized)
+
+        updated_node = proposal.updated_node
+        self.assertTrue(proposal.is_materialized)
+        self.assertEqual(proposal.split_condition, updated_node.most_recent_split_condition())
+        self.assertEqual(n_obsv, (updated_node.left_child.data.X.n_obsv, updated_node.right_child.data.X.n_obsv))
+        y, goes_left = self.data.y.values, self.data.X.values[:, 0] <= proposal.split_condition.splitting_value
+        np.testing.assert_allclose(summed_y, (np.sum(y[goes_left]), np.sum(y[~goes_left])))
+
+
+class TestChangeAndSwapMutations(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        X = pd.DataFrame({"a": np.random.randint(0, 10, size=100), "b": np.random.randint(0, 10, size=100)})
+        self.data = make_bartpy_data(X, X.values[:, 0] + np.random.normal(size=100), normalize=False)
+        self.model = Model(self.data, Sigma(1., 1., 1.), n_trees=1, initializer=None)
+        root = split_node(LeafNode(Split(self.data)), (SplitCondition(0, 4, le), SplitCondition(0, 4, gt)))
+        left = split_node(root.left_child, (SplitCondition(1, 5, le), SplitCondition(1, 5, gt)))
+        self.tree = Tree([root, root.left_child, root.right_child])
+        mutate(self.tree, GrowMutation(root.left_child, left))
+        self.ratio = UniformTreeMutationLikihoodRatio([0.25, 0.25, 0.25, 0.25])
+
+    def assert_consistent(self):
+        for node in self.tree.nodes:
+            if node is not self.tree.root:
+                self.assertIn(self.tree.parent(node), self.tree.decision_nodes)
+        for leaf in self.tree.leaf_nodes:
+            self.assertTrue(np.all(self.tree.leaf_ids[leaf.split.condition()] == self.tree.leaf_slot(leaf)))
+        self.assertEqual(100, sum(leaf.data.n_obsv for leaf in self.tree.leaf_nodes))
+
+    def test_leaf_likihood_matches_grow_ratio(self):
+        root = self.tree.root
+        expected = log_grow_ratio(root.data, root.left_child.data, root.right_child.data, self.model.sigma, 0.5)
+        leaves = [log_leaf_likihood(x.data, self.model.sigma, 0.5) for x in [root.left_child, root.right_child, root]]
+        self.assertAlmostEqual(expected, leaves[0] + leaves[1] - leaves[2])
+
+    def test_change_is_reversible(self):
+        root = self.tree.root
+        old_conditions = (SplitCondition(0, 4, le), SplitCondition(0, 4, gt))
+        change = ChangeMutation(root, rebuild_node(root, root.split, {root: (SplitCondition(0, 6, le), SplitCondition(0, 6, gt))}))
+        forward = self.ratio.log_probability_ratio(self.model, self.tree, change)
+        mutate(self.tree, change)
+        self.assert_consistent()
+        self.assertEqual(6, self.tree.root.most_recent_split_condition().splitting_value)
+
+        root = self.tree.root
+        reverse = ChangeMutation(root, rebuild_node(root, root.split, {root: old_conditions}))
+        self.assertAlmostEqual(0., forward + self.ratio.log_probability_ratio(self.model, self.tree, reverse))
+
+    def test_swap_is_reversible(self):
+        self.assertIsInstance(uniformly_sample_swap_mutation(self.tree), SwapMutation)
+        root, child = self.tree.root, self.tree.root.left_child
+        swap = SwapMutation(root, rebuild_node(root, root.split, {root: (SplitCondition(1, 5, le), SplitCondition(1, 5, gt)),
+                                                                  child: (SplitCondition(0, 4, le), SplitCondition(0, 4, gt))}))
+        forward = self.ratio.log_probability_ratio(self.model, self.tree, swap)
+        mutate(self.tree, swap)
+        self.assert_consistent()
+        self.assertEqual(1, self.tree.root.most_recent_split_condition().splitting_variable)
+
+        reverse = uniformly_sample_swap_mutation(self.tree)
+        self.assertAlmostEqual(0., forward + self.ratio.log_probability_ratio(self.model, self.tree, reverse))
+
+    def test_empty_node_rejected(self):
+        root = self.tree.root
+        change = ChangeMutation(root, rebuild_node(root, root.split, {root: (SplitCondition(0, 9, le), SplitCondition(0, 9, gt))}))
+        self.assertIsNone(change.updated_node)
+        self.assertEqual(-np.inf, self.ratio.log_probability_ratio(self.model, self.tree, change))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,64 @@
+from operator import le, gt
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bartpy.data import Data, format_covariate_matrix
+from bartpy.node import split_node, LeafNode
+from bartpy.mutation import TreeMutation
+from bartpy.snapshot import TreeStructureCache, snapshot_tree
+from bartpy.split import Split, SplitCondition
+from bartpy.tree import Tree, mutate
+
+
+class TestTreeSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.X = format_covariate_matrix(pd.DataFrame({"a": [1, 2, 3, 4], "b": [4, 3, 2, 1]}))
+        data = Data(self.X, np.array([1, 2, 3, 4]).astype(float))
+        a = split_node(LeafNode(Split(data)), (SplitCondition(0, 2, le), SplitCondition(0, 2, gt)))
+        a.left_child.set_value(1.)
+        a.right_child.set_value(2.)
+        self.tree = Tree([a, a.left_child, a.right_child])
+
+    def test_same_prediction(self):
+        snapshot = snapshot_tree(self.tree)
+        self.assertListEqual(list(snapshot.predict(self.X)), list(self.tree.predict(self.X)))
+
+    def test_unaffected_by_later_changes(self):
+        snapshot = snapshot_tree(self.tree)
+        for leaf in self.tree.leaf_nodes:
+            leaf.set_value(0.)
+        self.assertListEqual(list(snapshot.predict(self.X)), [1., 1., 2., 2.])
+
+    def test_nodes(self):
+        nodes = snapshot_tree(self.tree).nodes
+        self.assertListEqual(sorted([x.depth for x in nodes]), [0, 1, 1])
+        self.assertListEqual([x.split.splitting_variable for x in nodes], [None, 0, 0])
+
+    def test_no_reference_to_data(self):
+        snapshot = snapshot_tree(self.tree)
+        self.assertLess(len(pickle.dumps(snapshot)), len(pickle.dumps(self.tree)))
+        self.assertNotIn(b"Data", pickle.dumps(snapshot))
+
+    def test_structure_shared_until_mutated(self):
+        cache = TreeStructureCache()
+        first = snapshot_tree(self.tree, cache)
+        self.tree.leaf_nodes[0].set_value(5.)
+        second = snapshot_tree(self.tree, cache)
+        self.assertIs(first.structure, second.structure)
+        self.assertNotEqual(list(first.leaf_values), list(second.leaf_values))
+
+        right = self.tree.nodes[2]
+        c = split_node(right, (SplitCondition(1, 1, le), SplitCondition(1, 1, gt)))
+        mutate(self.tree, TreeMutation("grow", right, c))
+        third = snapshot_tree(self.tree, cache)
+        self.assertIsNot(first.structure, third.structure)
+        self.assertEqual(third.structure.n_leaves, 3)
+        self.assertEqual(first.structure.n_leaves, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -53,7 +53,7 @@ class TestCombinedCondition(unittest.TestCase):
 
     def test_single_condition(self):
         condition = SplitCondition(0, 3, gt)
-        combined_condition = CombinedCondition([0], [condition])
+        combined_condition = CombinedCondition([condition])
         self.assertListEqual(list(combined_condition.condition(self.X)), [False, False, True, True, False, True])
 
     def test_multiple_conditions(self):
@@ -62,7 +62,7 @@ class TestCombinedCondition(unittest.TestCase):
             SplitCondition(0, 5, le)
         ]
 
-        combined_condition = CombinedCondition([0], conditions)
+        combined_condition = CombinedCondition(conditions)
         self.assertEqual(combined_condition.variables[0].min_value, 2)
         self.assertEqual(combined_condition.variables[0].max_value, 5)
         self.assertListEqual(list(combined_condition.condition(self.X)), [False, False, True, False, True, True])
@@ -74,9 +74,23 @@ class TestCombinedCondition(unittest.TestCase):
         ]
 
         X = self.X[:, 0].reshape(3, 2)
-        combined_condition = CombinedCondition([0, 1], conditions)
+        combined_condition = CombinedCondition(conditions)
         self.assertListEqual(list(combined_condition.condition(X)), [False, True, True])
 
+    def test_only_constrained_variables_held(self):
+        X = np.arange(30).reshape(6, 5)
+        combined_condition = CombinedCondition([])
+        self.assertDictEqual(combined_condition.variables, {})
+        self.assertListEqual(list(combined_condition.condition(X)), [True] * 6)
+        for condition in [SplitCondition(3, 5, gt), SplitCondition(1, 21, le), SplitCondition(3, 12, gt)]:
+            combined_condition = combined_condition + condition
+        self.assertListEqual(sorted(combined_condition.variables), [1, 3])
+        self.assertEqual(combined_condition.variables[3].min_value, 12)
+        self.assertEqual(combined_condition.splitting_variable, 3)
+        expected = CombinedCondition(combined_condition.conditions)
+        self.assertListEqual(list(combined_condition.condition(X)), list(expected.condition(X)))
+        self.assertListEqual(list(combined_condition.condition(X)), [False, False, True, True, True, False])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -63,6 +63,20 @@ class TestTreeStructureNodeRetrieval(TestCase):
         for node in all_nodes:
             self.assertIn(node, true_all_nodes)
 
+    def test_parent_links(self):
+        self.assertIs(self.tree.root, self.a)
+        self.assertIsNone(self.tree.parent(self.a))
+        self.assertIs(self.tree.parent(self.c), self.a)
+        self.assertIs(self.tree.parent(self.d), self.c)
+
+    def test_indexes_follow_prune(self):
+        updated_c = LeafNode(self.c.split, depth=self.c.depth)
+        mutate(self.tree, PruneMutation(self.c, updated_c))
+        self.assertListEqual([self.a], self.tree.prunable_decision_nodes)
+        self.assertEqual(2, self.tree.n_leaf_nodes)
+        self.assertIs(self.tree.parent(updated_c), self.a)
+        self.assertIsNone(self.tree.parent(self.d))
+
 
 class TestTreeStructureDataUpdate(TestCase):
 
@@ -91,6 +105,18 @@ class TestTreeStructureDataUpdate(TestCase):
         self.assertListEqual([6], list(self.d.data.y.values[~self.d.data.y._mask]))
         self.assertListEqual([7], list(self.e.data.y.values[~self.e.data.y._mask]))
 
+    def test_leaf_ids_follow_mutations(self):
+        self.b.set_value(1.)
+        self.d.set_value(2.)
+        self.e.set_value(3.)
+        self.assertListEqual([1., 2., 3.], list(self.tree.predict()))
+        self.assertListEqual([1., 2., 3.], list(self.tree.leaf_summed_y()[self.tree.leaf_ids]))
+
+        updated_c = LeafNode(self.c.split, depth=1, value=4.)
+        mutate(self.tree, PruneMutation(self.c, updated_c))
+        self.assertListEqual([1., 4., 4.], list(self.tree.predict()))
+        self.assertEqual(self.tree.leaf_summed_y()[self.tree.leaf_slot(updated_c)], 5.)
+
 
 class TestTreeStructureMutation(TestCase):
 
@@ -153,7 +179,7 @@ class TestSklearnToBartPyTreeMapping(unittest.TestCase):
     def test_same_prediction(self):
         from sklearn.ensemble import GradientBoostingRegressor
         params = {'n_estimators': 1, 'max_depth': 2, 'min_samples_split': 2,
-                  'learning_rate': 0.8, 'loss': 'ls'}
+                  'learning_rate': 0.8, 'loss': 'squared_error'}
         sklearn_model = GradientBoostingRegressor(**params)
         sklearn_model.fit(self.data.X.values, self.data.y.values)
 
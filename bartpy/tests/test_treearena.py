@@ -0,0 +1,60 @@
+from operator import le, gt
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from bartpy.data import Data, format_covariate_matrix
+from bartpy.mutation import GrowMutation
+from bartpy.node import split_node, LeafNode
+from bartpy.split import Split, SplitCondition
+from bartpy.tree import Tree, mutate
+from bartpy.treearena import TreeArena, FREE, LEAF, START, END
+
+
+class TestTreeArena(unittest.TestCase):
+
+    def setUp(self):
+        X = pd.DataFrame({"a": [1, 2, 3, 4, 5, 6], "b": [6, 5, 4, 3, 2, 1]})
+        self.X = X.values.astype(float)
+        data = Data(format_covariate_matrix(X), np.arange(6).astype(float))
+        root = split_node(LeafNode(Split(data)), (SplitCondition(0, 3, le), SplitCondition(0, 3, gt)))
+        self.tree = Tree([root, root.left_child, root.right_child])
+        mutate(self.tree, GrowMutation(root.right_child, split_node(root.right_child, (SplitCondition(1, 1, le), SplitCondition(1, 1, gt)))))
+        for i, leaf in enumerate(self.tree.leaf_nodes):
+            leaf.set_value(float(i + 1))
+        self.arena = TreeArena.from_trees([self.tree, Tree([LeafNode(Split(data))])], self.X)
+
+    def test_predictions_match_tree(self):
+        np.testing.assert_array_almost_equal(self.arena.predict_tree(0), self.tree.predict(self.X))
+        np.testing.assert_array_almost_equal(self.arena.snapshot(0).predict(self.X), self.tree.predict(self.X))
+        np.testing.assert_array_almost_equal(self.arena.predict(), self.tree.predict(self.X))
+
+    def test_rows_partitioned(self):
+        nodes, order = self.arena.nodes[0], self.arena.order[0]
+        prediction = self.tree.predict(self.X)
+        for leaf in self.arena.view(0).leaf_nodes:
+            rows = order[nodes[leaf.slot, START]:nodes[leaf.slot, END]]
+            self.assertListEqual(sorted(rows), list(np.flatnonzero(prediction == leaf.current_value)))
+
+    def test_view_matches_tree(self):
+        view = self.arena.view(0)
+        self.assertEqual(len(self.tree.nodes), len(view.nodes))
+        self.assertEqual(self.tree.n_leaf_nodes, view.n_leaf_nodes)
+        self.assertEqual(self.tree.n_prunable_decision_nodes, view.n_prunable_decision_nodes)
+        self.assertListEqual(sorted(x.depth for x in self.tree.nodes), sorted(x.depth for x in view.nodes))
+        self.assertIsNone(view.parent(view.root))
+        self.assertListEqual([x.split.splitting_variable for x in view.nodes], [None, 0, 0, 1, 1])
+        self.assertEqual(1, self.arena.view(1).n_leaf_nodes)
+
+    def test_ensure_capacity(self):
+        capacity = self.arena.capacity
+        self.arena.n_slots[0] = capacity - 1
+        self.arena.ensure_capacity()
+        self.assertEqual(2 * capacity, self.arena.capacity)
+        self.assertTrue(np.all(self.arena.nodes[:, capacity:, 0] == FREE))
+        self.assertEqual(LEAF, self.arena.nodes[1, 0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()